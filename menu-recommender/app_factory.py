@@ -1,43 +1,278 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
 import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 import joblib
-import torch
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import config
-from controllers import health_controller, menu_recommender_controller
+from controllers import admin_controller, health_controller, menu_recommender_controller
 from helpers.logger import logger
-from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.artifact_reloader import ArtifactReloader
+from services.batch_scheduler import BatchScheduler
+from services.embedding_store import EmbeddingStore, StoreSearchIndex
+from services.image_cache import ImageCache
+from services.image_queue import ImageQueue
+from services.image_service import ImageService
+from services.image_variants import ImageVariants, thumbnails_available
+from services.ingredient_vocab import IngredientVocab
+from services.ivfpq_index import IVFPQSearchIndex
+from services.menu_sampler_pool import MenuSamplerPool
+from services.numpy_query_encoder import NumpyQueryEncoder
+from services.recipe_catalog import RecipeCatalog
 from services.recommender_service import RecommenderService
+from services.result_cache import ResultCache
+from services.search_index import ExactSearchIndex
+from services.sharded_index import ShardedSearchIndex
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def _artifact_version(*paths: str | None) -> str:
+    # Changes whenever one of the loaded artifact files is replaced
+    fingerprint = hashlib.sha256()
+    for path in filter(None, paths):
+        if os.path.isdir(path):
+            path = os.path.join(path, "manifest.json")
+        stat = os.stat(path)
+        fingerprint.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return fingerprint.hexdigest()[:16]
+
+
+def _set_torch_threads():
+    # torch is imported only in the torch serving mode, QUERY_ENCODER_PATH serves with NumPy only
+    import torch
+
+    # 0 keeps the torch default (all cores), which oversubscribes as soon as there are several workers or inference threads
+    if config.settings.TORCH_THREADS > 0:
+        torch.set_num_threads(config.settings.TORCH_THREADS)
+
+
+def _set_torch_interop_threads():
+    import torch
+
+    if config.settings.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(config.settings.TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # Can only be set once per process, before any inter-op parallel work
+            logger.warning("torch inter-op threads already initialized, TORCH_INTEROP_THREADS is ignored")
+
+
+def _load_torch_query_encoder(vocab_size: int):
+    import torch
+
+    from models.recipie_embedding_model import RecipeEmbeddingModel
+    from services.query_encoder import QueryEncoder
+
+    _set_torch_threads()
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = RecipeEmbeddingModel(vocab_size=vocab_size, embedding_dim=128).to(device)
+    model.load_state_dict(torch.load("./models/recipe_embedding_model.pt", map_location=device))
+    model.eval()
+    return QueryEncoder(model)
+
+
+def _load_torch_recipe_embeddings():
+    import torch
+
+    return torch.load("./embeddings/recipe_embeddings.pt").cpu().numpy()
+
+
+def _lower_thread_priority():
+    # Linux schedules threads individually: a reload competes less with the serving threads for the CPU
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _inference_executor(torch_threads: bool) -> ThreadPoolExecutor:
+    # All model and scoring work runs here instead of Starlette's threadpool, so its concurrency is bounded per worker
+    return ThreadPoolExecutor(
+        max_workers=config.settings.INFERENCE_THREADS,
+        thread_name_prefix="inference",
+        initializer=_set_torch_threads if torch_threads else None
+    )
+
+
+def _artifact_paths() -> list[str | None]:
+    return [
+        config.settings.INGREDIENT_VOCAB_PATH or "./dataset/ingredient2idx.pkl",
+        config.settings.EMBEDDING_STORE_PATH or "./embeddings/recipe_embeddings.pt",
+        config.settings.IVFPQ_INDEX_PATH if config.settings.SEARCH_MODE == "ivfpq" else None,
+        config.settings.RECIPE_CATALOG_PATH or "./dataset/recipes_for_app.pkl",
+        config.settings.QUERY_ENCODER_PATH or "./models/recipe_embedding_model.pt"
+    ]
 
-    # Load the ingredient index
-    with open("./dataset/ingredient2idx.pkl", "rb") as f:
-        ingredient2idx = pickle.load(f)
 
-    # Load the pre-calculated embeddings
-    recipe_embeddings = torch.load("./embeddings/recipe_embeddings.pt")
+def _load_search_index():
+    # Load the pre-calculated embeddings, memory-mapped and shared between workers when a store is configured
+    if config.settings.EMBEDDING_STORE_PATH:
+        search_index = StoreSearchIndex(EmbeddingStore.open(config.settings.EMBEDDING_STORE_PATH))
+    else:
+        search_index = ExactSearchIndex(_load_torch_recipe_embeddings())
+
+    if config.settings.SEARCH_MODE == "ivfpq":
+        search_index = IVFPQSearchIndex.load(
+            config.settings.IVFPQ_INDEX_PATH,
+            n_probe=config.settings.IVFPQ_N_PROBE,
+            rerank_index=search_index if config.settings.IVFPQ_RERANK else None
+        )
+    elif config.settings.SEARCH_MODE != "exact":
+        raise ValueError(f"Unknown SEARCH_MODE: {config.settings.SEARCH_MODE}")
+    elif config.settings.SEARCH_SHARDS > 1:
+        # Exact search split over a process pool, the float32 matrix in shared memory. A store is dequantized
+        # block by block straight into it, never into a full float32 copy first
+        recipe_embeddings = search_index.store if isinstance(search_index, StoreSearchIndex) else search_index.vectors(slice(None))
+        search_index = ShardedSearchIndex(recipe_embeddings, config.settings.SEARCH_SHARDS)
+    return search_index
+
+
+def _load_recommender_service(result_cache: ResultCache, strict: bool = True) -> RecommenderService:
+    # A complete, validated artifact set, on startup and on every hot reload. Fingerprinted first: files replaced
+    # while loading no longer match this version and are reloaded again. Not strict on startup: the default artifacts
+    # predate the validation, their catalog has more recipes than the embeddings
+    artifact_version = _artifact_version(*_artifact_paths())
+
+    # Load the ingredient index
+    if config.settings.INGREDIENT_VOCAB_PATH:
+        ingredient_vocab = IngredientVocab.open(config.settings.INGREDIENT_VOCAB_PATH)
+    else:
+        with open("./dataset/ingredient2idx.pkl", "rb") as f:
+            ingredient_vocab = IngredientVocab.from_dict(pickle.load(f))
 
     # Load the recipe dataset
-    recipies = joblib.load("./dataset/recipes_for_app.pkl")
+    if config.settings.RECIPE_CATALOG_PATH:
+        recipe_catalog = RecipeCatalog.open(config.settings.RECIPE_CATALOG_PATH)
+    else:
+        recipe_catalog = RecipeCatalog.from_dataframe(joblib.load("./dataset/recipes_for_app.pkl"), ingredient_vocab)
 
-    model = RecipeEmbeddingModel(vocab_size=len(ingredient2idx), embedding_dim=128).to(device)
-    model.load_state_dict(torch.load("./models/recipe_embedding_model.pt", map_location=device))
-    app.state.recommender_service = RecommenderService(
-        model=model,
-        ingredient_vocab=ingredient2idx,
-        recipe_embeddings=recipe_embeddings,
-        recipe_dataset=recipies
+    # Load the query encoder, NumPy only when the model was exported with scripts/export_numpy_model.py
+    if config.settings.QUERY_ENCODER_PATH:
+        query_encoder = NumpyQueryEncoder.open(config.settings.QUERY_ENCODER_PATH)
+    else:
+        query_encoder = _load_torch_query_encoder(len(ingredient_vocab))
+
+    # Last: a sharded index starts processes, released again if RecommenderService rejects the artifact set
+    search_index = _load_search_index()
+    try:
+        recommender_service = RecommenderService(
+            query_encoder=query_encoder,
+            ingredient_vocab=ingredient_vocab,
+            search_index=search_index,
+            recipe_catalog=recipe_catalog,
+            result_cache=result_cache,
+            artifact_version=artifact_version,
+            strict=strict
+        )
+    except Exception:
+        if isinstance(search_index, ShardedSearchIndex):
+            search_index.close()
+        raise
+    return recommender_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    numpy_serving = bool(config.settings.QUERY_ENCODER_PATH)
+    if numpy_serving and not config.settings.EMBEDDING_STORE_PATH:
+        raise ValueError("QUERY_ENCODER_PATH requires EMBEDDING_STORE_PATH, the .pt embeddings can only be read with torch")
+    app.state.inference_executor = _inference_executor(torch_threads=not numpy_serving)
+    if not numpy_serving:
+        _set_torch_interop_threads()
+
+    # Load the artifacts, reloaded in the background by the admin endpoint or when their files change: the new set is
+    # loaded next to the serving one and swapped in, the result cache is shared (keyed by the artifact version)
+    result_cache = ResultCache(config.settings.RESULT_CACHE_SIZE, config.settings.RESULT_CACHE_TTL_SECONDS)
+    app.state.recommender_service = _load_recommender_service(result_cache, strict=False)
+
+    def publish(recommender_service):
+        app.state.recommender_service = recommender_service
+        # Sampled menus of the retired catalog are not served any more
+        app.state.menu_sampler_pool.clear(recommender_service.artifact_version)
+
+    app.state.reload_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reload", initializer=_lower_thread_priority)
+    app.state.artifact_reloader = ArtifactReloader(
+        load=lambda: _load_recommender_service(result_cache),
+        fingerprint=lambda: _artifact_version(*_artifact_paths()),
+        service_provider=lambda: app.state.recommender_service,
+        publish=publish,
+        drain_seconds=config.settings.RELOAD_DRAIN_SECONDS,
+        executor=app.state.reload_executor
+    )
+
+    # Generated dish images, cached on disk across restarts, generated in the background on their own threads
+    image_service = ImageService(
+        ImageCache(config.settings.IMAGE_CACHE_DIR, max_bytes=int(config.settings.IMAGE_CACHE_MAX_MB * 2 ** 20)),
+        max_age_seconds=config.settings.IMAGE_MAX_AGE_SECONDS
+    )
+    app.state.image_executor = ThreadPoolExecutor(max_workers=config.settings.IMAGE_WORKERS, thread_name_prefix="image")
+    app.state.image_queue = ImageQueue(
+        image_service,
+        workers=config.settings.IMAGE_WORKERS,
+        max_pending=config.settings.IMAGE_QUEUE_SIZE,
+        max_prewarm=config.settings.IMAGE_PREWARM_QUEUE_SIZE,
+        prewarm_enabled=config.settings.IMAGE_PREWARM,
+        executor=app.state.image_executor
     )
 
+    # Thumbnails are resized in their own processes, cached next to the originals
+    thumbnail_sizes = config.settings.IMAGE_THUMBNAIL_SIZES
+    if thumbnail_sizes and not thumbnails_available():
+        logger.warning("Pillow with WebP support is not installed, /menuimage serves the original images for every size")
+        thumbnail_sizes = []
+    app.state.image_process_pool = None
+    if thumbnail_sizes:
+        app.state.image_process_pool = ProcessPoolExecutor(
+            max_workers=config.settings.IMAGE_THUMBNAIL_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    app.state.image_variants = ImageVariants(image_service.image_cache, thumbnail_sizes, executor=app.state.image_process_pool)
+
+    # Keep the menu sampler pool filled in the background
+    app.state.menu_sampler_pool = MenuSamplerPool(
+        pool_size=config.settings.MENU_SAMPLER_POOL_SIZE,
+        top_k=config.settings.MENU_SAMPLER_POOL_TOP_K,
+        refresh_count=config.settings.MENU_SAMPLER_REFRESH_COUNT,
+        refresh_interval_seconds=config.settings.MENU_SAMPLER_REFRESH_SECONDS,
+        executor=app.state.inference_executor
+    )
+    background_tasks = [asyncio.create_task(app.state.image_queue.run())]
+    if config.settings.MENU_SAMPLER_POOL_SIZE > 0:
+        background_tasks.append(asyncio.create_task(app.state.menu_sampler_pool.run(lambda: app.state.recommender_service)))
+
+    # Collect concurrent recommendations into batches
+    app.state.batch_scheduler = None
+    if config.settings.MICRO_BATCH_MAX_SIZE > 1:
+        app.state.batch_scheduler = BatchScheduler(
+            config.settings.MICRO_BATCH_MAX_SIZE,
+            config.settings.MICRO_BATCH_WINDOW_MS,
+            executor=app.state.inference_executor
+        )
+        background_tasks.append(asyncio.create_task(app.state.batch_scheduler.run(lambda: app.state.recommender_service)))
+
+    # Reload the artifacts when their files change
+    if config.settings.RELOAD_WATCH_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(app.state.artifact_reloader.watch(config.settings.RELOAD_WATCH_SECONDS)))
+
     yield
 
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await app.state.artifact_reloader.close()
+    app.state.inference_executor.shutdown(wait=True)
+    # A remote generation can take many seconds, queued ones are dropped
+    app.state.image_executor.shutdown(wait=False, cancel_futures=True)
+    if app.state.image_process_pool is not None:
+        app.state.image_process_pool.shutdown(wait=True, cancel_futures=True)
+    app.state.recommender_service.close()
+    app.state.reload_executor.shutdown(wait=True)
+
 def app_factory() -> FastAPI:
     # Init fast api
     app: FastAPI = FastAPI(title="Menu Recommender Service", lifespan=lifespan)
@@ -53,6 +288,7 @@ def app_factory() -> FastAPI:
 
     # Add router
     app.include_router(health_controller.router, prefix="/api/v1/health")
+    app.include_router(admin_controller.router, prefix="/api/v1/admin")
     app.include_router(menu_recommender_controller.router, prefix="/api/v1/menu")
 
     # Logging
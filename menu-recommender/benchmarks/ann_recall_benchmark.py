@@ -0,0 +1,70 @@
+"""
+Recall@k versus latency of the IVF + PQ index against exact search, for a sweep of probe counts.
+
+    python -m benchmarks.ann_recall_benchmark --embeddings ./embeddings/recipe_embeddings.pt
+    python -m benchmarks.ann_recall_benchmark --recipes 1000000   # synthetic clustered embeddings
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ivfpq_index import IVFPQSearchIndex
+from services.search_index import ExactSearchIndex
+
+
+def _synthetic_embeddings(num_recipes: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered data is closer to real recipe embeddings than uniform noise
+    centers = rng.standard_normal((max(num_recipes // 25, 1), dim)).astype(np.float32)
+    noise = rng.standard_normal((num_recipes, dim)).astype(np.float32) * 0.3
+    return centers[rng.integers(0, len(centers), num_recipes)] + noise
+
+
+def _latency_ms(index, queries: np.ndarray, top_k: int) -> tuple[np.ndarray, float, float]:
+    results, timings = list(), list()
+    for query in queries:
+        start = time.perf_counter()
+        _, indices = index.search(query, top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(indices[0])
+    return np.stack(results), float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default=None, help="recipe_embeddings.pt, synthetic data when omitted")
+    parser.add_argument("--recipes", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--lists", type=int, default=1024)
+    parser.add_argument("--subvectors", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    if args.embeddings:
+        import torch
+        recipe_embeddings = torch.load(args.embeddings).cpu().numpy()
+    else:
+        recipe_embeddings = _synthetic_embeddings(args.recipes, args.dim, rng)
+
+    # Queries are perturbed catalog rows, like ingredient lists close to existing recipes
+    queries = recipe_embeddings[rng.choice(len(recipe_embeddings), args.queries)]
+    queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.3
+
+    exact = ExactSearchIndex(recipe_embeddings)
+    truth, exact_p50, exact_p99 = _latency_ms(exact, queries, args.top_k)
+
+    start = time.perf_counter()
+    ann = IVFPQSearchIndex.train(recipe_embeddings, n_lists=args.lists, n_subvectors=args.subvectors)
+    print(f"recipes={len(exact)} lists={ann.n_lists} subvectors={args.subvectors} build={time.perf_counter() - start:.1f}s")
+    print(f"exact              p50={exact_p50:7.2f}ms p99={exact_p99:7.2f}ms recall@{args.top_k}=1.000")
+
+    for rerank in (False, True):
+        ann.rerank_index = exact if rerank else None
+        for n_probe in args.probes:
+            ann.n_probe = n_probe
+            found, p50, p99 = _latency_ms(ann, queries, args.top_k)
+            recall = np.mean([len(set(f) & set(t)) / args.top_k for f, t in zip(found, truth)])
+            print(f"ivfpq n_probe={n_probe:<3} rerank={str(rerank):<5} p50={p50:7.2f}ms p99={p99:7.2f}ms recall@{args.top_k}={recall:.3f}")
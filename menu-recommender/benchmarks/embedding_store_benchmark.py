@@ -0,0 +1,78 @@
+"""
+Load time, private memory, latency and top-k overlap of the memory-mapped embedding stores against the in-heap
+float32 tensor loaded by torch.load.
+
+    python -m benchmarks.embedding_store_benchmark --recipes 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from services.embedding_store import STORE_DTYPES, EmbeddingStore, StoreSearchIndex
+from services.search_index import ExactSearchIndex
+
+
+def _private_mb() -> float:
+    # Anonymous memory of this process, i.e. what every worker pays for itself (mapped files live in the page cache)
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["Anonymous"].split()[0]) / 1024
+    except (OSError, KeyError):
+        return float("nan")
+
+
+def _search(index, queries: np.ndarray, top_k: int) -> tuple[np.ndarray, float]:
+    results, timings = list(), list()
+    for query in queries:
+        start = time.perf_counter()
+        _, indices = index.search(query, top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(indices[0])
+    return np.stack(results), float(np.median(timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    recipe_embeddings = rng.standard_normal((args.recipes, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        torch.save(torch.from_numpy(recipe_embeddings), os.path.join(tmp_dir, "recipe_embeddings.pt"))
+        for dtype in STORE_DTYPES:
+            EmbeddingStore.write(os.path.join(tmp_dir, dtype), recipe_embeddings, dtype=dtype)
+        del recipe_embeddings
+
+        # Baseline: torch.load into the private heap of the worker
+        before = _private_mb()
+        start = time.perf_counter()
+        baseline = ExactSearchIndex(torch.load(os.path.join(tmp_dir, "recipe_embeddings.pt")).numpy())
+        load_ms = (time.perf_counter() - start) * 1000
+        truth, latency = _search(baseline, queries, args.top_k)
+        print(f"{'torch.load float32':<22} load={load_ms:8.1f}ms private={_private_mb() - before:8.1f}MB p50={latency:6.2f}ms overlap@{args.top_k}=1.000")
+        del baseline
+
+        for dtype in STORE_DTYPES:
+            path = os.path.join(tmp_dir, dtype)
+            size_mb = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+
+            before = _private_mb()
+            start = time.perf_counter()
+            index = StoreSearchIndex(EmbeddingStore.open(path))
+            load_ms = (time.perf_counter() - start) * 1000
+            found, latency = _search(index, queries, args.top_k)
+            overlap = np.mean([len(set(f) & set(t)) / args.top_k for f, t in zip(found, truth)])
+
+            print(f"{'mmap ' + dtype:<22} load={load_ms:8.1f}ms private={_private_mb() - before:8.1f}MB p50={latency:6.2f}ms overlap@{args.top_k}={overlap:.3f} file={size_mb:.0f}MB")
+            del index
@@ -0,0 +1,65 @@
+"""
+Latency of exclude / require filtered search (postings mask + masked top-k) against the unfiltered search, for
+filters leaving different shares of the catalog.
+
+    python -m benchmarks.filtered_search_benchmark --recipes 1000000 --shares 1.0 0.5 0.1 0.01
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ingredient_postings import IngredientPostings, RecipeFilter
+from services.search_index import ExactSearchIndex
+
+
+class _SyntheticCatalog:
+    # Recipe i contains ingredient 1 with probability share (the only required one) plus random others
+    def __init__(self, num_recipes: int, vocab_size: int, share: float, rng: np.random.Generator):
+        ingredients = rng.integers(2, vocab_size, size=(num_recipes, 8))
+        ingredients[:, 0] = np.where(rng.random(num_recipes) < share, 1, ingredients[:, 0])
+        self.ingredient_indptr = np.arange(0, num_recipes * 8 + 1, 8)
+        self.ingredient_ids = ingredients.ravel().astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ingredient_indptr) - 1
+
+
+def _measure(fn, repeats: int) -> float:
+    # Warm up once, report the median in milliseconds
+    fn()
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def run(index: ExactSearchIndex, share: float, vocab_size: int, top_k: int, repeats: int):
+    rng = np.random.default_rng(1)
+    postings = IngredientPostings.from_catalog(_SyntheticCatalog(len(index), vocab_size, share, rng), vocab_size)
+    recipe_filter = RecipeFilter(require=(1,))
+    query = rng.standard_normal((1, index.dim)).astype(np.float32)
+
+    unfiltered = _measure(lambda: index.search(query, top_k), repeats)
+    mask = _measure(lambda: postings.allowed(recipe_filter), repeats)
+    filtered = _measure(lambda: index.search(query, top_k, allowed=postings.allowed(recipe_filter)), repeats)
+
+    allowed = postings.allowed(recipe_filter)
+    print(f"allowed {allowed.mean():6.1%}: unfiltered {unfiltered:7.2f}ms  mask {mask:6.2f}ms  filtered (mask + search) {filtered:7.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--shares", type=float, nargs="+", default=[1.0, 0.5, 0.1, 0.01])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    index = ExactSearchIndex(np.random.default_rng(0).standard_normal((args.recipes, args.dim), dtype=np.float32))
+    for share in args.shares:
+        run(index, share, args.vocab, args.top_k, args.repeats)
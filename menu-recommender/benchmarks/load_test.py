@@ -0,0 +1,113 @@
+"""
+Load test of /recommender over a sweep of uvicorn workers x inference threads x torch threads.
+
+Every combination starts its own uvicorn on the real artifacts, keeps --concurrency keep-alive clients busy for
+--duration seconds and reports throughput and latency percentiles. Run it on a node like the production ones, the
+client threads share the cores with the server.
+
+    python -m benchmarks.load_test --workers 1 2 4 --inference-threads 1 2 4 --torch-threads 1 2
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+INGREDIENTS = [
+    "chicken", "beef", "pork", "salmon", "eggs", "milk", "butter", "flour", "sugar", "salt", "pepper", "garlic",
+    "onion", "tomatoes", "potatoes", "carrots", "rice", "pasta", "cheese", "cream", "lemon", "olive oil", "basil",
+    "parsley", "mushrooms", "spinach", "broccoli", "bell pepper", "ginger", "soy sauce"
+]
+
+
+def _wait_until_ready(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/api/v1/health/")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server on port {port} did not start within {timeout}s")
+
+
+def _client(port: int, top_k: int, deadline: float, seed: int) -> list[float]:
+    # One keep-alive connection sending requests back to back until the deadline
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies = list()
+    while time.monotonic() < deadline:
+        body = json.dumps(rng.sample(INGREDIENTS, rng.randint(3, 6)))
+        start = time.perf_counter()
+        connection.request("POST", f"/api/v1/menu/recommender?top_k={top_k}", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"Request failed with status {response.status}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _load(port: int, concurrency: int, duration: float, top_k: int) -> tuple[float, np.ndarray]:
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(concurrency) as clients:
+        results = list(clients.map(lambda seed: _client(port, top_k, deadline, seed), range(concurrency)))
+    latencies = np.concatenate([np.asarray(latencies) for latencies in results])
+    return len(latencies) / duration, latencies
+
+
+def run(args, workers: int, inference_threads: int, torch_threads: int) -> str:
+    env = {
+        **os.environ,
+        "INFERENCE_THREADS": str(inference_threads),
+        "TORCH_THREADS": str(torch_threads),
+        "TORCH_INTEROP_THREADS": "1",
+        "MENU_SAMPLER_POOL_SIZE": "0",
+        # Measure the model and the search, not the cache
+        "RESULT_CACHE_SIZE": "0" if args.no_cache else os.environ.get("RESULT_CACHE_SIZE", "10000")
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        _wait_until_ready(args.port, args.startup_timeout)
+        _load(args.port, args.concurrency, args.warmup, args.top_k)
+        throughput, latencies = _load(args.port, args.concurrency, args.duration, args.top_k)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return (
+        f"{workers:>7} {inference_threads:>9} {torch_threads:>6} {workers * inference_threads * torch_threads:>6} "
+        f"{throughput:9.1f} {np.percentile(latencies, 50):8.1f} {np.percentile(latencies, 95):8.1f} {np.percentile(latencies, 99):8.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--inference-threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--torch-threads", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--no-cache", action="store_true", help="disable the result cache of the server")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'inference':>9} {'torch':>6} {'total':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for workers, inference_threads, torch_threads in itertools.product(args.workers, args.inference_threads, args.torch_threads):
+        print(run(args, workers, inference_threads, torch_threads), flush=True)
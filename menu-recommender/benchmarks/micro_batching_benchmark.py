@@ -0,0 +1,82 @@
+"""
+Throughput and latency of concurrent recommendations, one threadpool call per request versus the micro-batching
+scheduler, on a synthetic catalog.
+
+    python -m benchmarks.micro_batching_benchmark --recipes 100000 --concurrency 64
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.batch_scheduler import BatchScheduler
+from services.ingredient_vocab import IngredientVocab
+from services.query_encoder import QueryEncoder
+from services.recipe_catalog import RecipeCatalog
+from services.recommender_service import RecommenderService
+from services.search_index import ExactSearchIndex
+
+
+def _synthetic_service(num_recipes: int, vocab_size: int) -> RecommenderService:
+    rng = random.Random(0)
+    vocab = {f"ingredient {i}": i for i in range(vocab_size)}
+    recipes = pd.DataFrame({"title": [f"Recipe {i}" for i in range(num_recipes)], "NER": ["" for _ in range(num_recipes)]})
+
+    model = RecipeEmbeddingModel(vocab_size=vocab_size, embedding_dim=128)
+    model.eval()
+    with torch.no_grad():
+        recipe_embeddings, _ = model([rng.sample(range(1, vocab_size), 6) for _ in range(num_recipes)])
+
+    ingredient_vocab = IngredientVocab.from_dict(vocab)
+    return RecommenderService(QueryEncoder(model), ExactSearchIndex(recipe_embeddings.numpy()), ingredient_vocab, RecipeCatalog.from_dataframe(recipes, vocab))
+
+
+async def _load(submit, requests: list[list[str]], concurrency: int) -> tuple[float, np.ndarray]:
+    latencies = list()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(ingredients):
+        async with semaphore:
+            start = time.perf_counter()
+            await submit(ingredients)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(ingredients) for ingredients in requests])
+    return len(requests) / (time.perf_counter() - start), np.asarray(latencies)
+
+
+async def main(args):
+    service = _synthetic_service(args.recipes, args.vocab)
+    rng = random.Random(1)
+    requests = [[f"ingredient {i}" for i in rng.sample(range(1, args.vocab), 5)] for _ in range(args.requests)]
+
+    async def threadpool(ingredients):
+        return await asyncio.to_thread(service.get_recommendations, ingredients, args.top_k)
+
+    throughput, latencies = await _load(threadpool, requests, args.concurrency)
+    print(f"threadpool per request : {throughput:8.1f} req/s p50={np.percentile(latencies, 50):7.1f}ms p99={np.percentile(latencies, 99):7.1f}ms")
+
+    for window_ms in args.windows:
+        scheduler = BatchScheduler(max_batch_size=args.max_batch_size, window_ms=window_ms)
+        task = asyncio.create_task(scheduler.run(lambda: service))
+        throughput, latencies = await _load(lambda ingredients: scheduler.submit(ingredients, args.top_k), requests, args.concurrency)
+        task.cancel()
+        print(f"micro-batch {window_ms:>4}ms    : {throughput:8.1f} req/s p50={np.percentile(latencies, 50):7.1f}ms p99={np.percentile(latencies, 99):7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=100_000)
+    parser.add_argument("--vocab", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 2, 5])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+"""
+Pair mining of the contrastive training: the pairwise set intersections of the notebook against the blockwise
+sparse overlap product of PairMiner, on random recipes of 5-7 ingredients like the notebook.
+
+    python -m benchmarks.pair_mining_benchmark --loop-recipes 3000 --recipes 20000 200000 1000000
+"""
+import argparse
+import time
+
+from services.pair_mining import PairMiner, synthetic_recipes
+
+
+def _notebook_loop(recipes: list[list[int]]) -> int:
+    # The double loop of notebooks/food_recommender.ipynb, counting instead of collecting the pairs
+    positives = 0
+    for i in range(len(recipes)):
+        for j in range(i + 1, len(recipes)):
+            if len(set(recipes[i]) & set(recipes[j])) == 1:
+                positives += 1
+    return positives
+
+
+def _seconds(fn) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab-size", type=int, default=168321)
+    parser.add_argument("--loop-recipes", type=int, default=3000)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[20000, 200000, 1000000])
+    parser.add_argument("--pairs", type=int, default=7500, help="positives and negatives sampled each")
+    args = parser.parse_args()
+
+    indptr, ids = synthetic_recipes(args.loop_recipes, args.vocab_size)
+    recipes = [ids[indptr[i]:indptr[i + 1]].tolist() for i in range(args.loop_recipes)]
+    loop_seconds, loop_positives = _seconds(lambda: _notebook_loop(recipes))
+    miner_seconds, training_pairs = _seconds(lambda: PairMiner(indptr, ids, args.vocab_size).mine(args.pairs, args.pairs))
+    assert training_pairs.stats["positive_pairs_total"] == loop_positives
+    n_pairs = args.loop_recipes * (args.loop_recipes - 1) // 2
+    print(f"{args.loop_recipes} recipes, {n_pairs} pairs, {loop_positives} positives: "
+          f"notebook loop {loop_seconds:.2f} s, PairMiner {miner_seconds:.3f} s (same positives)")
+
+    for n_recipes in args.recipes:
+        indptr, ids = synthetic_recipes(n_recipes, args.vocab_size)
+        seconds, training_pairs = _seconds(lambda: PairMiner(indptr, ids, args.vocab_size).mine(args.pairs, args.pairs))
+        n_pairs = n_recipes * (n_recipes - 1) // 2
+        print(f"{n_recipes:>9} recipes: {seconds:7.2f} s, {training_pairs.stats['positive_pairs_total']} positives "
+              f"of {n_pairs:.2e} pairs ({n_pairs / seconds:.2e} pairs/s)")
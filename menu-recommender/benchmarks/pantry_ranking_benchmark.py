@@ -0,0 +1,70 @@
+"""
+Latency of the pantry-coverage ranking (coverage of every recipe + cosine blend) for pantries of different sizes
+on a synthetic catalog with a Zipf-like ingredient distribution (salt-like ingredients occur in a large share).
+
+    python -m benchmarks.pantry_ranking_benchmark --recipes 2200000 --pantry-sizes 5 15 30
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ingredient_vocab import IngredientVocab
+from services.numpy_query_encoder import NumpyQueryEncoder
+from services.recipe_catalog import RecipeCatalog
+from services.recommender_service import RecommenderService
+from services.search_index import ExactSearchIndex
+
+
+def _synthetic_service(num_recipes: int, vocab_size: int, dim: int, rng: np.random.Generator) -> RecommenderService:
+    # 9 ingredients per recipe, ingredient i drawn with probability ~ 1 / (i + 10)
+    weights = 1 / (np.arange(1, vocab_size) + 10)
+    ingredient_ids = rng.choice(np.arange(1, vocab_size), size=num_recipes * 9, p=weights / weights.sum()).astype(np.int32)
+    offsets = np.zeros(num_recipes + 1, dtype=np.int64)
+    recipe_catalog = RecipeCatalog(offsets, np.empty(0, dtype=np.uint8), offsets, np.empty(0, dtype=np.uint8),
+                                   np.arange(0, num_recipes * 9 + 1, 9), ingredient_ids)
+
+    recipe_embeddings = rng.standard_normal((num_recipes, dim), dtype=np.float32)
+    return RecommenderService(
+        query_encoder=NumpyQueryEncoder(rng.standard_normal((vocab_size, dim), dtype=np.float32)),
+        search_index=ExactSearchIndex(recipe_embeddings),
+        ingredient_vocab=IngredientVocab.from_dict({f"ingredient {i}": i for i in range(vocab_size)}),
+        recipe_catalog=recipe_catalog
+    )
+
+
+def _measure(fn, repeats: int) -> float:
+    # Warm up once, report the median in milliseconds
+    fn()
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=2_200_000)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--pantry-sizes", type=int, nargs="+", default=[5, 15, 30])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    service = _synthetic_service(args.recipes, args.vocab, args.dim, rng)
+    print(f"built {args.recipes} recipes in {time.perf_counter() - start:.1f}s")
+
+    for pantry_size in args.pantry_sizes:
+        # Pantries mix staples (the most common ingredients) with rarer ones
+        pantry = [f"ingredient {i}" for i in np.concatenate([np.arange(1, 6), rng.integers(6, args.vocab, pantry_size - 5)])]
+        postings = service.ingredient_postings
+        candidates = len(postings.coverage([service.ingredient_vocab[name] for name in pantry])[0])
+
+        pantry_ms = _measure(lambda: service.get_pantry_recommendations(pantry, args.top_k), args.repeats)
+        similarity_ms = _measure(lambda: service.get_recommendations(pantry, args.top_k), args.repeats)
+        print(f"pantry {pantry_size:>3}: {candidates:>8} covered recipes  pantry ranking {pantry_ms:7.2f}ms  similarity ranking {similarity_ms:7.2f}ms")
@@ -0,0 +1,68 @@
+"""
+Latency of the query embedding: the model forward pass (with and without autograd) versus the graph-free
+EmbeddingBag encoder and the NumPy-only encoder.
+
+    python -m benchmarks.query_encoder_benchmark --vocab 200000 --batch-sizes 1 32 256
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.numpy_query_encoder import NumpyQueryEncoder
+from services.query_encoder import QueryEncoder
+
+
+def _measure(fn, repeats: int) -> float:
+    # Warm up once, report the median in microseconds
+    fn()
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(timings))
+
+
+def forward_with_graph(model, queries):
+    # The original request path: forward pass building an autograd graph
+    return model(queries)[0].detach()
+
+
+def forward_no_grad(model, queries):
+    with torch.no_grad():
+        return model(queries)[0]
+
+
+def run(vocab_size: int, dim: int, batch_size: int, repeats: int):
+    rng = random.Random(0)
+    model = RecipeEmbeddingModel(vocab_size=vocab_size, embedding_dim=dim)
+    model.eval()
+    encoder = QueryEncoder(model)
+    numpy_encoder = NumpyQueryEncoder(model.embedding.weight.detach().numpy())
+    queries = [rng.sample(range(1, vocab_size), rng.randint(3, 8)) for _ in range(batch_size)]
+
+    max_difference = np.abs(forward_no_grad(model, queries).numpy() - encoder.encode(queries)).max()
+    graph = _measure(lambda: forward_with_graph(model, queries), repeats)
+    no_grad = _measure(lambda: forward_no_grad(model, queries), repeats)
+    encoded = _measure(lambda: encoder.encode(queries), repeats)
+    numpy_encoded = _measure(lambda: numpy_encoder.encode(queries), repeats)
+
+    print(f"batch {batch_size:>5}: forward {graph:9.1f}us  forward no_grad {no_grad:9.1f}us  "
+          f"encoder {encoded:9.1f}us  numpy {numpy_encoded:9.1f}us  speedup {graph / encoded:5.1f}x  max diff {max_difference:.1e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    for batch_size in args.batch_sizes:
+        run(args.vocab, args.dim, batch_size, args.repeats)
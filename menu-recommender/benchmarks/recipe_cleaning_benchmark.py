@@ -0,0 +1,104 @@
+"""
+Rows per second and peak memory of the recipe cleaning: the two notebooks (whole CSV in memory, deep copy, seven
+title passes, CSV written and parsed again, NER split to ids) against the streaming RecipeCleaner. Every variant runs
+in its own process on a synthetic recipes_data.csv with the columns and text sizes of the real one.
+
+    python -m benchmarks.recipe_cleaning_benchmark --rows 500000
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from services.ingredient_vocab import normalize_ingredient
+from services.recipe_cleaning import RecipeCleaner
+
+
+def _write_dataset(path: str, rows: int, ingredient_names: list[str]):
+    random.seed(0)
+    with open(path, "w") as f:
+        f.write("title,ingredients,directions,link,source,NER,site\n")
+    for start in range(0, rows, 50000):
+        chunk = list()
+        for i in range(start, min(start + 50000, rows)):
+            ner = random.sample(ingredient_names, random.randint(4, 12))
+            title = f"Dish {i} W/ {ner[0]}" if i % 50 == 0 else f"Dish {i} {ner[0]}"
+            chunk.append({
+                "title": title,
+                "ingredients": json.dumps([f"1 c. {name}" for name in ner]),
+                "directions": json.dumps(["Mix everything in a large bowl."] * 6),
+                "link": f"www.example.com/recipe/{i}",
+                "source": "Gathered",
+                "NER": json.dumps(ner),
+                "site": "www.example.com",
+            })
+        pd.DataFrame(chunk).to_csv(path, mode="a", header=False, index=False)
+
+
+def _notebooks(dataset: str, ingredient2idx: dict, work_dir: str) -> int:
+    # notebooks/clean_dataset.ipynb
+    df_recipies = pd.read_csv(dataset, low_memory=False)
+    df_recipies_clean = df_recipies.copy(deep=True)
+    for pattern, replacement in (("W/", ""), ("W /", ""), ("/ ", ""), (r"\\", ""), (r"/M\\", "")):
+        df_recipies_clean["title"] = df_recipies_clean["title"].replace(pattern, replacement, regex=True)
+    df_recipies_clean["title"] = df_recipies_clean["title"].replace(r"\s+", " ", regex=True).str.strip()
+    df_recipies_clean["title"] = df_recipies_clean["title"].replace(r"(?<=[A-Za-z])/(?=[A-Za-z])", " / ", regex=True)
+    df_recipies_clean = df_recipies_clean[~df_recipies_clean["title"].str.startswith(("HTTP", "http", "Http"), na=False)]
+    df_recipies_clean.to_csv(os.path.join(work_dir, "recipes_clean.csv"), index=False)
+
+    # notebooks/food_recommender.ipynb
+    df_recipies = pd.read_csv(os.path.join(work_dir, "recipes_clean.csv"), low_memory=False)
+    df_recipies.dropna(axis=0, subset=["title"], inplace=True)
+    df_recipies.drop_duplicates(subset=["title"], inplace=True)
+    df_recipies["NER"] = df_recipies["NER"].str.strip("[]").str.replace('"', '')
+    recipe_ingredients = [
+        [ingredient2idx.get(normalize_ingredient(i)) for i in ner.split(",")] for ner in df_recipies["NER"].fillna("")
+    ]
+    return len(recipe_ingredients)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--dataset", help="existing recipes_data.csv, generated when missing")
+    parser.add_argument("--run", choices=("notebooks", "streaming"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with open(args.vocab, "rb") as f:
+        ingredient2idx = pickle.load(f)
+
+    if args.run:
+        # Child process: one variant, its own peak memory
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(args.dataset))) as work_dir:
+            started = time.perf_counter()
+            if args.run == "notebooks":
+                recipes = _notebooks(args.dataset, ingredient2idx, work_dir)
+            else:
+                recipes = RecipeCleaner(ingredient2idx).clean(args.dataset, os.path.join(work_dir, "catalog"))["recipes"]
+            seconds = time.perf_counter() - started
+        print(json.dumps({"recipes": recipes, "seconds": seconds, "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        dataset = args.dataset or os.path.join(data_dir, "recipes_data.csv")
+        if not args.dataset:
+            _write_dataset(dataset, args.rows, sorted(ingredient2idx))
+        rows = sum(len(chunk) for chunk in pd.read_csv(dataset, usecols=["title"], dtype=str, chunksize=100000))
+        print(f"{rows} rows, {os.path.getsize(dataset) / 2 ** 20:.0f} MB of CSV")
+
+        for variant in ("notebooks", "streaming"):
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.recipe_cleaning_benchmark", "--run", variant, "--dataset", dataset, "--vocab", args.vocab],
+                capture_output=True, text=True, check=True
+            )
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{variant:>9}: {rows / result['seconds']:8.0f} rows/s, peak {result['peak_mb']:6.0f} MB, {result['recipes']} recipes")
@@ -0,0 +1,71 @@
+"""
+Compares the per-request cosine similarity path with the pre-normalized matmul scoring engine.
+
+    python -m benchmarks.scoring_engine_benchmark --recipes 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+from torch.functional import F
+
+from services.search_index import ExactSearchIndex
+
+
+def _measure(fn, repeats: int) -> float:
+    # Warm up once, report the median in milliseconds
+    fn()
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def run(num_recipes: int, dim: int, top_k: int, batch_size: int, repeats: int):
+    generator = torch.Generator().manual_seed(42)
+    recipe_embeddings = F.normalize(torch.randn(num_recipes, dim, generator=generator), dim=-1)
+    queries = F.normalize(torch.randn(batch_size, dim, generator=generator), dim=-1)
+
+    def cosine_similarity_path():
+        # Current path: one cosine similarity over the whole catalog per query
+        with torch.no_grad():
+            for query in queries:
+                similarity = F.cosine_similarity(query.unsqueeze(0), recipe_embeddings)
+                torch.topk(similarity, k=top_k)
+
+    start = time.perf_counter()
+    index = ExactSearchIndex(recipe_embeddings.numpy())
+    build_ms = (time.perf_counter() - start) * 1000
+    queries_np = queries.numpy()
+
+    def engine_single_path():
+        for query in queries_np:
+            index.search(query, top_k)
+
+    def engine_batch_path():
+        index.search(queries_np, top_k)
+
+    baseline = _measure(cosine_similarity_path, repeats)
+    single = _measure(engine_single_path, repeats)
+    batch = _measure(engine_batch_path, repeats)
+
+    print(f"recipes={num_recipes:>9} dim={dim} queries={batch_size} top_k={top_k} index build={build_ms:.1f}ms")
+    print(f"  cosine_similarity + topk : {baseline:9.2f} ms ({baseline / batch_size:.2f} ms/query)")
+    print(f"  engine, one query a time : {single:9.2f} ms ({single / batch_size:.2f} ms/query) x{baseline / single:.1f}")
+    print(f"  engine, batched          : {batch:9.2f} ms ({batch / batch_size:.2f} ms/query) x{baseline / batch:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for num_recipes in args.recipes:
+        run(num_recipes, args.dim, args.top_k, args.queries, args.repeats)
@@ -0,0 +1,77 @@
+"""
+Latency of the sharded multi-process search against the shard count, next to the in-process exact search.
+The synthetic embeddings are generated into a memory-mapped temporary file, so 5M x 128 needs ~2.5GB of disk and
+~2.5GB of shared memory, not twice that.
+
+    python -m benchmarks.sharded_search_benchmark --recipes 1000000 5000000 --shards 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from services.search_index import ExactSearchIndex
+from services.sharded_index import ShardedSearchIndex
+
+
+def _measure(fn, repeats: int) -> float:
+    # Warm up once, report the median in milliseconds
+    fn()
+    timings = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def _synthetic_embeddings(path: str, num_recipes: int, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    embeddings = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(num_recipes, dim))
+    for start in range(0, num_recipes, 262144):
+        end = min(start + 262144, num_recipes)
+        embeddings[start:end] = rng.standard_normal((end - start, dim), dtype=np.float32)
+    return embeddings
+
+
+def run(num_recipes: int, args):
+    queries = np.random.default_rng(1).standard_normal((args.batch_size, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        embeddings = _synthetic_embeddings(os.path.join(directory, "embeddings.npy"), num_recipes, args.dim)
+
+        if num_recipes <= args.max_in_process:
+            # Baseline: the in-process exact search (one BLAS call over the whole matrix)
+            index = ExactSearchIndex(embeddings)
+            single = _measure(lambda: index.search(queries[:1], args.top_k), args.repeats)
+            batch = _measure(lambda: index.search(queries, args.top_k), args.repeats)
+            print(f"{num_recipes:>9} in-process     : 1 query {single:8.2f}ms  {args.batch_size} queries {batch:8.2f}ms")
+            del index
+
+        for n_shards in args.shards:
+            index = ShardedSearchIndex(embeddings, n_shards)
+            try:
+                single = _measure(lambda: index.search(queries[:1], args.top_k), args.repeats)
+                batch = _measure(lambda: index.search(queries, args.top_k), args.repeats)
+            finally:
+                index.close()
+            print(f"{num_recipes:>9} {n_shards:>2} shards      : 1 query {single:8.2f}ms  {args.batch_size} queries {batch:8.2f}ms")
+        del embeddings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--max-in-process", type=int, default=2_000_000, help="largest catalog for the in-process baseline")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    for num_recipes in args.recipes:
+        run(num_recipes, args)
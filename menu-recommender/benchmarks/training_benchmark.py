@@ -0,0 +1,63 @@
+"""
+Training throughput in samples (pairs) per second: the train() loop of the notebook (python lists, pad_sequence on
+the main thread) against ContrastiveTrainer (packed batches from DataLoader workers, EmbeddingBag pooling), with
+dense Adam and with sparse embedding gradients + SparseAdam.
+
+    python -m benchmarks.training_benchmark --pairs 15000 --workers 0 1 2
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.pair_mining import PairMiner, synthetic_recipes
+from services.training import ContrastiveTrainer, PairDataset, contrastive_loss
+
+
+def _notebook_epoch(model, recipes, batch_size: int):
+    # One epoch of train() in notebooks/food_recommender.ipynb
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    random.shuffle(recipes)
+    for i in range(0, len(recipes), batch_size):
+        r1, r2 = zip(*recipes[i:i + batch_size])
+        _, z_i_proj = model(list(r1))
+        _, z_j_proj = model(list(r2))
+        loss = contrastive_loss(z_i_proj, z_j_proj)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--vocab-size", type=int, default=168321)
+    parser.add_argument("--pairs", type=int, default=15000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2])
+    args = parser.parse_args()
+
+    indptr, ids = synthetic_recipes(args.recipes, args.vocab_size)
+    training_pairs = PairMiner(indptr, ids, args.vocab_size).mine(args.pairs // 2, args.pairs // 2)
+    recipes = [(training_pairs.pair(i)[0].tolist(), training_pairs.pair(i)[1].tolist()) for i in range(len(training_pairs))]
+
+    torch.manual_seed(0)
+    started = time.perf_counter()
+    _notebook_epoch(RecipeEmbeddingModel(args.vocab_size, 128), recipes, args.batch_size)
+    print(f"notebook train():                          {len(recipes) / (time.perf_counter() - started):8.0f} samples/s")
+
+    dataset = PairDataset(training_pairs)
+    for sparse_embedding in (False, True):
+        for workers in args.workers:
+            torch.manual_seed(0)
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                trainer = ContrastiveTrainer(
+                    RecipeEmbeddingModel(args.vocab_size, 128), dataset, checkpoint_dir, batch_size=args.batch_size,
+                    num_workers=workers, checkpoint_every=0, sparse_embedding=sparse_embedding
+                )
+                stats = trainer.train(1)
+            optimizer = "SparseAdam" if sparse_embedding else "Adam"
+            print(f"ContrastiveTrainer, {optimizer:>10}, {workers} workers: {stats['samples_per_second']:8.0f} samples/s")
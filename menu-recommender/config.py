@@ -6,6 +6,76 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     ENV: str = os.environ.get("ENV", default="development")
 
+    # Recipe search: "exact" scans all embeddings, "ivfpq" uses the approximate index built by scripts/build_ann_index.py
+    SEARCH_MODE: str = "exact"
+    IVFPQ_INDEX_PATH: str = "./embeddings/recipe_index_ivfpq.npz"
+    IVFPQ_N_PROBE: int = 16
+    IVFPQ_RERANK: bool = False
+
+    # Exact search split over this many processes with the embeddings in shared memory, 1 or less searches in-process
+    SEARCH_SHARDS: int = 0
+
+    # Memory-mapped (float16 / int8) embedding store written by scripts/build_embedding_store.py, replaces the .pt file
+    EMBEDDING_STORE_PATH: str | None = None
+
+    # Memory-mapped columnar recipe catalog written by scripts/build_recipe_catalog.py, replaces recipes_for_app.pkl
+    RECIPE_CATALOG_PATH: str | None = None
+
+    # Memory-mapped ingredient vocab written by scripts/build_ingredient_vocab.py, replaces ingredient2idx.pkl
+    INGREDIENT_VOCAB_PATH: str | None = None
+
+    # Embedding table exported by scripts/export_numpy_model.py, replaces the model: serving never imports torch then.
+    # Requires EMBEDDING_STORE_PATH
+    QUERY_ENCODER_PATH: str | None = None
+
+    # Cache of query embeddings and top-k results, 0 disables it
+    RESULT_CACHE_SIZE: int = 10000
+    RESULT_CACHE_TTL_SECONDS: float = 3600
+
+    # Pool of pre-sampled menus served by /menusampler, 0 disables it
+    MENU_SAMPLER_POOL_SIZE: int = 256
+    MENU_SAMPLER_POOL_TOP_K: int = 12
+    MENU_SAMPLER_REFRESH_COUNT: int = 16
+    MENU_SAMPLER_REFRESH_SECONDS: float = 5
+
+    # Micro-batching of concurrent /recommender requests, a max size of 1 or less disables it
+    MICRO_BATCH_MAX_SIZE: int = 32
+    MICRO_BATCH_WINDOW_MS: float = 2
+
+    # On-disk cache of the generated /menuimage images, least recently used images are evicted above the size limit
+    IMAGE_CACHE_DIR: str = "./images/cache"
+    IMAGE_CACHE_MAX_MB: float = 512
+
+    # Images are generated by this many background workers from a queue of at most IMAGE_QUEUE_SIZE requested dishes.
+    # Prewarming queues the dishes of every /recommender and /menusampler response (one paid generation per new dish),
+    # at most IMAGE_PREWARM_QUEUE_SIZE of them besides the requested ones
+    IMAGE_WORKERS: int = 4
+    IMAGE_QUEUE_SIZE: int = 256
+    IMAGE_PREWARM_QUEUE_SIZE: int = 64
+    IMAGE_PREWARM: bool = False
+
+    # Clients may reuse a /menuimage response this long, then revalidate it with its ETag
+    IMAGE_MAX_AGE_SECONDS: int = 7 * 24 * 3600
+
+    # Sizes of the /menuimage?size= thumbnails, resized in a pool of IMAGE_THUMBNAIL_PROCESSES processes. Needs Pillow,
+    # without it the original images are served
+    IMAGE_THUMBNAIL_SIZES: list[int] = [128, 256]
+    IMAGE_THUMBNAIL_PROCESSES: int = 2
+
+    # Hot reload of the artifacts above: POST /api/v1/admin/reload with the X-Admin-Token header (disabled without a
+    # token), or when their files change, checked every RELOAD_WATCH_SECONDS (0 disables it). The replaced artifacts
+    # are released RELOAD_DRAIN_SECONDS after the swap, the requests still running on them are done by then
+    ADMIN_TOKEN: str | None = None
+    RELOAD_WATCH_SECONDS: float = 0
+    RELOAD_DRAIN_SECONDS: float = 30
+
+    # Per worker: threads of the inference executor running the model and the scoring, and torch intra-op / inter-op
+    # threads (0 keeps the torch default of one per core). The query model is tiny, one torch thread per inference
+    # thread avoids oversubscription. Pick values with benchmarks/load_test.py
+    INFERENCE_THREADS: int = 2
+    TORCH_THREADS: int = 1
+    TORCH_INTEROP_THREADS: int = 1
+
 
 # Init the settings of the application on startup
 settings: Settings = Settings()
@@ -0,0 +1,39 @@
+import secrets
+
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import JSONResponse
+
+import config
+from services.artifact_reloader import ReloadInProgress
+
+router = APIRouter()
+
+
+def _authorized(admin_token: str | None) -> bool:
+    # Without a configured ADMIN_TOKEN the admin endpoints are disabled
+    expected = config.settings.ADMIN_TOKEN
+    return bool(expected) and admin_token is not None and secrets.compare_digest(admin_token, expected)
+
+
+@router.post("/reload", tags=["api admin"], status_code=200)
+async def reload_artifacts(request: Request, x_admin_token: str | None = Header(default=None)) -> JSONResponse:
+    # Loads the artifacts in the background and swaps them in, the current ones serve until then and on failure
+    if not _authorized(x_admin_token):
+        return JSONResponse(status_code=403, content={"detail": "Invalid or missing X-Admin-Token"})
+
+    artifact_reloader = request.app.state.artifact_reloader
+    try:
+        stats = await artifact_reloader.reload()
+    except ReloadInProgress as e:
+        return JSONResponse(status_code=409, content={"detail": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=422, content={"detail": f"Artifacts rejected, still serving the current ones: {e}"})
+
+    return JSONResponse(status_code=200, content=stats)
+
+@router.get("/reload", tags=["api admin"], status_code=200)
+async def reload_status(request: Request, x_admin_token: str | None = Header(default=None)) -> JSONResponse:
+    if not _authorized(x_admin_token):
+        return JSONResponse(status_code=403, content={"detail": "Invalid or missing X-Admin-Token"})
+
+    return JSONResponse(status_code=200, content=request.app.state.artifact_reloader.stats())
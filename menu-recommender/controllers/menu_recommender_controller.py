@@ -1,27 +1,142 @@
-from fastapi import APIRouter, Request
+import asyncio
+from typing import Literal
+
+from fastapi import APIRouter, Body, Query, Request
 from fastapi.responses import JSONResponse
 
-from services.image_service import ImageService
+from services.image_queue import ImageQueueFull
 
 router = APIRouter()
 
 
+async def _run_inference(request: Request, fn, *args):
+    # Model and scoring work runs on the dedicated inference executor, not on Starlette's threadpool
+    return await asyncio.get_running_loop().run_in_executor(request.app.state.inference_executor, fn, *args)
+
+
+def _recipe_names(result) -> list[str]:
+    # Dish names of a recipe, a list of recipes, a resolution dict with "recipes" or a list of any of these
+    if isinstance(result, dict):
+        return [result["name"]] if "name" in result else _recipe_names(result.get("recipes", []))
+    return [name for item in result for name in _recipe_names(item)]
+
+
 @router.post("/recommender", tags=["api menu recommender"], status_code=200)
-def inventory_recommender(request: Request, ingredients: list[str], top_k: int = 3) -> JSONResponse:
+async def inventory_recommender(request: Request, ingredients: list[str], top_k: int = Query(default=3, ge=1, le=100), include_resolution: bool = False,
+                                exclude_ingredients: list[str] = Query(default=[]), require_ingredients: list[str] = Query(default=[]),
+                                ranking: Literal["similarity", "pantry"] = "similarity", pantry_weight: float = Query(default=0.5, ge=0, le=1)) -> JSONResponse:
     recommender_service = request.app.state.recommender_service
-    top_k_recipes = recommender_service.get_recommendations(ingredients, top_k)
+    batch_scheduler = request.app.state.batch_scheduler
+    if ranking == "pantry":
+        # Cook from the pantry: ingredients is the pantry, recipes it covers best rank first
+        top_k_recipes = await _run_inference(
+            request, recommender_service.get_pantry_recommendations, ingredients, top_k, pantry_weight, include_resolution,
+            exclude_ingredients, require_ingredients
+        )
+    elif batch_scheduler is not None:
+        # Concurrent requests are micro-batched into one forward pass and one scoring call
+        top_k_recipes = await batch_scheduler.submit(ingredients, top_k, include_resolution, exclude_ingredients, require_ingredients)
+    else:
+        top_k_recipes = await _run_inference(
+            request, recommender_service.get_recommendations, ingredients, top_k, include_resolution, exclude_ingredients, require_ingredients
+        )
 
+    request.app.state.image_queue.prewarm(_recipe_names(top_k_recipes))
     return JSONResponse(status_code=200, content=top_k_recipes)
 
-@router.get("/menusampler", tags=["api menu recommender"], status_code=200)
-def next_menu_sampler(request: Request, top_k: int = 6):
+@router.post("/recommender/batch", tags=["api menu recommender"], status_code=200)
+async def batch_inventory_recommender(request: Request, queries: list[list[str]], top_k: int = Query(default=3, ge=1, le=100), include_resolution: bool = False,
+                                      exclude_ingredients: list[str] = Query(default=[]), require_ingredients: list[str] = Query(default=[])) -> JSONResponse:
+    recommender_service = request.app.state.recommender_service
+    top_k_recipes = await _run_inference(
+        request, recommender_service.get_batch_recommendations, queries, top_k, include_resolution, exclude_ingredients, require_ingredients
+    )
+
+    request.app.state.image_queue.prewarm(_recipe_names(top_k_recipes))
+    return JSONResponse(status_code=200, content=top_k_recipes)
+
+@router.get("/recommender/cache", tags=["api menu recommender"], status_code=200)
+def recommender_cache_stats(request: Request) -> JSONResponse:
+    recommender_service = request.app.state.recommender_service
+
+    return JSONResponse(status_code=200, content=recommender_service.cache_stats())
+
+@router.post("/week", tags=["api menu recommender"], status_code=200)
+async def weekly_menu(request: Request, ingredients: list[str] | None = Body(default=None), mmr_lambda: float = Query(default=0.7, ge=0, le=1),
+                      candidates: int = Query(default=100, ge=7, le=1000), exclude_ingredients: list[str] = Query(default=[]),
+                      require_ingredients: list[str] = Query(default=[])) -> JSONResponse:
+    # Seven diverse recipes, mmr_lambda trades relevance (1) against diversity (0)
     recommender_service = request.app.state.recommender_service
-    top_k_recipes = recommender_service.sample_recommendations(top_k)
+    menu = await _run_inference(
+        request, recommender_service.get_weekly_menu, ingredients, mmr_lambda, candidates, exclude_ingredients, require_ingredients
+    )
+
+    return JSONResponse(status_code=200, content=menu)
+
+@router.get("/menusampler", tags=["api menu recommender"], status_code=200)
+async def next_menu_sampler(request: Request, top_k: int = Query(default=6, ge=1, le=100)):
+    # Served from the pre-computed pool, sampled on the request only if the pool cannot answer
+    top_k_recipes = request.app.state.menu_sampler_pool.take(top_k)
+    if top_k_recipes is None:
+        recommender_service = request.app.state.recommender_service
+        top_k_recipes = await _run_inference(request, recommender_service.sample_recommendations, top_k)
 
+    request.app.state.image_queue.prewarm(_recipe_names(top_k_recipes))
     return JSONResponse(status_code=200, content=top_k_recipes)
 
 @router.get("/menuimage", tags=["api menu image"], status_code=200)
-def generate_menu_image(name: str):
-    image_service = ImageService()
-    return image_service.generate_image(name)
+async def generate_menu_image(request: Request, name: str, wait: float = Query(default=0, ge=0, le=60),
+                              size: int | None = Query(default=None, gt=0)):
+    # A cached image is served at once, otherwise its generation is queued and awaited for at most wait seconds:
+    # 202 pending means ask again later. size asks for a thumbnail, resized from the original once it is ready
+    image_queue = request.app.state.image_queue
+    image_variants = request.app.state.image_variants
+    if size is not None and not image_variants.sizes:
+        size = None
+    elif size is not None and size not in image_variants.sizes:
+        return JSONResponse(status_code=400, content={"detail": f"size must be one of {image_variants.sizes}"})
+
+    try:
+        image = await image_queue.submit(name)
+    except ImageQueueFull:
+        return JSONResponse(status_code=503, content={"name": name, "status": "busy"}, headers={"Retry-After": "5"})
+
+    if not image.done() and wait > 0:
+        try:
+            # Shielded: a timed-out request must not cancel the generation other requests share
+            await asyncio.wait_for(asyncio.shield(image), wait)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # Reported below from the future
+            pass
+
+    if not image.done():
+        return JSONResponse(status_code=202, content={"name": name, "status": "pending"}, headers={"Retry-After": "2", "Cache-Control": "no-store"})
+    if image.exception() is not None:
+        return JSONResponse(status_code=502, content={"name": name, "status": "failed", "detail": str(image.exception())})
+
+    path = image.result()
+    if size is not None:
+        try:
+            path = await image_variants.path(path, size)
+        except Exception as e:
+            return JSONResponse(status_code=502, content={"name": name, "status": "failed", "detail": str(e)})
+    # The ETag of an image not hashed by this process yet reads the whole file: off the event loop
+    return await asyncio.get_running_loop().run_in_executor(
+        None, image_queue.image_service.image_response, name, path, request.headers.get("if-none-match"), size
+    )
+
+@router.get("/menuimage/status", tags=["api menu image"], status_code=200)
+async def menu_image_status(request: Request, name: str) -> JSONResponse:
+    # ready, pending or missing, never starts a generation
+    image_queue = request.app.state.image_queue
+
+    return JSONResponse(status_code=200, content={"name": name, "status": await image_queue.status(name)})
+
+@router.get("/menuimage/cache", tags=["api menu image"], status_code=200)
+def menu_image_cache_stats(request: Request) -> JSONResponse:
+    image_queue = request.app.state.image_queue
+
+    return JSONResponse(status_code=200, content={**image_queue.image_service.image_cache.stats(), "queue": image_queue.stats()})
 
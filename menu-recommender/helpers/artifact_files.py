@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def replaced_directory(path: str):
+    """
+    Yields a new, empty directory next to path to write an artifact set into, renamed to path once the block succeeds.
+
+    The files of the previous set are never truncated or rewritten: serving processes that memory-mapped them would
+    read garbage or die of a SIGBUS. The previous directory is renamed aside and deleted, its files stay readable
+    through the existing mappings until the service is reloaded. A failed write leaves path untouched.
+    """
+    path = os.path.normpath(path)
+    parent, name = os.path.split(path)
+    parent = parent or "."
+    os.makedirs(parent, exist_ok=True)
+
+    temporary_path = tempfile.mkdtemp(prefix=f".{name}.tmp-", dir=parent)
+    try:
+        yield temporary_path
+        # mkdtemp creates the directory for the owner only
+        os.chmod(temporary_path, 0o755)
+    except BaseException:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        raise
+
+    retired_path = None
+    if os.path.exists(path):
+        retired_path = tempfile.mkdtemp(prefix=f".{name}.old-", dir=parent)
+        os.rename(path, os.path.join(retired_path, name))
+    os.rename(temporary_path, path)
+    if retired_path is not None:
+        shutil.rmtree(retired_path, ignore_errors=True)
@@ -1,4 +1,5 @@
 import logging
+import logging.config
 
 
 # convenience ai_management_helpers to be used in the other modules/files
@@ -41,6 +41,37 @@ class RecipeEmbeddingModel(nn.Module):
         else:
             raise NotImplementedError(f"Unknown pool_type: {self.pooling}")
 
+        return self._heads(recipe_embeds)
+
+    def forward_packed(self, ingredient_ids, offsets, sparse=False):
+        # Same as forward for recipes packed back to back without padding: recipe i is
+        # ingredient_ids[offsets[i]:offsets[i + 1]], offsets has one entry more than there are recipes.
+        # sparse gives the embedding table a sparse gradient of the used rows only
+        lengths = offsets[1:] - offsets[:-1]
+
+        if self.pooling == "attention":
+            # Softmax of the attention logits within every recipe
+            recipes = torch.repeat_interleave(torch.arange(len(lengths), device=offsets.device), lengths)
+            embeds = F.embedding(ingredient_ids, self.embedding.weight, sparse=sparse)
+            attn_logits = self.attention(embeds).squeeze(-1)
+            attn_max = torch.full((len(lengths),), -1e9, dtype=attn_logits.dtype, device=attn_logits.device)
+            attn_max = attn_max.scatter_reduce(0, recipes, attn_logits, reduce="amax")
+            attn_exp = torch.exp(attn_logits - attn_max[recipes])
+            attn_sum = torch.zeros(len(lengths), dtype=attn_exp.dtype, device=attn_exp.device).index_add(0, recipes, attn_exp)
+            attn_weights = (attn_exp / attn_sum[recipes]).unsqueeze(-1)
+            recipe_embeds = torch.zeros(len(lengths), embeds.shape[-1], dtype=embeds.dtype, device=embeds.device)
+            recipe_embeds = recipe_embeds.index_add(0, recipes, embeds * attn_weights)
+        elif self.pooling == "mean":
+            # One EmbeddingBag sum per recipe instead of padding and masking
+            sums = F.embedding_bag(ingredient_ids, self.embedding.weight, offsets, mode="sum", include_last_offset=True,
+                                 sparse=sparse)
+            recipe_embeds = sums / (lengths.to(sums.dtype).unsqueeze(-1) + 1e-8)
+        else:
+            raise NotImplementedError(f"Unknown pool_type: {self.pooling}")
+
+        return self._heads(recipe_embeds)
+
+    def _heads(self, recipe_embeds):
         # normalize for cosine similarity
         recipe_embeds = F.normalize(recipe_embeds, dim=-1)
 
@@ -0,0 +1,36 @@
+"""
+Builds the approximate (IVF + PQ) recipe search index from the saved recipe embeddings.
+
+    python -m scripts.build_ann_index --lists 1024 --subvectors 16
+"""
+import argparse
+import time
+
+import torch
+
+from services.ivfpq_index import IVFPQSearchIndex
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="./embeddings/recipe_embeddings.pt")
+    parser.add_argument("--output", default="./embeddings/recipe_index_ivfpq.npz")
+    parser.add_argument("--lists", type=int, default=1024, help="number of coarse clusters")
+    parser.add_argument("--subvectors", type=int, default=16, help="number of PQ sub-vectors (bytes per recipe)")
+    parser.add_argument("--iterations", type=int, default=20, help="k-means iterations")
+    parser.add_argument("--sample-size", type=int, default=100_000, help="number of recipes to train the quantizers on")
+    args = parser.parse_args()
+
+    recipe_embeddings = torch.load(args.embeddings).cpu().numpy()
+
+    start = time.perf_counter()
+    index = IVFPQSearchIndex.train(
+        recipe_embeddings,
+        n_lists=args.lists,
+        n_subvectors=args.subvectors,
+        n_iter=args.iterations,
+        sample_size=args.sample_size
+    )
+    index.save(args.output)
+
+    print(f"Indexed {len(index)} recipes into {index.n_lists} lists in {time.perf_counter() - start:.1f}s -> {args.output}")
@@ -0,0 +1,23 @@
+"""
+Writes the recipe embeddings as a memory-mapped float32 / float16 / int8 embedding store.
+
+    python -m scripts.build_embedding_store --dtype int8 --output ./embeddings/recipe_store_int8
+"""
+import argparse
+
+import torch
+
+from services.embedding_store import STORE_DTYPES, EmbeddingStore
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default="./embeddings/recipe_embeddings.pt")
+    parser.add_argument("--output", default="./embeddings/recipe_store")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default="int8")
+    args = parser.parse_args()
+
+    EmbeddingStore.write(args.output, torch.load(args.embeddings).cpu().numpy(), dtype=args.dtype)
+    store = EmbeddingStore.open(args.output)
+
+    print(f"Wrote {len(store)} x {store.dim} {store.dtype} recipe embeddings -> {args.output}")
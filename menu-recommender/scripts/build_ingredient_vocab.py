@@ -0,0 +1,22 @@
+"""
+Converts the pickled ingredient2idx dict into the memory-mapped sorted ingredient vocab.
+
+    python -m scripts.build_ingredient_vocab --output ./dataset/ingredient_vocab
+"""
+import argparse
+import pickle
+
+from services.ingredient_vocab import IngredientVocab
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--output", default="./dataset/ingredient_vocab")
+    args = parser.parse_args()
+
+    with open(args.vocab, "rb") as f:
+        ingredient_vocab = IngredientVocab.from_dict(pickle.load(f))
+    ingredient_vocab.write(args.output)
+
+    print(f"Wrote {len(ingredient_vocab)} ingredients ({len(ingredient_vocab.name_blob)} bytes of names) -> {args.output}")
@@ -0,0 +1,27 @@
+"""
+Converts the joblib recipe DataFrame into the memory-mapped columnar recipe catalog.
+
+    python -m scripts.build_recipe_catalog --output ./dataset/recipe_catalog
+"""
+import argparse
+import pickle
+
+import joblib
+
+from services.recipe_catalog import RecipeCatalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="./dataset/recipes_for_app.pkl")
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--output", default="./dataset/recipe_catalog")
+    args = parser.parse_args()
+
+    with open(args.vocab, "rb") as f:
+        ingredient2idx = pickle.load(f)
+
+    catalog = RecipeCatalog.from_dataframe(joblib.load(args.dataset), ingredient2idx)
+    catalog.write(args.output)
+
+    print(f"Wrote {len(catalog)} recipes with {len(catalog.ingredient_ids)} ingredient ids -> {args.output}")
@@ -0,0 +1,57 @@
+"""
+Builds the recipe embeddings and the row-aligned recipe catalog from recipes_clean.csv, streamed chunk by chunk, or
+only the embeddings of a catalog written by scripts/clean_recipes.py (--catalog), straight from its ingredient ids.
+
+Progress is checkpointed in --work-dir after every chunk, running the same command again resumes an interrupted build.
+
+    python -m scripts.build_recipe_index --dataset ./dataset/recipes_clean.csv --chunk-size 20000
+    python -m scripts.build_recipe_index --catalog ./dataset/recipe_catalog --chunk-size 20000
+"""
+import argparse
+import json
+import pickle
+
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.embedding_store import STORE_DTYPES
+from services.index_builder import RecipeIndexBuilder
+from services.query_encoder import QueryEncoder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--dataset", default="./dataset/recipes_clean.csv")
+    source.add_argument("--catalog", help="cleaned recipe catalog, replaces --dataset and --catalog-output")
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--model", default="./models/recipe_embedding_model.pt")
+    parser.add_argument("--work-dir", default="./embeddings/recipe_index_build")
+    parser.add_argument("--catalog-output", default="./dataset/recipe_catalog")
+    parser.add_argument("--store-output", default="./embeddings/recipe_store")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default="float32")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads, 0 keeps the torch default")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and build from scratch")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    with open(args.vocab, "rb") as f:
+        ingredient2idx = pickle.load(f)
+
+    # Offline build on the CPU, embeddings are written as float32 whatever device trained the model
+    model = RecipeEmbeddingModel(vocab_size=len(ingredient2idx), embedding_dim=128)
+    model.load_state_dict(torch.load(args.model, map_location="cpu"))
+    model.eval()
+
+    builder = RecipeIndexBuilder(QueryEncoder(model), ingredient2idx, args.work_dir, chunk_size=args.chunk_size)
+    if args.catalog:
+        checkpoint = builder.build_from_catalog(args.catalog, restart=args.restart)
+    else:
+        checkpoint = builder.build(args.dataset, restart=args.restart)
+    catalog = builder.finalize(args.store_output, args.catalog_output, dtype=args.dtype)
+
+    print(json.dumps(RecipeIndexBuilder.throughput(checkpoint), indent=2))
+    print(f"Wrote {len(catalog)} recipes -> {args.catalog or args.catalog_output} and {args.dtype} embeddings -> {args.store_output}")
@@ -0,0 +1,30 @@
+"""
+Cleans the raw recipes_data.csv into the memory-mapped recipe catalog, streamed chunk by chunk: the title fixes of
+notebooks/clean_dataset.ipynb and the row filters and NER tokenization of notebooks/food_recommender.ipynb.
+
+The catalog feeds scripts/build_recipe_index.py --catalog and scripts/mine_training_pairs.py --catalog.
+
+    python -m scripts.clean_recipes --dataset ./dataset/recipes_data.csv --output ./dataset/recipe_catalog
+"""
+import argparse
+import json
+import pickle
+
+from services.recipe_cleaning import RecipeCleaner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="./dataset/recipes_data.csv")
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--output", default="./dataset/recipe_catalog")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    with open(args.vocab, "rb") as f:
+        ingredient2idx = pickle.load(f)
+
+    stats = RecipeCleaner(ingredient2idx, chunk_size=args.chunk_size).clean(args.dataset, args.output)
+
+    print(json.dumps(stats, indent=2))
+    print(f"Wrote {stats['recipes']} of {stats['rows_read']} recipes -> {args.output}")
@@ -0,0 +1,34 @@
+"""
+Exports the embedding table of the recipe embedding model and the recipe embedding matrix as plain arrays, for
+serving without torch (QUERY_ENCODER_PATH and EMBEDDING_STORE_PATH).
+
+    python -m scripts.export_numpy_model --encoder-output ./models/query_encoder --store-output ./embeddings/recipe_store
+"""
+import argparse
+
+import torch
+
+from services.embedding_store import STORE_DTYPES, EmbeddingStore
+from services.numpy_query_encoder import NumpyQueryEncoder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="./models/recipe_embedding_model.pt")
+    parser.add_argument("--embeddings", default="./embeddings/recipe_embeddings.pt")
+    parser.add_argument("--encoder-output", default="./models/query_encoder")
+    parser.add_argument("--store-output", default="./embeddings/recipe_store")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default="float32")
+    args = parser.parse_args()
+
+    state_dict = torch.load(args.model, map_location="cpu")
+    if "attention.weight" in state_dict:
+        raise ValueError("Only mean pooling models can be served without torch")
+
+    NumpyQueryEncoder.write(args.encoder_output, state_dict["embedding.weight"].numpy())
+    encoder = NumpyQueryEncoder.open(args.encoder_output)
+    print(f"Wrote {encoder.vocab_size} x {encoder.dim} embedding table -> {args.encoder_output}")
+
+    EmbeddingStore.write(args.store_output, torch.load(args.embeddings).cpu().numpy(), dtype=args.dtype)
+    store = EmbeddingStore.open(args.store_output)
+    print(f"Wrote {len(store)} x {store.dim} {store.dtype} recipe embeddings -> {args.store_output}")
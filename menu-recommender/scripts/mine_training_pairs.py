@@ -0,0 +1,49 @@
+"""
+Mines the positive (exactly one shared ingredient) and negative recipe pairs of the contrastive training.
+
+Recipes are either random like the notebook (--synthetic) or the recipes of a catalog written by
+scripts/build_recipe_index.py (--catalog). The training loop reads the output with TrainingPairs.open.
+
+    python -m scripts.mine_training_pairs --synthetic 20000 --positives 7500 --negatives 7500
+    python -m scripts.mine_training_pairs --catalog ./dataset/recipe_catalog --positives 500000 --negatives 500000
+"""
+import argparse
+import json
+import pickle
+import time
+
+from services.pair_mining import PairMiner, synthetic_recipes
+from services.recipe_catalog import RecipeCatalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, help="number of random recipes of 5-7 ingredients")
+    source.add_argument("--catalog", help="recipe catalog directory")
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--positives", type=int, default=7500)
+    parser.add_argument("--negatives", type=int, default=7500)
+    parser.add_argument("--block-pairs", type=int, default=1 << 24, help="candidate pairs materialized per block")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="./dataset/training_pairs.npz")
+    args = parser.parse_args()
+
+    with open(args.vocab, "rb") as f:
+        vocab_size = len(pickle.load(f))
+
+    if args.synthetic is not None:
+        ingredient_indptr, ingredient_ids = synthetic_recipes(args.synthetic, vocab_size, seed=args.seed)
+    else:
+        catalog = RecipeCatalog.open(args.catalog)
+        ingredient_indptr, ingredient_ids = catalog.ingredient_indptr, catalog.ingredient_ids
+
+    started = time.perf_counter()
+    miner = PairMiner(ingredient_indptr, ingredient_ids, vocab_size, block_pairs=args.block_pairs)
+    training_pairs = miner.mine(args.positives, args.negatives, seed=args.seed)
+    training_pairs.stats["mining_seconds"] = round(time.perf_counter() - started, 3)
+    training_pairs.write(args.output)
+
+    print(json.dumps(training_pairs.stats, indent=2))
+    print(f"Wrote {int(training_pairs.labels.sum())} positive and {int(len(training_pairs) - training_pairs.labels.sum())} "
+          f"negative pairs -> {args.output}")
@@ -0,0 +1,61 @@
+"""
+Trains the RecipeEmbeddingModel on the pairs of scripts/mine_training_pairs.py, on the CPU.
+
+Checkpoints go to --checkpoint-dir, running the same command again resumes an interrupted run. The final weights are
+written to --output in the format the app loads.
+
+    python -m scripts.train_embedding_model --pairs ./dataset/training_pairs.npz --epochs 60 --workers 2
+"""
+import argparse
+import json
+import pickle
+
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.pair_mining import TrainingPairs
+from services.training import ContrastiveTrainer, PairDataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", default="./dataset/training_pairs.npz")
+    parser.add_argument("--vocab", default="./dataset/ingredient2idx.pkl")
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--embedding-dim", type=int, default=128)
+    parser.add_argument("--pooling", choices=("mean", "attention"), default="mean")
+    parser.add_argument("--positives-only", action="store_true", help="train on the positive pairs only")
+    parser.add_argument("--dense-embedding", action="store_true",
+                        help="dense Adam on the whole embedding table like the notebook, instead of sparse gradients + SparseAdam")
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader worker processes packing the batches")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads, 0 keeps the torch default")
+    parser.add_argument("--checkpoint-dir", default="./models/training")
+    parser.add_argument("--checkpoint-every", type=int, default=500, help="steps between checkpoints, 0 only per epoch")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="./models/recipe_embedding_model.pt")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    with open(args.vocab, "rb") as f:
+        vocab_size = len(pickle.load(f))
+
+    torch.manual_seed(args.seed)
+    model = RecipeEmbeddingModel(vocab_size=vocab_size, embedding_dim=args.embedding_dim, pooling=args.pooling)
+    dataset = PairDataset(TrainingPairs.open(args.pairs), positives_only=args.positives_only)
+    trainer = ContrastiveTrainer(
+        model, dataset, args.checkpoint_dir, batch_size=args.batch_size, lr=args.lr, num_workers=args.workers,
+        checkpoint_every=args.checkpoint_every, seed=args.seed, sparse_embedding=not args.dense_embedding
+    )
+    if not args.restart and trainer.load_checkpoint():
+        print(f"Resuming at epoch {trainer.epoch + 1}, batch {trainer.batch}")
+
+    stats = trainer.train(args.epochs)
+    torch.save(model.state_dict(), args.output)
+
+    print(json.dumps(stats, indent=2))
+    print(f"Wrote the model trained on {len(dataset)} pairs -> {args.output}")
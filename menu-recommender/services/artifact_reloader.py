@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from helpers.logger import logger
+
+
+class ReloadInProgress(Exception):
+    pass
+
+
+class ArtifactReloader:
+    """
+    Double-buffered hot reload of the RecommenderService: the new artifact set is loaded and validated next to the
+    serving one on the executor, then published by a single reference swap on the event loop. Requests that already
+    hold the old service finish on it, it is closed drain_seconds after the swap. A failed load or validation leaves
+    the serving service untouched.
+
+    Triggered by reload() (the admin endpoint) or by watch(), which reloads once the artifact fingerprint differs from
+    the serving version and is the same on two polls in a row (files still being copied are not loaded). Artifacts with
+    the serving version are neither loaded nor published, the caches of the serving set stay warm.
+    """
+
+    def __init__(self, load, fingerprint, service_provider, publish, drain_seconds: float = 30, executor=None):
+        # load() returns a validated RecommenderService, fingerprint() the artifact version of the files on disk now
+        self.load = load
+        self.fingerprint = fingerprint
+        self.service_provider = service_provider
+        self.publish = publish
+        self.drain_seconds = drain_seconds
+        self.executor = executor
+
+        self._lock = asyncio.Lock()
+        self._loading = None
+        self._retiring = set()
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+
+    @property
+    def reloading(self) -> bool:
+        return self._lock.locked()
+
+    async def reload(self, fingerprint: str | None = None) -> dict:
+        # fingerprint: the artifact version on disk if the caller just computed it
+        if self._lock.locked():
+            raise ReloadInProgress("A reload is already running")
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            try:
+                if fingerprint is None:
+                    fingerprint = await loop.run_in_executor(self.executor, self.fingerprint)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = repr(e)
+                logger.exception("Fingerprinting the recommender artifacts failed, the current ones keep serving")
+                raise
+            if fingerprint == self.service_provider().artifact_version:
+                return {**self.stats(), "unchanged": True}
+
+            self._loading = loop.run_in_executor(self.executor, self.load)
+            try:
+                # Shielded: cancelled on shutdown, the load still ends in its thread and close() releases it
+                service = await asyncio.shield(self._loading)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._loading = None
+                self.failures += 1
+                self.last_error = repr(e)
+                logger.exception("Reloading the recommender artifacts failed, the current ones keep serving")
+                raise
+            self._loading = None
+
+            previous = self.service_provider()
+            if service.artifact_version == previous.artifact_version:
+                # The files were changed back while loading
+                await loop.run_in_executor(self.executor, service.close)
+                return {**self.stats(), "unchanged": True}
+            self.publish(service)
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - started
+
+            if previous.result_cache is not None and previous.result_cache is service.result_cache:
+                # Entries are keyed by the artifact version, the old ones would never be hit again
+                previous.result_cache.clear()
+            retiring = asyncio.create_task(self._retire(previous))
+            self._retiring.add(retiring)
+            retiring.add_done_callback(self._retiring.discard)
+
+        logger.info(
+            f"Reloaded the recommender artifacts {previous.artifact_version} -> {service.artifact_version} in "
+            f"{self.last_reload_seconds:.1f}s, {len(service.recipe_catalog)} recipes"
+        )
+        return {**self.stats(), "unchanged": False}
+
+    async def _retire(self, service):
+        try:
+            await asyncio.sleep(self.drain_seconds)
+        finally:
+            # Also on shutdown: the drain is cut short, the resources are released all the same
+            await asyncio.get_running_loop().run_in_executor(self.executor, service.close)
+
+    async def watch(self, interval_seconds: float):
+        loop = asyncio.get_running_loop()
+        previous, failed = None, None
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                current = await loop.run_in_executor(self.executor, self.fingerprint)
+            except Exception:
+                # Files missing while the artifacts are being replaced
+                logger.exception("Fingerprinting the recommender artifacts failed")
+                continue
+
+            if current != self.service_provider().artifact_version and current == previous and current != failed:
+                logger.info(f"Recommender artifacts changed on disk ({current}), reloading")
+                try:
+                    await self.reload(current)
+                except ReloadInProgress:
+                    pass
+                except Exception:
+                    # Logged by reload, this artifact set is not tried again until the files change
+                    failed = current
+            previous = current
+
+    async def close(self):
+        if self._loading is not None:
+            # A reload cancelled while loading, its artifacts were never published
+            try:
+                service = await self._loading
+                await asyncio.get_running_loop().run_in_executor(self.executor, service.close)
+            except Exception:
+                pass
+            self._loading = None
+
+        retiring = list(self._retiring)
+        for task in retiring:
+            task.cancel()
+        await asyncio.gather(*retiring, return_exceptions=True)
+
+    def stats(self) -> dict:
+        service = self.service_provider()
+        return {
+            "artifact_version": service.artifact_version,
+            "recipes": len(service.recipe_catalog),
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_reload_seconds": self.last_reload_seconds,
+            "retiring": len(self._retiring),
+        }
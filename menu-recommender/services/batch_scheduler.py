@@ -0,0 +1,100 @@
+import asyncio
+from dataclasses import dataclass
+
+from helpers.logger import logger
+
+
+@dataclass
+class _PendingRequest:
+    ingredients: list[str]
+    top_k: int
+    include_resolution: bool
+    exclude_ingredients: tuple[str, ...]
+    require_ingredients: tuple[str, ...]
+    future: asyncio.Future
+
+
+class BatchScheduler:
+    """
+    Micro-batching in front of the RecommenderService: requests arriving within window_ms of the first waiting one
+    (or until max_batch_size is reached) are answered by one batched forward pass and one scoring call.
+
+    Only one batch runs at a time, requests arriving meanwhile form the next batch, so the batch size grows with load.
+    """
+
+    def __init__(self, max_batch_size: int = 32, window_ms: float = 2, executor=None):
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_ms / 1000
+        self.executor = executor
+        self._queue = asyncio.Queue()
+
+    async def submit(self, ingredients: list[str], top_k: int, include_resolution: bool = False,
+                     exclude_ingredients: list[str] | None = None, require_ingredients: list[str] | None = None) -> list | dict:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(
+            ingredients, top_k, include_resolution, tuple(exclude_ingredients or ()), tuple(require_ingredients or ()), future
+        ))
+        return await future
+
+    async def _collect(self) -> list[_PendingRequest]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_seconds
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    @staticmethod
+    def _execute(recommender_service, batch: list[_PendingRequest]) -> list:
+        # One call per distinct filter with the largest top_k, every caller gets its own slice
+        groups = dict()
+        for position, pending in enumerate(batch):
+            groups.setdefault((pending.exclude_ingredients, pending.require_ingredients), list()).append(position)
+
+        responses = [None] * len(batch)
+        for (exclude_ingredients, require_ingredients), positions in groups.items():
+            top_k = max(batch[position].top_k for position in positions)
+            results = recommender_service.get_batch_recommendations(
+                [batch[position].ingredients for position in positions], top_k, include_resolution=True,
+                exclude_ingredients=list(exclude_ingredients), require_ingredients=list(require_ingredients)
+            )
+
+            for position, result in zip(positions, results):
+                pending = batch[position]
+                recipes = result["recipes"][:pending.top_k]
+                responses[position] = {**result, "recipes": recipes} if pending.include_resolution else recipes
+        return responses
+
+    async def run(self, service_provider):
+        # service_provider returns the current RecommenderService
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [pending for pending in batch if not pending.future.cancelled()]
+            if not batch:
+                continue
+
+            try:
+                responses = await loop.run_in_executor(self.executor, self._execute, service_provider(), batch)
+            except Exception as e:
+                logger.exception(f"Recommender batch of {len(batch)} requests failed")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+
+            for pending, response in zip(batch, responses):
+                if not pending.future.done():
+                    pending.future.set_result(response)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from services.search_index import normalize_rows
+
+
+def mmr_rerank(relevance: np.ndarray, candidate_vectors: np.ndarray, count: int, mmr_lambda: float = 0.7) -> np.ndarray:
+    """
+    Maximal marginal relevance over a batch of candidate sets: picks count candidates per query, each maximizing
+    mmr_lambda * relevance - (1 - mmr_lambda) * (highest cosine similarity to the already picked ones).
+
+    relevance is [queries, candidates] (-inf for padding), candidate_vectors [queries, candidates, dim]. Returns the
+    picked candidate positions [queries, count] in pick order, -1 where a query has fewer valid candidates.
+    """
+    n_queries, n_candidates = relevance.shape
+    vectors = normalize_rows(candidate_vectors.reshape(-1, candidate_vectors.shape[-1])).reshape(candidate_vectors.shape)
+
+    # All pairwise similarities of every candidate set in one batched matmul [queries, candidates, candidates]
+    similarity = vectors @ vectors.transpose(0, 2, 1)
+    queries = np.arange(n_queries)
+
+    picks = np.full((n_queries, count), -1, dtype=np.int64)
+    available = np.isfinite(relevance)
+    relevance = np.where(available, relevance, 0)
+    max_similarity = np.zeros((n_queries, n_candidates), dtype=np.float32)
+    for step in range(min(count, n_candidates)):
+        # The first pick is the most relevant candidate, later ones are penalized by their closest picked one
+        penalty = (1 - mmr_lambda) * max_similarity if step > 0 else 0
+        scores = np.where(available, mmr_lambda * relevance - penalty, -np.inf)
+        best = np.argmax(scores, axis=1)
+
+        valid = available[queries, best]
+        picks[valid, step] = best[valid]
+        available[queries, best] = False
+        max_similarity = np.maximum(max_similarity, similarity[queries, best]) if step > 0 else similarity[queries, best]
+
+    return picks
@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+
+from helpers.artifact_files import replaced_directory
+from services.search_index import filtered_search, normalize_rows, top_k_rows
+
+STORE_DTYPES = ("float32", "float16", "int8")
+
+
+class EmbeddingStore:
+    """
+    Read-only, memory-mapped recipe embeddings on disk (float32, float16 or int8 with one scale per row).
+
+    The arrays are mapped, not read, so all workers on a host share one page-cache copy of the file.
+    """
+
+    def __init__(self, vectors: np.ndarray, scales: np.ndarray | None = None):
+        self.vectors = vectors  # [n_recipes, dim], normalized rows
+        self.scales = scales    # [n_recipes] float32, only for int8
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def dtype(self) -> str:
+        return str(self.vectors.dtype)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.vectors.shape
+
+    def __getitem__(self, rows) -> np.ndarray:
+        # Reads like a float32 matrix, block by block: ShardedSearchIndex dequantizes one block at a time
+        return self.take(rows)
+
+    @staticmethod
+    def write(path: str, recipe_embeddings, dtype: str = "int8", block_size: int = 65536):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown embedding store dtype: {dtype}")
+
+        # Written block by block, recipe_embeddings may be a memory-mapped file larger than memory. Into a new
+        # directory renamed into place: workers serving the previous store keep their mapped files
+        n_rows, dim = recipe_embeddings.shape
+        with replaced_directory(path) as directory:
+            vectors = np.lib.format.open_memmap(os.path.join(directory, "vectors.npy"), mode="w+", dtype=dtype, shape=(n_rows, dim))
+            scales = None
+            if dtype == "int8":
+                scales = np.lib.format.open_memmap(os.path.join(directory, "scales.npy"), mode="w+", dtype=np.float32, shape=(n_rows,))
+
+            for start in range(0, n_rows, block_size):
+                matrix = normalize_rows(recipe_embeddings[start:start + block_size])
+                if dtype == "int8":
+                    # Symmetric per-row quantization, x ~= codes * scale
+                    block_scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+                    vectors[start:start + block_size] = np.clip(np.rint(matrix / block_scales[:, np.newaxis]), -127, 127)
+                    scales[start:start + block_size] = block_scales
+                else:
+                    vectors[start:start + block_size] = matrix
+            vectors.flush()
+            if scales is not None:
+                scales.flush()
+
+            with open(os.path.join(directory, "manifest.json"), "w") as f:
+                json.dump({"dtype": dtype, "rows": int(n_rows), "dim": int(dim)}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingStore":
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if manifest["dtype"] == "int8" else None
+
+        if vectors.shape != (manifest["rows"], manifest["dim"]) or str(vectors.dtype) != manifest["dtype"]:
+            raise ValueError(f"Embedding store {path} does not match its manifest")
+        return cls(vectors, scales)
+
+    def take(self, rows) -> np.ndarray:
+        # Dequantized float32 copy of the given rows (slice or index array)
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, np.newaxis]
+        return vectors
+
+
+class StoreSearchIndex:
+    """Exact cosine search that scores directly on an EmbeddingStore, one block of rows at a time."""
+
+    def __init__(self, store: EmbeddingStore, block_size: int = 4096):
+        self.store = store
+        self.block_size = block_size
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def dim(self) -> int:
+        return self.store.dim
+
+    def vectors(self, rows) -> np.ndarray:
+        return self.store.take(rows)
+
+    def score(self, queries: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+        vectors, scales = self.store.vectors, self.store.scales
+
+        # Only one cache-sized block is up-cast to float32 at a time, the mapped matrix itself is never copied
+        scores = np.empty((queries.shape[0], len(self.store)), dtype=np.float32)
+        for start in range(0, len(self.store), self.block_size):
+            end = min(start + self.block_size, len(self.store))
+            block_scores = queries @ vectors[start:end].astype(np.float32, copy=False).T
+            if scales is not None:
+                block_scores *= scales[start:end]
+            scores[:, start:end] = block_scores
+        return scores
+
+    def score_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+
+        scores = np.empty((queries.shape[0], len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), self.block_size):
+            scores[:, start:start + self.block_size] = queries @ self.store.take(rows[start:start + self.block_size]).T
+        return scores
+
+    def search(self, queries: np.ndarray, top_k: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        if allowed is not None:
+            return filtered_search(self, queries, top_k, allowed)
+        return top_k_rows(self.score(queries), top_k)
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from helpers.logger import logger
+
+# A temporary file older than this is a write that was interrupted, not one in progress in another process
+STALE_WRITE_SECONDS = 600
+
+
+def image_key(name: str) -> str:
+    # Same dish, same key: case and whitespace do not matter, the hash keeps any name a safe, fixed-length filename
+    return hashlib.sha256(" ".join(name.lower().split()).encode()).hexdigest()
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache of generated images, bounded in bytes with least recently used eviction.
+
+    Files are <sha256 of the name>.webp in cache_dir and are written to a temporary file then renamed, a reader never
+    sees a partial image. A hit sets the access time of its file (the modification time stays the time it was written)
+    and the LRU order is rebuilt from the access times on startup, so the cache survives restarts.
+
+    The strong ETag of an image is the hash of its content, computed when written or, after a restart, when first asked.
+
+    Several processes (uvicorn workers) can share cache_dir: an image missing from the in-memory index is looked up on
+    disk and adopted, and every write re-reads the directory so max_bytes bounds the directory, not each process.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 2 ** 20, suffix: str = ".webp"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._etags = dict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        for filename in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, filename)
+            try:
+                # Left over by a write interrupted before its rename, recent ones may be another process writing
+                if filename.startswith(".tmp-") and os.stat(path).st_mtime < time.time() - STALE_WRITE_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._sync(self._scan())
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # The in-memory index only, no file system access: images written by another process may be missing
+        with self._lock:
+            return key in self._entries
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def key(self, path: str) -> str:
+        return os.path.basename(path).removesuffix(self.suffix)
+
+    def _scan(self) -> OrderedDict:
+        # key -> size of every image in the directory, least recently used first
+        files = list()
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(self.suffix) and not filename.startswith(".tmp-"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, filename))
+                except FileNotFoundError:
+                    # Evicted by another process meanwhile
+                    continue
+                files.append((stat.st_atime_ns, filename.removesuffix(self.suffix), stat.st_size))
+        return OrderedDict((key, size) for _, key, size in sorted(files))
+
+    def _sync(self, entries: OrderedDict):
+        # Under the lock: the index becomes the directory listing, the known ETags of images still there are kept
+        self._entries = entries
+        self._size = sum(entries.values())
+        self._etags = {key: etag for key, etag in self._etags.items() if key in entries}
+
+    def get(self, key: str, count: bool = True) -> str | None:
+        # count=False for a second look that is not a lookup of its own
+        with self._lock:
+            known = key in self._entries
+            if known:
+                self._entries.move_to_end(key)
+
+        # A key missing from the index may have been written by another process
+        path = self.path(key)
+        try:
+            stat = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except FileNotFoundError:
+            # Not cached, or removed from the directory behind the cache's back
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self._etags.pop(key, None)
+                self.misses += count
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = stat.st_size
+                self._size += stat.st_size
+            self.hits += count
+        return path
+
+    def etag(self, key: str) -> str:
+        with self._lock:
+            etag = self._etags.get(key)
+        if etag is None:
+            with open(self.path(key), "rb") as f:
+                etag = f'"{hashlib.file_digest(f, "sha256").hexdigest()[:32]}"'
+            with self._lock:
+                if key in self._entries:
+                    self._etags[key] = etag
+        return etag
+
+    def put(self, key: str, data: bytes) -> str:
+        # Atomic: written next to its final path, then renamed over it
+        fd, temporary_path = tempfile.mkstemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Same clock as the access times set by get(), the file system's own timestamps are coarser
+            now = time.time_ns()
+            os.utime(temporary_path, ns=(now, now))
+            os.replace(temporary_path, self.path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        # The directory, not this process's index, is what max_bytes bounds. Listed outside the lock: lookups are not
+        # held up by the scan
+        entries = self._scan()
+        with self._lock:
+            self._sync(entries)
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._etags[key] = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+            self._evict(keep=key)
+        return self.path(key)
+
+    def _evict(self, keep: str | None = None):
+        # Least recently used first, never the image that was just written
+        while self._size > self.max_bytes and len(self._entries) > (keep is not None):
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self._etags.pop(key, None)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "images": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SingleFlight:
+    """Concurrent calls for the same key wait on one in-flight call and share its result or its exception."""
+
+    def __init__(self):
+        self._calls = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+            logger.warning(f"Single-flight call for {key} failed: {e!r}")
+        finally:
+            # A later call runs again: after a failure, or once the result is cached by fn
+            with self._lock:
+                del self._calls[key]
+        return future.result()
@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+
+from helpers.logger import logger
+from services.image_cache import image_key
+from services.image_service import ImageService
+
+# Requests for an image a user is waiting on run before prewarming
+_REQUESTED, _PREWARM = 0, 1
+
+
+class ImageQueueFull(Exception):
+    pass
+
+
+class ImageQueue:
+    """
+    Bounded queue of image generations in front of the ImageService, worked off by `workers` asyncio tasks that run
+    the blocking remote calls on their own executor: a slow generation never holds a request thread.
+
+    A dish is queued once however often it is asked for, every caller awaits the same future. Prewarming (the dishes
+    of /recommender and /menusampler results) has a lower priority than requested images and is dropped, never
+    blocking, once max_prewarm dishes are queued for it: requested images are bounded by max_pending alone, prewarming
+    never makes a request busy. A requested dish that is queued for prewarming is moved up to the requested priority.
+    """
+
+    def __init__(self, image_service: ImageService, workers: int = 4, max_pending: int = 256, max_prewarm: int = 64,
+                 prewarm_enabled: bool = False, executor=None):
+        self.image_service = image_service
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_prewarm = max_prewarm
+        self.prewarm_enabled = prewarm_enabled
+        self.executor = executor
+
+        self._queue = asyncio.PriorityQueue()
+        self._pending = dict()
+        # Keys queued for prewarming only and not started yet, and keys being generated
+        self._prewarming = set()
+        self._running = set()
+        self._order = itertools.count()
+
+        self.generated = 0
+        self.failed = 0
+        self.prewarm_queued = 0
+        self.prewarm_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def _cached(self, key: str, count: bool = True) -> str | None:
+        # The cache lookup stats and touches the file: off the event loop, not on the generation executor
+        return await asyncio.get_running_loop().run_in_executor(None, self.image_service.image_cache.get, key, count)
+
+    async def status(self, name: str) -> str:
+        key = image_key(name)
+        if key in self._pending:
+            return "pending"
+        if await self._cached(key, count=False) is not None:
+            return "ready"
+        return "pending" if key in self._pending else "missing"
+
+    def _enqueue(self, key: str, name: str, priority: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may ever await a prewarm future, its exception is logged by the worker
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = future
+        self._queue.put_nowait((priority, next(self._order), key, name))
+        return future
+
+    def _requested(self, key: str, name: str) -> asyncio.Future | None:
+        # The future of a dish already queued, moved up to the requested priority if it was only queued for prewarming
+        future = self._pending.get(key)
+        if key in self._prewarming:
+            # Its prewarm entry stays in the queue and is skipped by the worker once the dish ran
+            self._prewarming.discard(key)
+            self._queue.put_nowait((_REQUESTED, next(self._order), key, name))
+        return future
+
+    async def submit(self, name: str) -> asyncio.Future:
+        # Future of the image path, shared by every caller asking for the dish meanwhile
+        key = image_key(name)
+        future = self._requested(key, name)
+        if future is not None:
+            return future
+
+        path = await self._cached(key)
+        if path is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(path)
+            return future
+
+        # Queued by another caller during the lookup
+        future = self._requested(key, name)
+        if future is not None:
+            return future
+        requested = len(self._pending) - len(self._prewarming)
+        if requested >= self.max_pending:
+            raise ImageQueueFull(f"{requested} images are already pending")
+        return self._enqueue(key, name, _REQUESTED)
+
+    def prewarm(self, names):
+        if not self.prewarm_enabled:
+            return
+
+        for name in names:
+            # Only the in-memory index is looked up, the worker finds an image another process cached on disk
+            key = image_key(name)
+            if key in self._pending or key in self.image_service.image_cache:
+                continue
+            if len(self._prewarming) >= self.max_prewarm:
+                self.prewarm_dropped += 1
+                continue
+            self._enqueue(key, name, _PREWARM)
+            self._prewarming.add(key)
+            self.prewarm_queued += 1
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, key, name = await self._queue.get()
+            future = self._pending.get(key)
+            if future is None or key in self._running:
+                # The other entry of a promoted prewarm, its dish already ran or is running
+                continue
+            self._prewarming.discard(key)
+            self._running.add(key)
+            try:
+                path = await loop.run_in_executor(self.executor, self.image_service.generate, name)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Generating the image of {name!r} failed: {e!r}")
+                future.set_exception(e)
+            else:
+                self.generated += 1
+                future.set_result(path)
+            finally:
+                del self._pending[key]
+                self._running.discard(key)
+
+    async def run(self):
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "prewarming": len(self._prewarming),
+            "max_prewarm": self.max_prewarm,
+            "workers": self.workers,
+            "generated": self.generated,
+            "failed": self.failed,
+            "prewarm_enabled": self.prewarm_enabled,
+            "prewarm_queued": self.prewarm_queued,
+            "prewarm_dropped": self.prewarm_dropped,
+        }
@@ -1,30 +1,71 @@
 import replicate
-import tempfile
-import os
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+
+from services.image_cache import ImageCache, SingleFlight, image_key
+
+IMAGE_MODEL = "fofr/ays-text-to-image:a004c3ac8f62ac95a90b5a0c264beb47b66a6d1f8141b76fb27cd90e9a8bfe8e"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 
 class ImageService:
-    def generate_image(self, name: str) -> FileResponse:
+    """
+    Dish images generated on replicate, served from the on-disk ImageCache.
+
+    Concurrent requests for the same dish wait on a single generation. client is anything with replicate's
+    run(model, input=...) returning file-like outputs, the replicate module by default.
+
+    Responses carry the content hash as strong ETag and may be cached by clients for max_age_seconds, a matching
+    If-None-Match is answered with 304 Not Modified.
+    """
+
+    def __init__(self, image_cache: ImageCache, client=replicate, max_age_seconds: int = 7 * 24 * 3600):
+        self.image_cache = image_cache
+        self.client = client
+        self.max_age_seconds = max_age_seconds
+        self.single_flight = SingleFlight()
+
+    def _generate(self, key: str, name: str) -> str:
+        # Checked again by the leader: the previous flight may have just cached it
+        path = self.image_cache.get(key, count=False)
+        if path is not None:
+            return path
+
         input = {
             "width": 512,
             "height": 512,
             "prompt": f"a mouthwatering plate of {name}",
             "checkpoint": "ProteusV0.4.safetensors"
         }
+        output = self.client.run(IMAGE_MODEL, input=input)
+        return self.image_cache.put(key, next(iter(output)).read())
+
+    def generate(self, name: str) -> str:
+        # For a caller that already missed the cache, the image is only generated if it is still missing
+        key = image_key(name)
+        return self.single_flight.do(key, self._generate, key, " ".join(name.split()))
 
-        filename_prefix = name.strip().lower().replace(" ", "_")
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, f"{filename_prefix}.webp")
+    def image_path(self, name: str) -> str:
+        path = self.image_cache.get(image_key(name))
+        if path is None:
+            path = self.generate(name)
+        return path
 
-        if not os.path.exists(file_path):
-            output = replicate.run(
-                "fofr/ays-text-to-image:a004c3ac8f62ac95a90b5a0c264beb47b66a6d1f8141b76fb27cd90e9a8bfe8e",
-                input=input
-            )
+    def image_response(self, name: str, path: str, if_none_match: str | None = None, size: int | None = None) -> Response:
+        etag = self.image_cache.etag(self.image_cache.key(path))
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age_seconds}"}
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
 
-            for index, item in enumerate(output):
-                with open(file_path, "wb") as f:
-                    f.write(item.read())
+        filename_prefix = "_".join(name.lower().split()) + (f"_{size}" if size else "")
+        return FileResponse(path=path, filename=f"{filename_prefix}.webp", media_type="image/webp", headers=headers)
 
-        return FileResponse(path=file_path, filename=f"{filename_prefix}.webp", media_type="image/webp")
+    def generate_image(self, name: str) -> FileResponse:
+        return self.image_response(name, self.image_path(name))
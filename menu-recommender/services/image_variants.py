@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import io
+
+from helpers.logger import logger
+from services.image_cache import ImageCache
+
+
+def thumbnails_available() -> bool:
+    # Pillow is optional: without it (or without its WebP support) the original images are served
+    try:
+        from PIL import features
+    except ImportError:
+        return False
+    return features.check("webp")
+
+
+def thumbnail(path: str, size: int, quality: int = 80) -> bytes:
+    # Runs in a pool process: decoding and resampling hold the GIL
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=quality)
+    return output.getvalue()
+
+
+class ImageVariants:
+    """
+    Downscaled variants of the cached images (at most size x size, webp), resized on demand in a process pool and
+    cached in the same ImageCache as the originals, under <original key>-<size>.
+
+    Concurrent requests for the same variant await one resize.
+    """
+
+    def __init__(self, image_cache: ImageCache, sizes: list[int], executor=None):
+        self.image_cache = image_cache
+        self.sizes = sorted(sizes)
+        self.executor = executor
+        self._pending = dict()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def path(self, original_path: str, size: int) -> str:
+        if size not in self.sizes:
+            raise ValueError(f"No {size} px image variant, the sizes are {self.sizes}")
+
+        key = f"{self.image_cache.key(original_path)}-{size}"
+        # The lookup stats and touches the file: off the event loop
+        path = await asyncio.get_running_loop().run_in_executor(None, self.image_cache.get, key)
+        if path is not None:
+            return path
+
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = asyncio.ensure_future(self._resize(key, original_path, size))
+            future.add_done_callback(functools.partial(self._done, key))
+        # Shielded: a cancelled request must not cancel the resize other requests share
+        return await asyncio.shield(future)
+
+    def _done(self, key: str, future: asyncio.Future):
+        # A later request reads the cache, or resizes again after a failure
+        self._pending.pop(key, None)
+        # Retrieved: every request awaiting the resize may have been cancelled meanwhile
+        if not future.cancelled():
+            future.exception()
+
+    async def _resize(self, key: str, original_path: str, size: int) -> str:
+        data = await asyncio.get_running_loop().run_in_executor(self.executor, thumbnail, original_path, size)
+        logger.debug(f"Resized {original_path} to {size} px: {len(data)} bytes")
+        return self.image_cache.put(key, data)
@@ -0,0 +1,208 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from helpers.logger import logger
+from services.embedding_store import EmbeddingStore
+from services.ingredient_vocab import normalize_ingredient
+from services.recipe_catalog import RecipeCatalog, RecipeCatalogWriter
+from services.recipe_cleaning import clean_ner
+
+
+class RecipeIndexBuilder:
+    """
+    Streams recipes chunk by chunk into the recipe embeddings and the row-aligned recipe catalog, without ever holding
+    the whole dataset or all embeddings in memory.
+
+    The source is either recipes_clean.csv or a RecipeCatalog written by scripts/clean_recipes.py. CSV rows are cleaned
+    like the notebook (no title, repeated titles dropped), unknown ingredients are skipped, never the recipe: row i of
+    the embeddings is always row i of the catalog. A catalog source is embedded straight from its ingredient ids and
+    is the catalog of the build.
+
+    Every chunk is appended to raw files in work_dir, then checkpoint.json records their sizes and the source rows
+    consumed. An interrupted build resumes after the last checkpoint, bytes written after it are truncated.
+    """
+
+    def __init__(self, query_encoder, ingredient_vocab, work_dir: str, chunk_size: int = 10000):
+        # QueryEncoder (torch, inference_mode) or NumpyQueryEncoder
+        self.query_encoder = query_encoder
+        self.ingredient_vocab = ingredient_vocab
+        self.work_dir = work_dir
+        self.chunk_size = chunk_size
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.work_dir, "checkpoint.json")
+
+    @property
+    def embeddings_path(self) -> str:
+        return os.path.join(self.work_dir, "embeddings.bin")
+
+    def load_checkpoint(self) -> dict | None:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, checkpoint: dict, embeddings_file, catalog_writer: RecipeCatalogWriter | None):
+        # Data first, then the checkpoint pointing at it, replaced atomically
+        embeddings_file.flush()
+        os.fsync(embeddings_file.fileno())
+        if catalog_writer is not None:
+            catalog_writer.sync()
+            checkpoint["catalog_sizes"] = catalog_writer.sizes()
+
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _resume(self, source: str, source_kind: str, source_size: int, restart: bool) -> dict:
+        checkpoint = None if restart else self.load_checkpoint()
+        if checkpoint is None:
+            return {
+                "source": os.path.abspath(source),
+                "source_kind": source_kind,
+                "source_size": source_size,
+                "dim": self.query_encoder.dim,
+                "source_rows": 0,
+                "rows": 0,
+                "empty_rows": 0,
+                "embeddings_bytes": 0,
+                "catalog_sizes": None,
+                "elapsed_seconds": 0.0,
+                "complete": False,
+            }
+
+        if (checkpoint["source"], checkpoint["source_kind"], checkpoint["source_size"]) != (os.path.abspath(source), source_kind, source_size):
+            raise ValueError(f"Checkpoint in {self.work_dir} belongs to another dataset, build with restart")
+        if checkpoint["dim"] != self.query_encoder.dim:
+            raise ValueError(f"Checkpoint in {self.work_dir} has dim {checkpoint['dim']}, the encoder {self.query_encoder.dim}")
+        return checkpoint
+
+    def _prepare_chunk(self, chunk: pd.DataFrame, seen_titles: set) -> tuple[list, list, list]:
+        titles, ners, ingredient_ids = list(), list(), list()
+        for title, ner in zip(chunk["title"].tolist(), chunk["NER"].tolist()):
+            # dropna + drop_duplicates on the title, across chunks
+            if not isinstance(title, str) or title in seen_titles:
+                continue
+            seen_titles.add(title)
+
+            ner = clean_ner(ner)
+            ids = [self.ingredient_vocab.get(normalize_ingredient(i)) for i in ner.split(",")]
+            titles.append(title)
+            ners.append(ner)
+            ingredient_ids.append([idx for idx in ids if idx is not None])
+        return titles, ners, ingredient_ids
+
+    def _run(self, checkpoint: dict, chunks, catalog_writer: RecipeCatalogWriter | None) -> dict:
+        # chunks yields (source rows consumed, ingredient ids of the recipes), the catalog writer gets the rows first
+        with open(self.embeddings_path, "a+b") as embeddings_file:
+            # Drop whatever an interrupted run appended after its last checkpoint
+            embeddings_file.truncate(checkpoint["embeddings_bytes"])
+
+            # Timed from the reading of a chunk to its checkpoint
+            started = time.perf_counter()
+            for source_rows, ingredient_ids in chunks:
+                if ingredient_ids:
+                    embeddings = np.ascontiguousarray(self.query_encoder.encode(ingredient_ids), dtype=np.float32)
+                    embeddings_file.write(embeddings.tobytes())
+                    checkpoint["embeddings_bytes"] += embeddings.nbytes
+
+                elapsed = time.perf_counter() - started
+                checkpoint["source_rows"] += source_rows
+                checkpoint["rows"] += len(ingredient_ids)
+                checkpoint["empty_rows"] += sum(1 for ids in ingredient_ids if not len(ids))
+                checkpoint["elapsed_seconds"] += elapsed
+                self._save_checkpoint(checkpoint, embeddings_file, catalog_writer)
+                logger.info(
+                    f"Recipe index build: {checkpoint['rows']} recipes ({checkpoint['source_rows']} source rows), "
+                    f"{source_rows / max(elapsed, 1e-9):.0f} source rows/s"
+                )
+                started = time.perf_counter()
+
+            checkpoint["complete"] = True
+            self._save_checkpoint(checkpoint, embeddings_file, catalog_writer)
+        return checkpoint
+
+    def build(self, csv_path: str, restart: bool = False) -> dict:
+        os.makedirs(self.work_dir, exist_ok=True)
+        checkpoint = self._resume(csv_path, "csv", os.path.getsize(csv_path), restart)
+        if checkpoint["complete"]:
+            return checkpoint
+
+        catalog_writer = RecipeCatalogWriter(os.path.join(self.work_dir, "catalog"), checkpoint["catalog_sizes"])
+        try:
+            # The titles already written are the titles already seen
+            seen_titles = set(catalog_writer.titles())
+            if checkpoint["rows"]:
+                logger.info(f"Resuming the recipe index build after {checkpoint['source_rows']} CSV rows / {checkpoint['rows']} recipes")
+
+            reader = pd.read_csv(
+                csv_path, usecols=["title", "NER"], dtype=str, chunksize=self.chunk_size,
+                skiprows=range(1, checkpoint["source_rows"] + 1)
+            )
+
+            def chunks():
+                for chunk in reader:
+                    titles, ners, ingredient_ids = self._prepare_chunk(chunk, seen_titles)
+                    catalog_writer.append(titles, ners, ingredient_ids)
+                    yield len(chunk), ingredient_ids
+
+            return self._run(checkpoint, chunks(), catalog_writer)
+        finally:
+            catalog_writer.close()
+
+    def build_from_catalog(self, catalog_path: str, restart: bool = False) -> dict:
+        # A cleaned catalog already holds the ingredient ids, no string is parsed
+        os.makedirs(self.work_dir, exist_ok=True)
+        catalog = RecipeCatalog.open(catalog_path)
+        checkpoint = self._resume(catalog_path, "catalog", len(catalog), restart)
+        if checkpoint["complete"]:
+            return checkpoint
+
+        indptr = np.asarray(catalog.ingredient_indptr)
+
+        def chunks():
+            for start in range(checkpoint["source_rows"], len(catalog), self.chunk_size):
+                end = min(start + self.chunk_size, len(catalog))
+                ids = catalog.ingredient_ids[indptr[start]:indptr[end]]
+                yield end - start, [ids[a:b] for a, b in zip(indptr[start:end] - indptr[start], indptr[start + 1:end + 1] - indptr[start])]
+
+        return self._run(checkpoint, chunks(), None)
+
+    def finalize(self, store_path: str, catalog_path: str | None = None, dtype: str = "float32") -> RecipeCatalog:
+        # Converts a complete build into the embedding store and, for a CSV source, the recipe catalog the app opens
+        checkpoint = self.load_checkpoint()
+        if checkpoint is None or not checkpoint["complete"]:
+            raise ValueError(f"No complete recipe index build in {self.work_dir}")
+
+        rows, dim = checkpoint["rows"], checkpoint["dim"]
+        embeddings = np.memmap(self.embeddings_path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else np.empty((0, dim), np.float32)
+        EmbeddingStore.write(store_path, embeddings, dtype=dtype)
+
+        if checkpoint["source_kind"] == "catalog":
+            return RecipeCatalog.open(checkpoint["source"])
+        if catalog_path is None:
+            raise ValueError("A build from recipes_clean.csv needs a catalog path")
+
+        catalog_writer = RecipeCatalogWriter(os.path.join(self.work_dir, "catalog"), checkpoint["catalog_sizes"])
+        try:
+            return catalog_writer.finish(catalog_path)
+        finally:
+            catalog_writer.close()
+
+    @staticmethod
+    def throughput(checkpoint: dict) -> dict:
+        elapsed = max(checkpoint["elapsed_seconds"], 1e-9)
+        return {
+            "source_rows": checkpoint["source_rows"],
+            "recipes": checkpoint["rows"],
+            "recipes_without_known_ingredients": checkpoint["empty_rows"],
+            "elapsed_seconds": round(checkpoint["elapsed_seconds"], 3),
+            "source_rows_per_second": round(checkpoint["source_rows"] / elapsed, 1),
+            "recipes_per_second": round(checkpoint["rows"] / elapsed, 1),
+        }
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class RecipeFilter:
+    # Vocab ids, sorted and unique so equal filters are equal cache keys
+    exclude: tuple[int, ...] = ()
+    require: tuple[int, ...] = ()
+    # A required term unknown to the vocab: no recipe can contain it
+    unsatisfiable: bool = False
+
+    @classmethod
+    def of(cls, exclude_ids, require_ids, unsatisfiable: bool = False) -> "RecipeFilter | None":
+        recipe_filter = cls(tuple(sorted(set(exclude_ids))), tuple(sorted(set(require_ids))), unsatisfiable)
+        return recipe_filter if recipe_filter != cls() else None
+
+
+class IngredientPostings:
+    """
+    Inverted index ingredient -> recipes in CSR layout, the postings of ingredient i are the sorted, unique recipe
+    rows recipe_ids[indptr[i]:indptr[i + 1]].
+
+    A RecipeFilter becomes a boolean mask over the catalog rows (excluded postings cleared, required postings
+    intersected) that the search indexes apply before the top-k selection. The pantry coverage of every recipe is
+    counted over the postings of the pantry ingredients, divided by the distinct ingredient count per recipe.
+    """
+
+    def __init__(self, indptr: np.ndarray, recipe_ids: np.ndarray, recipe_lengths: np.ndarray):
+        self.indptr = indptr
+        self.recipe_ids = recipe_ids
+        self.recipe_lengths = recipe_lengths  # [n_recipes] distinct known ingredients of every recipe
+        self.n_recipes = len(recipe_lengths)
+
+        # Coverage of a recipe scaled to 0..255 is count * level_scale, a recipe without ingredients never gets a level
+        self._level_scale = (255 / np.maximum(recipe_lengths, 1)).astype(np.float32) * (recipe_lengths > 0)
+
+    @classmethod
+    def from_catalog(cls, recipe_catalog, vocab_size: int, n_recipes: int | None = None) -> "IngredientPostings":
+        # n_recipes: postings of only the first recipes of the catalog
+        ingredient_indptr = recipe_catalog.ingredient_indptr[:None if n_recipes is None else n_recipes + 1]
+        return cls.from_csr(ingredient_indptr, recipe_catalog.ingredient_ids[:ingredient_indptr[-1]], vocab_size)
+
+    @classmethod
+    def from_csr(cls, ingredient_indptr, ingredient_ids, vocab_size: int) -> "IngredientPostings":
+        # Recipe -> ingredients in CSR layout, recipe r has the ingredients ingredient_ids[indptr[r]:indptr[r + 1]]
+        ingredient_indptr = np.asarray(ingredient_indptr)
+        ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        n_recipes = len(ingredient_indptr) - 1
+        rows = np.repeat(np.arange(n_recipes, dtype=np.int64), np.diff(ingredient_indptr))
+
+        # One sort of (ingredient, row) keys transposes the catalog CSR and drops repeated ingredients of a recipe
+        keys = np.sort(ingredient_ids * n_recipes + rows)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        recipe_ids = (keys % n_recipes).astype(np.int32)
+        indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_recipes, minlength=vocab_size), out=indptr[1:])
+        return cls(indptr, recipe_ids, np.bincount(recipe_ids, minlength=n_recipes).astype(np.int32))
+
+    def recipes(self, ingredient_id: int) -> np.ndarray:
+        if not 0 <= ingredient_id < len(self.indptr) - 1:
+            return self.recipe_ids[:0]
+        return self.recipe_ids[self.indptr[ingredient_id]:self.indptr[ingredient_id + 1]]
+
+    def allowed(self, recipe_filter: RecipeFilter) -> np.ndarray:
+        if recipe_filter.unsatisfiable:
+            return np.zeros(self.n_recipes, dtype=bool)
+
+        if recipe_filter.require:
+            # Intersect the shortest postings first, the running result only shrinks
+            postings = sorted((self.recipes(idx) for idx in recipe_filter.require), key=len)
+            rows = postings[0]
+            for other in postings[1:]:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            allowed = np.zeros(self.n_recipes, dtype=bool)
+            allowed[rows] = True
+        else:
+            allowed = np.ones(self.n_recipes, dtype=bool)
+
+        for idx in recipe_filter.exclude:
+            allowed[self.recipes(idx)] = False
+        return allowed
+
+    def coverage(self, pantry_ids, allowed: np.ndarray | None = None, limit: int | None = None,
+                 include: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # Rows and coverage of the (at most limit) best covered recipes sharing at least one ingredient with the pantry,
+        # plus the rows in include whatever their coverage
+        postings = [self.recipes(idx) for idx in set(pantry_ids)]
+        # The rows of one posting are unique, a scatter per ingredient counts into 8 bits, a quarter of the memory
+        # traffic of a bincount
+        counts = np.zeros(self.n_recipes, dtype=np.uint8 if len(postings) < 256 else np.uint16)
+        for posting in postings:
+            counts[posting] += 1
+
+        # Dense passes only over 8 bit coverage levels: a binary search for the highest level that still has limit
+        # recipes at or above it, recipes of that level are taken in row order until limit is reached
+        levels = (counts * self._level_scale + 0.5).astype(np.uint8)
+        if allowed is not None:
+            levels *= allowed
+        threshold = 1
+        if limit is not None:
+            low, high = 1, 255
+            while low < high:
+                middle = (low + high + 1) // 2
+                if np.count_nonzero(levels >= middle) >= limit:
+                    low = middle
+                else:
+                    high = middle - 1
+            threshold = low
+
+        rows = np.flatnonzero(levels >= threshold)
+        if limit is not None and len(rows) > limit:
+            above = levels[rows] > threshold
+            rows = np.sort(np.concatenate((rows[above], rows[~above][:limit - np.count_nonzero(above)])))
+        if include is not None:
+            rows = np.union1d(rows, include)
+        return rows, (counts[rows] / np.maximum(self.recipe_lengths[rows], 1)).astype(np.float32)
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from services.ingredient_vocab import IngredientVocab, normalize_ingredient
+
+_RANK_BITS = 24
+
+
+def _trigrams(name: str) -> np.ndarray:
+    # Byte trigrams of the name padded with a 0 byte on both sides, as 24 bit codes
+    padded = b"\0" + name.encode("utf-8") + b"\0"
+    return np.unique(np.fromiter(((padded[i] << 16) | (padded[i + 1] << 8) | padded[i + 2] for i in range(len(padded) - 2)), dtype=np.int64))
+
+
+def _plural_variants(name: str) -> list[str]:
+    variants = [name + "s", name + "es"]
+    if name.endswith("ies"):
+        variants.append(name[:-3] + "y")
+    if name.endswith("es"):
+        variants.append(name[:-2])
+    if name.endswith("s"):
+        variants.append(name[:-1])
+    return variants
+
+
+@dataclass
+class IngredientResolution:
+    ids: list[int] = field(default_factory=list)
+    matched: dict[str, str] = field(default_factory=dict)
+    unmatched: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"matched": self.matched, "unmatched": self.unmatched}
+
+
+class IngredientResolver:
+    """
+    Resolves request terms to vocab ids: exact match after normalization, then singular / plural variants, then the
+    most similar vocab name by trigram Dice coefficient (if above min_similarity).
+
+    The trigram index (sorted trigram codes + postings of vocab ranks) is built with vectorized numpy from the sorted
+    name table of the vocab, a fuzzy lookup is one bincount over the postings of the query trigrams.
+    """
+
+    def __init__(self, ingredient_vocab: IngredientVocab, min_similarity: float = 0.6):
+        self.ingredient_vocab = ingredient_vocab
+        self.min_similarity = min_similarity
+
+        blob = np.asarray(ingredient_vocab.name_blob)
+        offsets = np.asarray(ingredient_vocab.name_offsets)
+        n_names = len(ingredient_vocab)
+        if n_names >= 1 << _RANK_BITS:
+            raise ValueError(f"Vocab too large for the trigram index: {n_names}")
+
+        # Copy every name into a 0-padded buffer: 0 name 0, a name of length l has l padded trigrams
+        lengths = np.diff(offsets)
+        rank_of_byte = np.repeat(np.arange(n_names, dtype=np.int64), lengths)
+        padded = np.zeros(len(blob) + 2 * n_names, dtype=np.int64)
+        padded[np.arange(len(blob)) + 1 + 2 * rank_of_byte] = blob
+        starts = np.arange(len(blob)) + 2 * rank_of_byte
+        codes = (padded[starts] << 16) | (padded[starts + 1] << 8) | padded[starts + 2]
+
+        # Unique (trigram, rank) pairs, sorted by trigram then rank
+        keys = np.sort((codes << _RANK_BITS) | rank_of_byte)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        trigram_of_key = keys >> _RANK_BITS
+        self.postings = (keys & ((1 << _RANK_BITS) - 1)).astype(np.int32)
+
+        bounds = np.flatnonzero(np.concatenate(([True], trigram_of_key[1:] != trigram_of_key[:-1])))
+        self.trigram_codes = trigram_of_key[bounds]
+        self.postings_indptr = np.append(bounds, len(keys))
+        self.name_trigram_counts = np.bincount(self.postings, minlength=n_names).astype(np.float32)
+
+    def _fuzzy_rank(self, name: str) -> tuple[int, float] | None:
+        query_codes = _trigrams(name)
+        positions = np.searchsorted(self.trigram_codes, query_codes)
+        found = positions < len(self.trigram_codes)
+        found[found] = self.trigram_codes[positions[found]] == query_codes[found]
+        positions = positions[found]
+        if len(positions) == 0:
+            return None
+
+        candidates = np.concatenate([self.postings[self.postings_indptr[p]:self.postings_indptr[p + 1]] for p in positions])
+        shared = np.bincount(candidates, minlength=len(self.name_trigram_counts))
+
+        # Dice coefficient 2 * |shared| / (|query| + |name|) with |name| >= |shared|, so only names sharing at least
+        # min_similarity * |query| / (2 - min_similarity) trigrams can reach min_similarity
+        min_shared = max(1, int(np.ceil(self.min_similarity * len(query_codes) / (2 - self.min_similarity))))
+        ranks = np.flatnonzero(shared >= min_shared)
+        if len(ranks) == 0:
+            return None
+
+        similarity = 2 * shared[ranks] / (self.name_trigram_counts[ranks] + len(query_codes))
+        best = int(np.argmax(similarity))
+        return int(ranks[best]), float(similarity[best])
+
+    def resolve_one(self, term: str) -> int | None:
+        name = normalize_ingredient(term)
+        if not name:
+            # An empty term names no ingredient, its plural variant "s" would match one
+            return None
+
+        idx = self.ingredient_vocab.get(name)
+        if idx is not None:
+            return idx
+
+        for variant in _plural_variants(name):
+            idx = self.ingredient_vocab.get(variant)
+            if idx is not None:
+                return idx
+
+        best = self._fuzzy_rank(name)
+        if best is not None and best[1] >= self.min_similarity:
+            return int(self.ingredient_vocab.sorted_ids[best[0]])
+        return None
+
+    def resolve(self, terms: list[str]) -> IngredientResolution:
+        resolution = IngredientResolution()
+        for term in terms:
+            idx = self.resolve_one(term)
+            if idx is None:
+                resolution.unmatched.append(term)
+            else:
+                resolution.ids.append(idx)
+                resolution.matched[term] = self.ingredient_vocab.name(idx)
+        return resolution
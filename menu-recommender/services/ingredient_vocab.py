@@ -0,0 +1,114 @@
+import json
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+from helpers.artifact_files import replaced_directory
+
+VOCAB_ARRAYS = ("name_offsets", "name_blob", "sorted_ids", "id_ranks")
+
+
+def normalize_ingredient(name: str) -> str:
+    # Same steps (and order) as the vocab extraction in notebooks/food_recommender.ipynb
+    return name.strip().replace("/", "").lower()
+
+
+class _SortedNames:
+    # Sequence view of the sorted name table so bisect can search it without materializing the strings
+    def __init__(self, vocab: "IngredientVocab"):
+        self.vocab = vocab
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def __getitem__(self, rank: int) -> bytes:
+        return self.vocab._name_bytes(rank)
+
+
+class IngredientVocab:
+    """
+    Ingredient vocabulary as a sorted string table: the names sorted by their utf-8 bytes in one blob, the ingredient
+    id of every sorted name and the rank of every id for the reverse lookup. Opened from disk it is memory-mapped.
+
+    Built from a dict (ingredient2idx.pkl), the dict stays the name index: the lookups stay O(1) dict hits instead of
+    a bisect over the table.
+    """
+
+    def __init__(self, name_offsets, name_blob, sorted_ids, id_ranks, index: dict[str, int] | None = None):
+        self.name_offsets = name_offsets  # [n + 1] offsets of the sorted names in name_blob
+        self.name_blob = name_blob        # utf-8 names, sorted
+        self.sorted_ids = sorted_ids      # [n] ingredient id of the name at every rank
+        self.id_ranks = id_ranks          # [n] rank of the name of every ingredient id
+        self._index = index
+
+        # Plain buffer views for the lookups, indexing a np.memmap goes through python code on every access
+        self._offsets = memoryview(np.asarray(name_offsets))
+        self._blob = memoryview(np.asarray(name_blob))
+
+    def __len__(self) -> int:
+        return len(self.sorted_ids)
+
+    @classmethod
+    def from_dict(cls, ingredient2idx: dict[str, int]) -> "IngredientVocab":
+        names = sorted((name.encode("utf-8"), idx) for name, idx in ingredient2idx.items())
+
+        name_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name, _ in names], out=name_offsets[1:])
+        sorted_ids = np.asarray([idx for _, idx in names], dtype=np.int32)
+
+        if not np.array_equal(np.sort(sorted_ids), np.arange(len(sorted_ids))):
+            raise ValueError("Ingredient ids must be 0..n-1")
+        id_ranks = np.empty_like(sorted_ids)
+        id_ranks[sorted_ids] = np.arange(len(sorted_ids), dtype=np.int32)
+
+        name_blob = np.frombuffer(b"".join(name for name, _ in names), dtype=np.uint8)
+        return cls(name_offsets, name_blob, sorted_ids, id_ranks, index=dict(ingredient2idx))
+
+    def write(self, path: str):
+        # A new directory renamed into place, workers serving the previous vocab keep their mapped files
+        with replaced_directory(path) as directory:
+            for name in VOCAB_ARRAYS:
+                np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+            with open(os.path.join(directory, "manifest.json"), "w") as f:
+                json.dump({"size": len(self)}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "IngredientVocab":
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        vocab = cls(*[np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in VOCAB_ARRAYS])
+        if len(vocab) != manifest["size"] or len(vocab.name_offsets) != manifest["size"] + 1:
+            raise ValueError(f"Ingredient vocab {path} does not match its manifest")
+        return vocab
+
+    def _name_bytes(self, rank: int) -> bytes:
+        return self._blob[self._offsets[rank]:self._offsets[rank + 1]].tobytes()
+
+    def get(self, name: str, default=None):
+        if self._index is not None:
+            return self._index.get(name, default)
+
+        target = name.encode("utf-8")
+        rank = bisect_left(_SortedNames(self), target)
+        if rank < len(self) and self._name_bytes(rank) == target:
+            return int(self.sorted_ids[rank])
+        return default
+
+    def __getitem__(self, name: str) -> int:
+        idx = self.get(name)
+        if idx is None:
+            raise KeyError(name)
+        return idx
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def lookup(self, term: str) -> int:
+        # Lookup of a raw request term, normalized like the training terms
+        return self[normalize_ingredient(term)]
+
+    def name(self, idx: int) -> str:
+        return self._name_bytes(int(self.id_ranks[idx])).decode("utf-8")
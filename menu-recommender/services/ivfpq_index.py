@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+
+from services.search_index import normalize_rows, top_k_rows
+
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c, chunked to bound the distance matrix size
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        assignment[start:start + chunk_size] = np.argmin(centroid_norms - 2 * chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def _kmeans(data: np.ndarray, n_clusters: int, n_iter: int, rng: np.random.Generator, spherical: bool = False) -> np.ndarray:
+    centroids = data[rng.choice(len(data), n_clusters, replace=len(data) < n_clusters)].copy()
+
+    for _ in range(n_iter):
+        assignment = _nearest_centroids(data, centroids)
+
+        # Sum the members of every cluster with one sort + reduceat instead of a python loop
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_clusters)
+        non_empty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+        centroids[non_empty] = np.add.reduceat(data[order], starts, axis=0) / counts[non_empty, np.newaxis]
+
+        # Re-seed empty clusters with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty))]
+
+        if spherical:
+            centroids = normalize_rows(centroids)
+
+    return centroids.astype(np.float32)
+
+
+class IVFPQSearchIndex:
+    """
+    Approximate inner product search: an inverted file over coarse (spherical k-means) clusters with the residual
+    of every recipe to its cluster centroid compressed by product quantization (one byte per sub-vector).
+
+    Since the scores are inner products, the lookup table of a query against the sub-codebooks does not depend on the
+    probed list, so a search is one coarse matmul, one lookup table and a gather + sum over the probed lists.
+    """
+
+    def __init__(self, centroids, codebooks, codes, list_offsets, ids, n_probe: int = 8, rerank_index=None, rerank_factor: int = 4):
+        self.centroids = centroids            # [n_lists, dim]
+        self.codebooks = codebooks            # [n_subvectors, 256, dim / n_subvectors]
+        self.codes = codes                    # [n_recipes, n_subvectors] uint8, grouped by list
+        self.list_offsets = list_offsets      # [n_lists + 1] start of every list in codes / ids
+        self.ids = ids                        # [n_recipes] recipe row of every code
+        self.n_probe = n_probe
+
+        # Position in codes of every recipe row, to score given rows
+        self.positions = np.empty(len(ids), dtype=np.int64)
+        self.positions[ids] = np.arange(len(ids))
+
+        # Optional exact index to re-score the approximate candidates
+        self.rerank_index = rerank_index
+        self.rerank_factor = rerank_factor
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, recipe_embeddings, n_lists: int = 1024, n_subvectors: int = 16, n_iter: int = 20,
+              sample_size: int = 100_000, seed: int = 42, **kwargs) -> "IVFPQSearchIndex":
+        rng = np.random.default_rng(seed)
+        data = normalize_rows(recipe_embeddings)
+        n_recipes, dim = data.shape
+
+        if dim % n_subvectors != 0:
+            raise ValueError(f"Embedding dim {dim} is not divisible by n_subvectors {n_subvectors}")
+        n_lists = min(n_lists, n_recipes)
+        sub_dim = dim // n_subvectors
+
+        # Train the quantizers on a sample, the assignment runs over all recipes
+        sample = data[rng.choice(n_recipes, min(sample_size, n_recipes), replace=False)]
+        centroids = _kmeans(sample, n_lists, n_iter, rng, spherical=True)
+
+        sample_residuals = sample - centroids[_nearest_centroids(sample, centroids)]
+        codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(sample_residuals[:, m * sub_dim:(m + 1) * sub_dim]), 256, n_iter, rng)
+            for m in range(n_subvectors)
+        ])
+
+        assignment = _nearest_centroids(data, centroids)
+        codes = np.empty((n_recipes, n_subvectors), dtype=np.uint8)
+        for start in range(0, n_recipes, 65536):
+            chunk = slice(start, start + 65536)
+            residuals = data[chunk] - centroids[assignment[chunk]]
+            for m in range(n_subvectors):
+                codes[chunk, m] = _nearest_centroids(np.ascontiguousarray(residuals[:, m * sub_dim:(m + 1) * sub_dim]), codebooks[m])
+
+        # Group the codes by list so every probed list is one contiguous slice
+        order = np.argsort(assignment, kind="stable")
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists)))).astype(np.int64)
+
+        return cls(centroids, codebooks, np.ascontiguousarray(codes[order]), list_offsets, order.astype(np.int64), **kwargs)
+
+    def save(self, path: str):
+        # Written next to path and renamed over it, a reload never reads a partial index
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, codebooks=self.codebooks, codes=self.codes,
+                     list_offsets=self.list_offsets, ids=self.ids)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "IVFPQSearchIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["codebooks"], data["codes"], data["list_offsets"], data["ids"], **kwargs)
+
+    def _search_one(self, query: np.ndarray, top_k: int, n_probe: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        coarse_scores = self.centroids @ query
+        probes = np.argpartition(coarse_scores, -n_probe)[-n_probe:]
+
+        # Lookup table of the query sub-vectors against all sub-codebook entries [n_subvectors, 256]
+        n_subvectors, _, sub_dim = self.codebooks.shape
+        lookup_table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(n_subvectors, sub_dim))
+
+        starts, ends = self.list_offsets[probes], self.list_offsets[probes + 1]
+        sizes = ends - starts
+        if sizes.sum() == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        list_scores = np.repeat(coarse_scores[probes], sizes)
+
+        if allowed is not None:
+            # Filtered recipes are dropped before scoring, they never compete for the top-k
+            keep = allowed[self.ids[positions]]
+            positions, list_scores = positions[keep], list_scores[keep]
+
+        scores = list_scores + lookup_table[np.arange(n_subvectors), self.codes[positions]].sum(axis=1)
+        candidates = self.ids[positions]
+
+        if self.rerank_index is not None:
+            # Re-score a wider approximate shortlist with the exact vectors
+            _, shortlist = top_k_rows(scores[np.newaxis, :], top_k * self.rerank_factor)
+            candidates = candidates[shortlist[0]]
+            scores = self.rerank_index.vectors(candidates) @ query
+
+        best_scores, best = top_k_rows(scores[np.newaxis, :], top_k)
+        return best_scores[0], candidates[best[0]]
+
+    def vectors(self, rows) -> np.ndarray:
+        if self.rerank_index is not None:
+            return self.rerank_index.vectors(rows)
+
+        # Reconstruction: coarse centroid + PQ coded residual of every row
+        positions = self.positions[rows]
+        lists = np.searchsorted(self.list_offsets, positions, side="right") - 1
+        residuals = self.codebooks[np.arange(self.codebooks.shape[0]), self.codes[positions]]
+        return self.centroids[lists] + residuals.reshape(len(positions), -1)
+
+    def score_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        if self.rerank_index is not None:
+            return self.rerank_index.score_rows(queries, rows)
+
+        # Approximate scores from the coarse centroid and the PQ codes of the rows
+        queries = normalize_rows(np.atleast_2d(queries))
+        positions = self.positions[rows]
+        lists = np.searchsorted(self.list_offsets, positions, side="right") - 1
+        n_subvectors, _, sub_dim = self.codebooks.shape
+
+        scores = np.empty((queries.shape[0], len(rows)), dtype=np.float32)
+        for row, query in enumerate(queries):
+            lookup_table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(n_subvectors, sub_dim))
+            scores[row] = self.centroids[lists] @ query + lookup_table[np.arange(n_subvectors), self.codes[positions]].sum(axis=1)
+        return scores
+
+    def search(self, queries: np.ndarray, top_k: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # Like the exact indexes, a top_k below 1 returns no recipes
+        top_k = max(top_k, 0)
+        queries = normalize_rows(np.atleast_2d(queries))
+
+        # A filter leaving a share f of the recipes probes n_probe / f lists, as many candidates as unfiltered
+        n_probe = self.n_probe
+        if allowed is not None:
+            n_probe = int(np.ceil(n_probe / max(np.count_nonzero(allowed) / len(allowed), 1e-6)))
+        n_probe = min(n_probe, self.n_lists)
+
+        results = [self._search_one(query, top_k, n_probe, allowed) for query in queries]
+
+        # Pad with -1 when the probed lists hold fewer than top_k recipes
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for row, (query_scores, query_indices) in enumerate(results):
+            scores[row, :len(query_scores)] = query_scores
+            indices[row, :len(query_indices)] = query_indices
+        return scores, indices
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from helpers.logger import logger
+
+
+class MenuSamplerPool:
+    """
+    Ring of pre-computed sampled menus for /menusampler.
+
+    Requests are served round-robin from the ring, a background task replaces the oldest menus with freshly sampled
+    ones at a fixed rate. The sampling cost is bounded by the refresh rate, not by the request rate.
+
+    The menus belong to one artifact version: clear() on a reload empties the ring, and menus still being sampled from
+    the previous artifacts are dropped when they arrive.
+    """
+
+    def __init__(self, pool_size: int = 256, top_k: int = 12, refresh_count: int = 16, refresh_interval_seconds: float = 5,
+                 executor=None):
+        self.pool_size = pool_size
+        self.top_k = top_k
+        self.refresh_count = refresh_count
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.executor = executor
+
+        self._menus = list()
+        self._next_served = 0
+        self._next_replaced = 0
+        self._artifact_version = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._menus)
+
+    def take(self, top_k: int) -> list | None:
+        # None when the pool cannot answer, the caller samples directly then
+        if top_k > self.top_k:
+            return None
+
+        with self._lock:
+            if not self._menus:
+                return None
+            menu = self._menus[self._next_served % len(self._menus)]
+            self._next_served += 1
+        return menu[:top_k]
+
+    def add(self, menus: list[list], artifact_version: str | None = None):
+        with self._lock:
+            if self._artifact_version is None:
+                self._artifact_version = artifact_version
+            elif artifact_version is not None and artifact_version != self._artifact_version:
+                return
+            for menu in menus:
+                if len(self._menus) < self.pool_size:
+                    self._menus.append(menu)
+                else:
+                    # Rotate: replace the oldest menu
+                    self._menus[self._next_replaced] = menu
+                    self._next_replaced = (self._next_replaced + 1) % self.pool_size
+
+    def clear(self, artifact_version: str | None = None):
+        # Only menus of artifact_version are added from now on
+        with self._lock:
+            self._menus = list()
+            self._next_served = 0
+            self._next_replaced = 0
+            self._artifact_version = artifact_version
+
+    def refill(self, recommender_service, count: int):
+        self.add(recommender_service.sample_batch_recommendations(count, self.top_k), recommender_service.artifact_version)
+
+    async def run(self, service_provider):
+        # service_provider returns the current RecommenderService
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Never more than refresh_count menus per call, one call scores a [count, n_recipes] matrix. An empty
+                # pool (on startup, after a reload) is filled chunk after chunk without waiting the refresh interval
+                await loop.run_in_executor(self.executor, self.refill, service_provider(), self.refresh_count)
+                if len(self._menus) < self.pool_size:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Refilling the menu sampler pool failed")
+
+            await asyncio.sleep(self.refresh_interval_seconds)
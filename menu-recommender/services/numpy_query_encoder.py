@@ -0,0 +1,64 @@
+import json
+import os
+
+import numpy as np
+
+from helpers.artifact_files import replaced_directory
+
+
+class NumpyQueryEncoder:
+    """
+    Query embeddings of a mean pooling RecipeEmbeddingModel computed with NumPy only, from the embedding table
+    exported by scripts/export_numpy_model.py. Serving with it never imports torch.
+
+    The table is memory-mapped, all workers on a host share one page-cache copy of it.
+    """
+
+    def __init__(self, embedding_weight: np.ndarray):
+        self.embedding_weight = embedding_weight  # [vocab_size, dim] float32
+
+    @property
+    def vocab_size(self) -> int:
+        return self.embedding_weight.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.embedding_weight.shape[1]
+
+    @staticmethod
+    def write(path: str, embedding_weight: np.ndarray):
+        # A new directory renamed into place, workers serving the previous table keep their mapped file
+        embedding_weight = np.ascontiguousarray(embedding_weight, dtype=np.float32)
+        with replaced_directory(path) as directory:
+            np.save(os.path.join(directory, "embedding_weight.npy"), embedding_weight)
+
+            with open(os.path.join(directory, "manifest.json"), "w") as f:
+                json.dump({"pooling": "mean", "vocab_size": int(embedding_weight.shape[0]), "dim": int(embedding_weight.shape[1])}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "NumpyQueryEncoder":
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        embedding_weight = np.load(os.path.join(path, "embedding_weight.npy"), mmap_mode="r")
+        if embedding_weight.shape != (manifest["vocab_size"], manifest["dim"]) or embedding_weight.dtype != np.float32:
+            raise ValueError(f"Query encoder {path} does not match its manifest")
+        return cls(embedding_weight)
+
+    def encode(self, queries: list) -> np.ndarray:
+        # Id 0 is padding for the model, it is neither summed nor counted
+        queries = [[idx for idx in query if idx != 0] for query in queries]
+        lengths = np.array([len(query) for query in queries], dtype=np.int64)
+        flat_ids = np.fromiter((idx for query in queries for idx in query), dtype=np.int64, count=int(lengths.sum()))
+
+        # Sum of every bag, reduceat over the non-empty bags only (it would return a row for an empty one)
+        sums = np.zeros((len(queries), self.dim), dtype=np.float32)
+        non_empty = lengths > 0
+        if non_empty.any():
+            offsets = np.cumsum(lengths) - lengths
+            sums[non_empty] = np.add.reduceat(self.embedding_weight[flat_ids], offsets[non_empty], axis=0)
+
+        # Same epsilons as the mean pooling and F.normalize of the model
+        means = sums / (lengths.astype(np.float32) + np.float32(1e-8))[:, np.newaxis]
+        norms = np.maximum(np.linalg.norm(means, axis=1, keepdims=True), np.float32(1e-12))
+        return means / norms
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+from services.ingredient_postings import IngredientPostings
+
+
+def _gather(indptr: np.ndarray, values: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # The CSR rows values[indptr[r]:indptr[r + 1]] of all given rows back to back, and the position in rows of each
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()), dtype=np.int64)
+    return np.repeat(np.arange(len(rows), dtype=np.int64), lengths), values[positions]
+
+
+def _run_lengths(sorted_keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Distinct keys and their counts of a sorted array, np.unique hashes and is far slower on large arrays
+    if len(sorted_keys) == 0:
+        return sorted_keys, np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    return sorted_keys[starts], np.diff(np.append(starts, len(sorted_keys)))
+
+
+def synthetic_recipes(n_recipes: int, vocab_size: int, min_length: int = 5, max_length: int = 7,
+                      seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    # Random recipes of min_length..max_length distinct ingredients like notebooks/food_recommender.ipynb, as CSR
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(min_length, max_length + 1, size=n_recipes)
+    indptr = np.zeros(n_recipes + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+
+    # Draws with repeats are redrawn until every recipe has distinct ingredients
+    ids = rng.integers(0, vocab_size, size=int(indptr[-1]))
+    while True:
+        rows = np.repeat(np.arange(n_recipes, dtype=np.int64), lengths)
+        order = np.lexsort((ids, rows))
+        repeated = order[1:][(rows[order[1:]] == rows[order[:-1]]) & (ids[order[1:]] == ids[order[:-1]])]
+        if len(repeated) == 0:
+            return indptr, ids
+        ids[repeated] = rng.integers(0, vocab_size, size=len(repeated))
+
+
+class PairMiner:
+    """
+    Positive (exactly one shared ingredient) and negative (none or several shared) recipe pairs for the contrastive
+    training, without comparing the pairs one by one.
+
+    The overlap counts of all pairs are the sparse product A @ A.T of the binary recipe x ingredient matrix A. It is
+    computed for one block of recipe rows at a time against the ingredient -> recipes postings (A.T in CSR), only
+    pairs sharing an ingredient are ever materialized. Positives are a uniform sample over all blocks (the sample_size
+    smallest random priorities), negatives a uniform sample of pairs rejected when they overlap in exactly one ingredient.
+    """
+
+    def __init__(self, ingredient_indptr, ingredient_ids, vocab_size: int, block_pairs: int = 1 << 24):
+        # Repeated ingredients of a recipe are dropped, the overlap counts distinct ingredients like the set intersection
+        self.postings = IngredientPostings.from_csr(ingredient_indptr, ingredient_ids, vocab_size)
+        self.n_recipes = self.postings.n_recipes
+        self.vocab_size = vocab_size
+        self.block_pairs = block_pairs
+
+        # Distinct ingredients per recipe in CSR layout, row-sorted
+        self.indptr = np.zeros(self.n_recipes + 1, dtype=np.int64)
+        np.cumsum(self.postings.recipe_lengths, out=self.indptr[1:])
+        ingredient_of_posting = np.repeat(np.arange(vocab_size, dtype=np.int64), np.diff(self.postings.indptr))
+        self.ingredient_ids = ingredient_of_posting[np.argsort(self.postings.recipe_ids, kind="stable")].astype(np.int32)
+
+    def _blocks(self):
+        # Row ranges whose expansion (sum of the postings lengths of their ingredients) stays around block_pairs
+        work = np.zeros(len(self.ingredient_ids) + 1, dtype=np.int64)
+        np.cumsum(np.diff(self.postings.indptr)[self.ingredient_ids], out=work[1:])
+        work = work[self.indptr]
+
+        start = 0
+        while start < self.n_recipes:
+            end = int(np.searchsorted(work, work[start] + self.block_pairs, side="right")) - 1
+            end = min(max(end, start + 1), self.n_recipes)
+            yield start, end
+            start = end
+
+    def overlap_block(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Rows i in [start, end), j > i and the shared ingredient count of every pair sharing at least one
+        owners, ingredients = _gather(self.indptr, self.ingredient_ids, np.arange(start, end, dtype=np.int64))
+        expanded, others = _gather(self.postings.indptr, self.postings.recipe_ids, ingredients.astype(np.int64))
+        rows = owners[expanded] + start
+        others = others.astype(np.int64)
+
+        upper = others > rows
+        keys, counts = _run_lengths(np.sort((rows[upper] - start) * self.n_recipes + others[upper]))
+        return keys // self.n_recipes + start, keys % self.n_recipes, counts
+
+    def overlaps(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        # Shared ingredient count of the pairs (left[p], right[p]): the ingredients of both, repeats are shared ones
+        pairs = np.arange(len(left), dtype=np.int64)
+        left_pairs, left_ids = _gather(self.indptr, self.ingredient_ids, np.asarray(left, dtype=np.int64))
+        right_pairs, right_ids = _gather(self.indptr, self.ingredient_ids, np.asarray(right, dtype=np.int64))
+        keys = np.sort(np.concatenate((
+            pairs[left_pairs] * self.vocab_size + left_ids, pairs[right_pairs] * self.vocab_size + right_ids
+        )))
+        return np.bincount(keys[1:][keys[1:] == keys[:-1]] // self.vocab_size, minlength=len(left))
+
+    def positives(self, sample_size: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray, int]:
+        # Uniform sample without replacement of the pairs with overlap == 1, and the count of all of them
+        left, right, priorities = np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+        total = 0
+        for start, end in self._blocks():
+            rows, others, counts = self.overlap_block(start, end)
+            single = counts == 1
+            total += int(np.count_nonzero(single))
+
+            left = np.concatenate((left, rows[single]))
+            right = np.concatenate((right, others[single]))
+            priorities = np.concatenate((priorities, rng.random(len(left) - len(priorities))))
+            if len(priorities) > 2 * sample_size:
+                keep = np.argpartition(priorities, sample_size)[:sample_size]
+                left, right, priorities = left[keep], right[keep], priorities[keep]
+
+        order = np.argsort(priorities)[:sample_size]
+        return left[order], right[order], total
+
+    def negatives(self, sample_size: int, n_positives: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        # Uniform sample without replacement of the remaining pairs i < j: random pairs, positives rejected
+        sample_size = max(min(sample_size, self.n_recipes * (self.n_recipes - 1) // 2 - n_positives), 0)
+        left, right = np.empty(0, np.int64), np.empty(0, np.int64)
+        while len(left) < sample_size:
+            draws = max(2 * (sample_size - len(left)), 1024)
+            first = rng.integers(0, self.n_recipes, size=draws)
+            second = rng.integers(0, self.n_recipes - 1, size=draws)
+            second += second >= first
+            candidate_left, candidate_right = np.minimum(first, second), np.maximum(first, second)
+            negative = self.overlaps(candidate_left, candidate_right) != 1
+            left = np.concatenate((left, candidate_left[negative]))
+            right = np.concatenate((right, candidate_right[negative]))
+
+            # Repeated pairs are drawn once, in order of their first draw
+            keys = left * self.n_recipes + right
+            order = np.argsort(keys, kind="stable")
+            first_draws = np.sort(order[np.concatenate(([True], keys[order][1:] != keys[order][:-1]))])
+            left, right = left[first_draws], right[first_draws]
+
+        return left[:sample_size], right[:sample_size]
+
+    def mine(self, n_positives: int, n_negatives: int, seed: int = 0) -> "TrainingPairs":
+        rng = np.random.default_rng(seed)
+        positive_left, positive_right, total_positives = self.positives(n_positives, rng)
+        negative_left, negative_right = self.negatives(n_negatives, total_positives, rng)
+
+        return TrainingPairs(
+            self.indptr, self.ingredient_ids,
+            np.concatenate((positive_left, negative_left)),
+            np.concatenate((positive_right, negative_right)),
+            np.concatenate((np.ones(len(positive_left), np.int8), np.zeros(len(negative_left), np.int8))),
+            stats={"recipes": self.n_recipes, "positive_pairs_total": total_positives}
+        )
+
+
+class TrainingPairs:
+    """
+    Mined recipe pairs as written by scripts/mine_training_pairs.py: the recipes (distinct ingredient ids in CSR
+    layout) and per pair the two recipe rows and the label, 1 for exactly one shared ingredient.
+    """
+
+    def __init__(self, ingredient_indptr, ingredient_ids, left, right, labels, stats: dict | None = None):
+        self.ingredient_indptr = ingredient_indptr
+        self.ingredient_ids = ingredient_ids
+        self.left = left
+        self.right = right
+        self.labels = labels
+        self.stats = stats or dict()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def recipe(self, row: int) -> np.ndarray:
+        return self.ingredient_ids[self.ingredient_indptr[row]:self.ingredient_indptr[row + 1]]
+
+    def pair(self, idx: int) -> tuple[np.ndarray, np.ndarray, int]:
+        return self.recipe(self.left[idx]), self.recipe(self.right[idx]), int(self.labels[idx])
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(
+            path, ingredient_indptr=self.ingredient_indptr, ingredient_ids=self.ingredient_ids,
+            left=self.left, right=self.right, labels=self.labels, stats=json.dumps(self.stats)
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "TrainingPairs":
+        with np.load(path) as data:
+            return cls(
+                data["ingredient_indptr"], data["ingredient_ids"], data["left"], data["right"], data["labels"],
+                stats=json.loads(str(data["stats"]))
+            )
@@ -0,0 +1,43 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+class QueryEncoder:
+    """
+    Query embeddings of a RecipeEmbeddingModel. For mean pooling straight from the embedding table: one EmbeddingBag
+    sum over the flat ingredient ids, divided by the ingredient count and L2-normalized.
+
+    Same result as model(queries)[0] without padding, masking, the unused projection head and any autograd graph.
+    Id 0 is padding for the model, so it is skipped here as well. Other poolings run the forward pass.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.embedding_weight = model.embedding.weight.detach()
+
+    @property
+    def vocab_size(self) -> int:
+        return self.embedding_weight.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.embedding_weight.shape[1]
+
+    def encode(self, queries: list) -> np.ndarray:
+        if self.model.pooling != "mean":
+            with torch.inference_mode():
+                query_embeddings, _ = self.model([list(query) for query in queries])
+            return query_embeddings.cpu().numpy()
+
+        device = self.embedding_weight.device
+        queries = [[idx for idx in query if idx != 0] for query in queries]
+        lengths = torch.tensor([len(query) for query in queries], dtype=torch.long)
+        flat_ids = torch.tensor([idx for query in queries for idx in query], dtype=torch.long, device=device)
+        offsets = (torch.cumsum(lengths, dim=0) - lengths).to(device)
+
+        with torch.inference_mode():
+            sums = F.embedding_bag(flat_ids, self.embedding_weight, offsets, mode="sum")
+            # Same epsilon as the mean pooling of the model, a query of padding only stays a zero vector
+            means = sums / (lengths.to(device, sums.dtype).unsqueeze(-1) + 1e-8)
+            return F.normalize(means, dim=-1).cpu().numpy()
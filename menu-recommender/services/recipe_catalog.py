@@ -0,0 +1,199 @@
+import json
+import os
+
+import numpy as np
+
+from helpers.artifact_files import replaced_directory
+from services.ingredient_vocab import normalize_ingredient
+
+CATALOG_ARRAYS = ("title_offsets", "title_blob", "ner_offsets", "ner_blob", "ingredient_indptr", "ingredient_ids")
+
+
+def _pack_strings(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    # All strings utf-8 encoded back to back in one blob, string i is blob[offsets[i]:offsets[i + 1]]
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class RecipeCatalog:
+    """
+    Columnar recipe catalog, row i belongs to row i of the recipe embeddings.
+
+    Titles and the raw NER strings are stored as offsets + utf-8 blob, the NER ingredient ids in CSR layout
+    (indptr + ids). Opened from disk all arrays are memory-mapped read-only, a lookup by row only slices them.
+    """
+
+    def __init__(self, title_offsets, title_blob, ner_offsets, ner_blob, ingredient_indptr, ingredient_ids):
+        self.title_offsets = title_offsets
+        self.title_blob = title_blob
+        self.ner_offsets = ner_offsets
+        self.ner_blob = ner_blob
+        self.ingredient_indptr = ingredient_indptr
+        self.ingredient_ids = ingredient_ids
+
+        # Plain buffer views for the per-row lookups, indexing a np.memmap goes through python code on every access
+        self._title_offsets, self._title_blob = memoryview(np.asarray(title_offsets)), memoryview(np.asarray(title_blob))
+        self._ner_offsets, self._ner_blob = memoryview(np.asarray(ner_offsets)), memoryview(np.asarray(ner_blob))
+        self._ingredient_indptr = memoryview(np.asarray(ingredient_indptr))
+
+    def __len__(self) -> int:
+        return len(self.title_offsets) - 1
+
+    @classmethod
+    def from_dataframe(cls, recipe_dataset, ingredient_vocab) -> "RecipeCatalog":
+        titles = recipe_dataset["title"].fillna("").astype(str).tolist()
+        ners = recipe_dataset["NER"].fillna("").astype(str).tolist()
+
+        ingredient_indptr = np.zeros(len(ners) + 1, dtype=np.int64)
+        ingredient_ids = list()
+        # Raw term -> id, each distinct term is normalized and looked up once (a memory-mapped vocab bisects)
+        term_ids = dict()
+        for row, ner in enumerate(ners):
+            # Unknown ingredients are skipped
+            ids = list()
+            for term in ner.split(","):
+                if term not in term_ids:
+                    term_ids[term] = ingredient_vocab.get(normalize_ingredient(term))
+                ids.append(term_ids[term])
+            ingredient_ids.extend(idx for idx in ids if idx is not None)
+            ingredient_indptr[row + 1] = len(ingredient_ids)
+
+        return cls(
+            *_pack_strings(titles),
+            *_pack_strings(ners),
+            ingredient_indptr,
+            np.asarray(ingredient_ids, dtype=np.int32)
+        )
+
+    def write(self, path: str):
+        # A new directory renamed into place, workers serving the previous catalog keep their mapped files
+        with replaced_directory(path) as directory:
+            for name in CATALOG_ARRAYS:
+                np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+            with open(os.path.join(directory, "manifest.json"), "w") as f:
+                json.dump({"rows": len(self)}, f)
+
+    @classmethod
+    def open(cls, path: str) -> "RecipeCatalog":
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        catalog = cls(*[np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in CATALOG_ARRAYS])
+        if len(catalog) != manifest["rows"] or len(catalog.ingredient_indptr) != manifest["rows"] + 1:
+            raise ValueError(f"Recipe catalog {path} does not match its manifest")
+        return catalog
+
+    def title(self, idx: int) -> str:
+        return self._title_blob[self._title_offsets[idx]:self._title_offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def ner(self, idx: int) -> str:
+        return self._ner_blob[self._ner_offsets[idx]:self._ner_offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def ingredients(self, idx: int) -> np.ndarray:
+        return self.ingredient_ids[self._ingredient_indptr[idx]:self._ingredient_indptr[idx + 1]]
+
+    def recipe(self, idx: int) -> dict:
+        return {
+            "name": self.title(idx),
+            "ingredients": self.ner(idx),
+        }
+
+
+# Raw files of a RecipeCatalogWriter, name -> dtype
+CATALOG_PARTS = {
+    "title_blob": np.uint8,
+    "title_lengths": np.int64,
+    "ner_blob": np.uint8,
+    "ner_lengths": np.int64,
+    "ingredient_ids": np.int32,
+    "ingredient_counts": np.int64,
+}
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class RecipeCatalogWriter:
+    """
+    Builds a RecipeCatalog chunk by chunk without holding it in memory: every append goes to raw files in work_dir,
+    finish() turns them into the catalog layout.
+
+    Opened with the sizes of an earlier run (sizes()), the files are truncated to them and appends continue there.
+    """
+
+    def __init__(self, work_dir: str, sizes: dict | None = None):
+        os.makedirs(work_dir, exist_ok=True)
+        self.work_dir = work_dir
+        self._sizes = dict(sizes) if sizes else {name: 0 for name in CATALOG_PARTS}
+
+        self._files = dict()
+        for name in CATALOG_PARTS:
+            f = open(self._path(name), "a+b")
+            f.truncate(self._sizes[name])
+            self._files[name] = f
+
+    def __len__(self) -> int:
+        return self._sizes["title_lengths"] // np.dtype(np.int64).itemsize
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.work_dir, f"{name}.bin")
+
+    def _read(self, name: str) -> np.ndarray:
+        # Memory-mapped view of everything appended to a part
+        dtype = np.dtype(CATALOG_PARTS[name])
+        count = self._sizes[name] // dtype.itemsize
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=(count,))
+
+    def sizes(self) -> dict:
+        return dict(self._sizes)
+
+    def append(self, titles: list[str], ners: list[str], ingredient_ids: list[list[int]]):
+        title_bytes = [title.encode("utf-8") for title in titles]
+        ner_bytes = [ner.encode("utf-8") for ner in ners]
+        parts = {
+            "title_blob": np.frombuffer(b"".join(title_bytes), dtype=np.uint8),
+            "title_lengths": np.asarray([len(title) for title in title_bytes], dtype=np.int64),
+            "ner_blob": np.frombuffer(b"".join(ner_bytes), dtype=np.uint8),
+            "ner_lengths": np.asarray([len(ner) for ner in ner_bytes], dtype=np.int64),
+            "ingredient_ids": np.asarray([idx for ids in ingredient_ids for idx in ids], dtype=np.int32),
+            "ingredient_counts": np.asarray([len(ids) for ids in ingredient_ids], dtype=np.int64),
+        }
+        for name, array in parts.items():
+            self._files[name].write(array.tobytes())
+            self._sizes[name] += array.nbytes
+
+    def titles(self) -> list[str]:
+        self.sync()
+        title_offsets = _offsets(self._read("title_lengths"))
+        title_blob = self._read("title_blob").tobytes()
+        return [title_blob[start:end].decode("utf-8") for start, end in zip(title_offsets[:-1], title_offsets[1:])]
+
+    def sync(self):
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def finish(self, path: str) -> RecipeCatalog:
+        self.sync()
+        catalog = RecipeCatalog(
+            _offsets(self._read("title_lengths")),
+            self._read("title_blob"),
+            _offsets(self._read("ner_lengths")),
+            self._read("ner_blob"),
+            _offsets(self._read("ingredient_counts")),
+            self._read("ingredient_ids")
+        )
+        catalog.write(path)
+        return catalog
@@ -0,0 +1,125 @@
+import os
+import re
+import resource
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from helpers.logger import logger
+from services.ingredient_vocab import normalize_ingredient
+from services.recipe_catalog import RecipeCatalog, RecipeCatalogWriter
+
+# Title fixes of notebooks/clean_dataset.ipynb, in their order
+_TITLE_FIXES = (
+    (re.compile(r"W/"), ""),
+    (re.compile(r"W /"), ""),
+    (re.compile(r"/ "), ""),
+    (re.compile(r"\\"), ""),
+    (re.compile(r"/M\\"), ""),
+    (re.compile(r"\s+"), " "),
+)
+_TITLE_SLASH = re.compile(r"(?<=[A-Za-z])/(?=[A-Za-z])")
+
+# A title none of the fixes can change: no slash, no backslash, only single spaces inside
+_NEEDS_FIXES = re.compile(r"[/\\]|\s\s|[^\S ]|^\s|\s$")
+
+_URL_PREFIXES = ("HTTP", "http", "Http")
+
+
+def clean_title(title: str) -> str:
+    # One compiled scan per title, the fixes of the notebook (same order and result) only run where it finds something
+    if not _NEEDS_FIXES.search(title):
+        return title
+    for pattern, replacement in _TITLE_FIXES:
+        title = pattern.sub(replacement, title)
+    return _TITLE_SLASH.sub(" / ", title.strip())
+
+
+def clean_ner(ner) -> str:
+    # Same steps as notebooks/food_recommender.ipynb: '["a", "b"]' -> 'a, b'
+    if not isinstance(ner, str):
+        return ""
+    return ner.strip("[]").replace('"', "")
+
+
+def _peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RecipeCleaner:
+    """
+    Streams the raw recipes_data.csv chunk by chunk into a RecipeCatalog, the cleaning of both notebooks in one pass:
+    titles fixed, recipes without a title (also after the fixes), with a URL as title or a repeated title dropped, NER
+    stripped to 'a, b' and tokenized to ingredient ids.
+
+    Only the title and NER columns are parsed, the catalog is written through a RecipeCatalogWriter, so the memory
+    stays at one chunk plus the set of seen titles.
+    """
+
+    def __init__(self, ingredient_vocab, chunk_size: int = 50000):
+        self.ingredient_vocab = ingredient_vocab
+        self.chunk_size = chunk_size
+
+    def _clean_chunk(self, chunk: pd.DataFrame, seen_titles: set, stats: dict) -> tuple[list, list, list]:
+        titles, ners, ingredient_ids = list(), list(), list()
+        for title, ner in zip(chunk["title"].tolist(), chunk["NER"].tolist()):
+            if not isinstance(title, str):
+                stats["dropped_without_title"] += 1
+                continue
+            cleaned = clean_title(title)
+            stats["titles_fixed"] += cleaned != title
+            if not cleaned:
+                # Written to CSV and read back, an empty title was a missing one
+                stats["dropped_without_title"] += 1
+                continue
+            if cleaned.startswith(_URL_PREFIXES):
+                stats["dropped_url_title"] += 1
+                continue
+            if cleaned in seen_titles:
+                stats["dropped_repeated_title"] += 1
+                continue
+            seen_titles.add(cleaned)
+
+            ner = clean_ner(ner)
+            ids = [self.ingredient_vocab.get(normalize_ingredient(i)) for i in ner.split(",")]
+            titles.append(cleaned)
+            ners.append(ner)
+            ingredient_ids.append([idx for idx in ids if idx is not None])
+            stats["recipes_without_known_ingredients"] += not ingredient_ids[-1]
+        return titles, ners, ingredient_ids
+
+    def clean(self, csv_path: str, output_path: str) -> dict:
+        stats = {
+            "rows_read": 0, "recipes": 0, "titles_fixed": 0, "dropped_without_title": 0, "dropped_url_title": 0,
+            "dropped_repeated_title": 0, "recipes_without_known_ingredients": 0,
+        }
+        seen_titles = set()
+        started = time.perf_counter()
+
+        work_dir = tempfile.mkdtemp(prefix=".recipe_cleaning_", dir=os.path.dirname(os.path.abspath(output_path)))
+        writer = RecipeCatalogWriter(work_dir)
+        try:
+            reader = pd.read_csv(csv_path, usecols=["title", "NER"], dtype=str, chunksize=self.chunk_size)
+            chunk_started = time.perf_counter()
+            for chunk in reader:
+                writer.append(*self._clean_chunk(chunk, seen_titles, stats))
+                stats["rows_read"] += len(chunk)
+
+                chunk_seconds = time.perf_counter() - chunk_started
+                logger.info(f"Recipe cleaning: {stats['rows_read']} rows, {len(chunk) / max(chunk_seconds, 1e-9):.0f} rows/s")
+                chunk_started = time.perf_counter()
+
+            catalog: RecipeCatalog = writer.finish(output_path)
+        finally:
+            writer.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - started
+        stats["recipes"] = len(catalog)
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["rows_per_second"] = round(stats["rows_read"] / max(elapsed, 1e-9), 1)
+        stats["peak_memory_mb"] = round(_peak_memory_mb(), 1)
+        return stats
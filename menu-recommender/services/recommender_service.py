@@ -1,43 +1,246 @@
-import torch
-from torch.functional import F
+import numpy as np
 from random import sample
 
+from helpers.logger import logger
+from services.diversity import mmr_rerank
+from services.ingredient_postings import IngredientPostings, RecipeFilter
+from services.ingredient_resolver import IngredientResolution, IngredientResolver
+from services.ingredient_vocab import IngredientVocab
+from services.ivfpq_index import IVFPQSearchIndex
+from services.recipe_catalog import RecipeCatalog
+from services.result_cache import ResultCache
+from services.search_index import ExactSearchIndex, top_k_rows
+
+WEEK_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
 
 class RecommenderService:
-    def __init__(self, model, recipe_embeddings, ingredient_vocab, recipe_dataset):
-        self.model = model
-        self.recipe_embeddings = recipe_embeddings
+    def __init__(self, query_encoder, search_index: ExactSearchIndex, ingredient_vocab: IngredientVocab, recipe_catalog: RecipeCatalog,
+                 result_cache: ResultCache | None = None, artifact_version: str = "", strict: bool = True):
+        # QueryEncoder (torch) or NumpyQueryEncoder, this module does not import torch
+        self.query_encoder = query_encoder
+        self.search_index = search_index
         self.ingredient_vocab = ingredient_vocab
-        self.recipe_dataset = recipe_dataset
-
-    def _calculate_top_k_recipes(self, query_recipe_ingredients: list, top_k: int) -> list:
-        query_embedding, _ = self.model([query_recipe_ingredients])
-
-        # Calculate the topk
-        similarity = F.cosine_similarity(query_embedding, self.recipe_embeddings)
-        top_k = torch.topk(similarity, k=top_k)
-        results = [(idx.item(), similarity[idx].item()) for idx in top_k.indices]
-
-        recipe_recommendations = list()
-        for idx, score in results:
-            recipe = self.recipe_dataset.iloc[idx]
-            recipe_recommendations.append(
-                {
-                    "name": recipe["title"],
-                    "ingredients": recipe["NER"],
-                }
-            )
+        self.recipe_catalog = recipe_catalog
+        self.validate(strict)
+
+        # Built once, resolves request terms (normalized, plural and typo tolerant) to vocab ids
+        self.ingredient_resolver = IngredientResolver(ingredient_vocab)
+
+        # Built once, ingredient -> recipes postings answering exclude / require filters with a mask before the top-k
+        # over the recipes of the search index, a leniently validated catalog may have more
+        self.ingredient_postings = IngredientPostings.from_catalog(recipe_catalog, len(ingredient_vocab), len(search_index))
+
+        # Cache keys contain the artifact version, entries of previously loaded artifacts are never hit again
+        self.result_cache = result_cache
+        self.artifact_version = artifact_version
+
+    def validate(self, strict: bool = True):
+        # Artifacts that do not belong together are rejected before serving. Not strict (on startup): a catalog with
+        # more recipes than the search index is only logged, the recipes missing from the index are never returned
+        if len(self.search_index) != len(self.recipe_catalog):
+            message = f"Search index has {len(self.search_index)} recipes, the catalog {len(self.recipe_catalog)}"
+            if strict or len(self.search_index) > len(self.recipe_catalog):
+                raise ValueError(message)
+            logger.error(f"{message}: rebuild them with scripts/build_recipe_index.py, serving the first {len(self.search_index)} recipes")
+        if self.query_encoder.vocab_size != len(self.ingredient_vocab):
+            raise ValueError(f"Query encoder has {self.query_encoder.vocab_size} ingredients, the vocab {len(self.ingredient_vocab)}")
+        if len(self.recipe_catalog.ingredient_ids) and int(np.max(self.recipe_catalog.ingredient_ids)) >= len(self.ingredient_vocab):
+            raise ValueError(f"Recipe catalog has ingredient ids outside of the vocab of {len(self.ingredient_vocab)}")
+        if self.query_encoder.dim != self.search_index.dim:
+            raise ValueError(f"Query encoder embeds to {self.query_encoder.dim} dims, the search index has {self.search_index.dim}")
+
+    def close(self):
+        # Releases the processes and shared memory of a ShardedSearchIndex, once no request uses this service anymore
+        close = getattr(self.search_index, "close", None)
+        if close is not None:
+            close()
+
+    @staticmethod
+    def _canonical_query(query_recipe_ingredients) -> tuple:
+        # Order and duplicates of the ingredients do not change the query
+        return tuple(sorted(set(query_recipe_ingredients)))
+
+    def _embed_queries(self, queries: list[tuple], use_cache: bool = True) -> np.ndarray:
+        use_cache = use_cache and self.result_cache is not None
+
+        embeddings = [None] * len(queries)
+        if use_cache:
+            embeddings = [self.result_cache.get(("embedding", query, self.artifact_version)) for query in queries]
+
+        # One pass for all queries not in the cache, no autograd bookkeeping at all
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            query_embeddings = self.query_encoder.encode([queries[i] for i in missing])
+
+            for i, embedding in zip(missing, query_embeddings):
+                embeddings[i] = embedding
+                if use_cache:
+                    self.result_cache.put(("embedding", queries[i], self.artifact_version), embedding)
+
+        return np.stack(embeddings)
+
+    def _recipe_filter(self, exclude_ingredients: list[str] | None, require_ingredients: list[str] | None) -> RecipeFilter | None:
+        # Unknown excluded ingredients exclude nothing, an unknown required one leaves no recipe
+        exclude_ids = [self.ingredient_resolver.resolve_one(term) for term in exclude_ingredients or []]
+        require_ids = [self.ingredient_resolver.resolve_one(term) for term in require_ingredients or []]
+        return RecipeFilter.of(
+            [idx for idx in exclude_ids if idx is not None],
+            [idx for idx in require_ids if idx is not None],
+            unsatisfiable=None in require_ids
+        )
+
+    def _calculate_top_k_recipes_batch(self, queries_recipe_ingredients: list[list], top_k: int, use_cache: bool = True,
+                                       recipe_filter: RecipeFilter | None = None) -> list[list]:
+        queries = [self._canonical_query(query) for query in queries_recipe_ingredients]
+        use_cache = use_cache and self.result_cache is not None
+
+        recipe_recommendations = [None] * len(queries)
+        if use_cache:
+            recipe_recommendations = [self.result_cache.get(("top_k", query, top_k, recipe_filter, self.artifact_version)) for query in queries]
+
+        missing = [i for i, recipes in enumerate(recipe_recommendations) if recipes is None]
+        if missing:
+            # One similarity matrix [queries, recipes] and one top-k selection over it, filtered recipes masked before
+            allowed = self.ingredient_postings.allowed(recipe_filter) if recipe_filter is not None else None
+            _, top_k_indices = self.search_index.search(self._embed_queries([queries[i] for i in missing], use_cache), top_k, allowed=allowed)
+
+            for i, indices in zip(missing, top_k_indices.tolist()):
+                # Approximate search pads with -1 when it finds fewer than top_k recipes
+                recipe_recommendations[i] = [self.recipe_catalog.recipe(idx) for idx in indices if idx >= 0]
+                if use_cache:
+                    self.result_cache.put(("top_k", queries[i], top_k, recipe_filter, self.artifact_version), recipe_recommendations[i])
+
+        return recipe_recommendations
+
+    def _calculate_top_k_recipes(self, query_recipe_ingredients: list, top_k: int, use_cache: bool = True) -> list:
+        return self._calculate_top_k_recipes_batch([query_recipe_ingredients], top_k, use_cache)[0]
+
+    def _calculate_resolved_top_k_recipes_batch(self, resolutions: list[IngredientResolution], top_k: int,
+                                                recipe_filter: RecipeFilter | None = None) -> list[list]:
+        # Queries without any known ingredient have no embedding and no recipes
+        resolved = [i for i, resolution in enumerate(resolutions) if resolution.ids]
+        recipe_recommendations = [[] for _ in resolutions]
+        if resolved:
+            top_k_recipes = self._calculate_top_k_recipes_batch([resolutions[i].ids for i in resolved], top_k, recipe_filter=recipe_filter)
+            for i, recipes in zip(resolved, top_k_recipes):
+                recipe_recommendations[i] = recipes
 
         return recipe_recommendations
 
-    def get_recommendations(self, ingredients: list[str], top_k) -> list:
-        # Create query embedding
-        query_recipe_ingredients = [self.ingredient_vocab[i] for i in ingredients]
+    def _calculate_pantry_top_k_recipes(self, pantry_ids: list[int], top_k: int, pantry_weight: float, candidates: int,
+                                        recipe_filter: RecipeFilter | None = None) -> list:
+        query = self._canonical_query(pantry_ids)
+        cache_key = ("pantry", query, top_k, pantry_weight, candidates, recipe_filter, self.artifact_version)
+        if self.result_cache is not None:
+            recipes = self.result_cache.get(cache_key)
+            if recipes is not None:
+                return recipes
+
+        # The candidates are the best covered recipes and a bounded cosine shortlist, so a recipe without any pantry
+        # ingredient can still win on cosine at a low weight: blended score = (1 - w) * cosine + w * coverage. The
+        # shortlist is the whole catalog when it fits in candidates, the neighbours probed by an IVF-PQ index
+        # otherwise: an exact search scans every recipe, several times the cost of the rest of the ranking
+        allowed = self.ingredient_postings.allowed(recipe_filter) if recipe_filter is not None else None
+        queries = self._embed_queries([query])
+        similar = None
+        if len(self.search_index) <= candidates:
+            similar = np.arange(len(self.search_index)) if allowed is None else np.flatnonzero(allowed)
+        elif isinstance(self.search_index, IVFPQSearchIndex):
+            _, similar = self.search_index.search(queries, candidates, allowed)
+            similar = similar[0][similar[0] >= 0]
+        rows, coverage = self.ingredient_postings.coverage(query, allowed, limit=candidates, include=similar)
+        cosine = self.search_index.score_rows(queries, rows)[0]
+        _, best = top_k_rows(((1 - pantry_weight) * cosine + pantry_weight * coverage)[np.newaxis, :], top_k)
+
+        recipes = [self.recipe_catalog.recipe(int(rows[i])) for i in best[0]]
+        if self.result_cache is not None:
+            self.result_cache.put(cache_key, recipes)
+        return recipes
+
+    def _calculate_weekly_menu(self, query_recipe_ingredients: list, mmr_lambda: float, candidates: int,
+                               recipe_filter: RecipeFilter | None = None, use_cache: bool = True) -> dict:
+        query = self._canonical_query(query_recipe_ingredients)
+        use_cache = use_cache and self.result_cache is not None
+        cache_key = ("week", query, mmr_lambda, candidates, recipe_filter, self.artifact_version)
+        if use_cache:
+            weekly_menu = self.result_cache.get(cache_key)
+            if weekly_menu is not None:
+                return weekly_menu
+
+        # A wide candidate set from the embedding search, reranked for diversity so no two days get near-duplicates
+        allowed = self.ingredient_postings.allowed(recipe_filter) if recipe_filter is not None else None
+        relevance, rows = self.search_index.search(self._embed_queries([query], use_cache), candidates, allowed=allowed)
+        rows = np.where(rows >= 0, rows, 0)
+        picks = mmr_rerank(relevance, self.search_index.vectors(rows.ravel()).reshape(*rows.shape, -1), len(WEEK_DAYS), mmr_lambda)[0]
+
+        weekly_menu = {day: self.recipe_catalog.recipe(int(rows[0, pick])) for day, pick in zip(WEEK_DAYS, picks) if pick >= 0}
+        if use_cache:
+            self.result_cache.put(cache_key, weekly_menu)
+        return weekly_menu
+
+    def get_recommendations(self, ingredients: list[str], top_k, include_resolution: bool = False,
+                            exclude_ingredients: list[str] | None = None, require_ingredients: list[str] | None = None) -> list | dict:
+        # Create query embedding, unknown ingredients are skipped and reported as unmatched
+        resolution = self.ingredient_resolver.resolve(ingredients)
+        recipe_filter = self._recipe_filter(exclude_ingredients, require_ingredients)
+        recipes = self._calculate_resolved_top_k_recipes_batch([resolution], top_k, recipe_filter)[0]
+
+        if include_resolution:
+            return {"recipes": recipes, **resolution.to_dict()}
+        return recipes
 
-        return self._calculate_top_k_recipes(query_recipe_ingredients, top_k)
+    def get_batch_recommendations(self, ingredient_lists: list[list[str]], top_k, include_resolution: bool = False,
+                                  exclude_ingredients: list[str] | None = None, require_ingredients: list[str] | None = None) -> list:
+        if not ingredient_lists:
+            return []
+
+        # Create the query embeddings of all lists at once, the filters apply to every list
+        resolutions = [self.ingredient_resolver.resolve(ingredients) for ingredients in ingredient_lists]
+        recipe_filter = self._recipe_filter(exclude_ingredients, require_ingredients)
+        top_k_recipes = self._calculate_resolved_top_k_recipes_batch(resolutions, top_k, recipe_filter)
+
+        if include_resolution:
+            return [{"recipes": recipes, **resolution.to_dict()} for recipes, resolution in zip(top_k_recipes, resolutions)]
+        return top_k_recipes
+
+    def get_pantry_recommendations(self, ingredients: list[str], top_k, pantry_weight: float = 0.5, include_resolution: bool = False,
+                                   exclude_ingredients: list[str] | None = None, require_ingredients: list[str] | None = None,
+                                   candidates: int = 2000) -> list | dict:
+        # Cook from the pantry: blends the share of every recipe's ingredients in the pantry with the cosine score
+        resolution = self.ingredient_resolver.resolve(ingredients)
+        recipe_filter = self._recipe_filter(exclude_ingredients, require_ingredients)
+        recipes = self._calculate_pantry_top_k_recipes(resolution.ids, top_k, pantry_weight, candidates, recipe_filter) if resolution.ids else []
+
+        if include_resolution:
+            return {"recipes": recipes, **resolution.to_dict()}
+        return recipes
+
+    def get_weekly_menu(self, ingredients: list[str] | None, mmr_lambda: float = 0.7, candidates: int = 100,
+                        exclude_ingredients: list[str] | None = None, require_ingredients: list[str] | None = None) -> dict:
+        # Seven diverse recipes (monday ... sunday), around a random sample of ingredients when none are given
+        recipe_filter = self._recipe_filter(exclude_ingredients, require_ingredients)
+        if not ingredients:
+            return self._calculate_weekly_menu(sample(range(len(self.ingredient_vocab)), k=5), mmr_lambda, candidates, recipe_filter, use_cache=False)
+
+        resolution = self.ingredient_resolver.resolve(ingredients)
+        if not resolution.ids:
+            return {}
+        return self._calculate_weekly_menu(resolution.ids, mmr_lambda, candidates, recipe_filter)
 
     def sample_recommendations(self, top_k) -> list:
-        # Create random sample of ingredients
-        query_recipe_ingredients = sample(list(self.ingredient_vocab.values()), k=5)
+        # Create random sample of ingredients, random queries would only flood the cache
+        query_recipe_ingredients = sample(range(len(self.ingredient_vocab)), k=5)
+
+        return self._calculate_top_k_recipes(query_recipe_ingredients, top_k, use_cache=False)
+
+    def sample_batch_recommendations(self, count: int, top_k) -> list[list]:
+        # Many random samples in one forward pass and one scoring call
+        queries_recipe_ingredients = [sample(range(len(self.ingredient_vocab)), k=5) for _ in range(count)]
+
+        return self._calculate_top_k_recipes_batch(queries_recipe_ingredients, top_k, use_cache=False)
 
-        return self._calculate_top_k_recipes(query_recipe_ingredients, top_k)
+    def cache_stats(self) -> dict:
+        if self.result_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, "artifact_version": self.artifact_version, **self.result_cache.stats()}
@@ -0,0 +1,74 @@
+import numpy as np
+
+# Below this share of allowed recipes a filtered search scores only the allowed rows, above it all rows get scored
+SUBSET_SCORING_FRACTION = 0.2
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    # Partial selection of the top_k columns per row, only those get sorted (best first)
+    top_k = min(top_k, scores.shape[-1])
+    if top_k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+
+    candidates = np.argpartition(scores, -top_k, axis=-1)[:, -top_k:]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidate_scores, order, axis=-1), np.take_along_axis(candidates, order, axis=-1)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.ascontiguousarray(matrix / np.maximum(norms, 1e-12), dtype=np.float32)
+
+
+def filtered_search(index, queries: np.ndarray, top_k: int, allowed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # allowed is a boolean mask over the recipes, applied before the top-k selection. Returns at most as many
+    # results as there are allowed recipes
+    rows = np.flatnonzero(allowed)
+    if len(rows) <= SUBSET_SCORING_FRACTION * len(allowed):
+        scores, positions = top_k_rows(index.score_rows(queries, rows), top_k)
+        return scores, rows[positions]
+
+    scores = np.where(allowed, index.score(queries), -np.inf)
+    return top_k_rows(scores, min(top_k, len(rows)))
+
+
+class ExactSearchIndex:
+    def __init__(self, recipe_embeddings):
+        # Normalize and lay out the matrix once, a search is then a single matrix product (cosine == dot product)
+        self.matrix = normalize_rows(recipe_embeddings)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def vectors(self, rows) -> np.ndarray:
+        return self.matrix[rows]
+
+    def score(self, queries: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+
+        # Matrix-vector product for a single query, matrix-matrix product for a batch
+        if queries.shape[0] == 1:
+            return (self.matrix @ queries[0])[np.newaxis, :]
+        return queries @ self.matrix.T
+
+    def score_rows(self, queries: np.ndarray, rows: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+
+        # Gather the rows one cache-sized block at a time instead of copying all of them first
+        scores = np.empty((queries.shape[0], len(rows)), dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            scores[:, start:start + block_size] = queries @ self.matrix[rows[start:start + block_size]].T
+        return scores
+
+    def search(self, queries: np.ndarray, top_k: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        if allowed is not None:
+            return filtered_search(self, queries, top_k, allowed)
+        return top_k_rows(self.score(queries), top_k)
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from services.search_index import normalize_rows, top_k_rows
+
+_BLAS_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Set in every pool process by _attach
+_shared_memory = None
+_matrix = None
+
+
+def _attach(name: str, shape: tuple[int, int]):
+    global _shared_memory, _matrix
+    # The pool processes share the resource tracker of the coordinator, which owns and unlinks the block
+    _shared_memory = SharedMemory(name=name)
+    _matrix = np.ndarray(shape, dtype=np.float32, buffer=_shared_memory.buf)
+
+
+def _ready(_) -> int:
+    return os.getpid()
+
+
+def _search_shard(start: int, end: int, queries: np.ndarray, top_k: int, allowed: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+    # Partial top-k of one shard, with the global rows of the recipes
+    scores = queries @ _matrix[start:end].T
+    if allowed is not None:
+        scores = np.where(allowed, scores, -np.inf)
+        top_k = min(top_k, int(np.count_nonzero(allowed)))
+    shard_scores, shard_rows = top_k_rows(scores, top_k)
+    return shard_scores, shard_rows + start
+
+
+@contextmanager
+def _single_threaded_blas():
+    # Pool processes read these when they start: one BLAS thread each, the shards are the parallelism
+    previous = {name: os.environ.get(name) for name in _BLAS_THREAD_VARIABLES}
+    os.environ.update({name: "1" for name in _BLAS_THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class ShardedSearchIndex:
+    """
+    Exact cosine search over a catalog partitioned into n_shards contiguous row ranges, scanned in parallel by a
+    process pool. The normalized matrix lives once in shared memory, every pool process maps it.
+
+    Every shard returns a partial top-k, the coordinator merges them into the global top-k.
+    """
+
+    def __init__(self, recipe_embeddings, n_shards: int, block_size: int = 65536):
+        n_recipes, dim = recipe_embeddings.shape
+        self.n_shards = n_shards
+        self.bounds = np.linspace(0, n_recipes, n_shards + 1).astype(np.int64)
+
+        # Normalized block by block straight into shared memory, the source may be a memory-mapped file
+        self._shared_memory = SharedMemory(create=True, size=max(n_recipes * dim * 4, 1))
+        self.matrix = np.ndarray((n_recipes, dim), dtype=np.float32, buffer=self._shared_memory.buf)
+        for start in range(0, n_recipes, block_size):
+            self.matrix[start:start + block_size] = normalize_rows(recipe_embeddings[start:start + block_size])
+
+        with _single_threaded_blas():
+            self._pool = ProcessPoolExecutor(
+                max_workers=n_shards,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_attach,
+                initargs=(self._shared_memory.name, (n_recipes, dim))
+            )
+            # Start all pool processes now, while the environment is set
+            list(self._pool.map(_ready, range(n_shards)))
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def vectors(self, rows) -> np.ndarray:
+        return self.matrix[rows]
+
+    def score(self, queries: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+        return queries @ self.matrix.T
+
+    def score_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(queries))
+        return queries @ self.matrix[rows].T
+
+    def search(self, queries: np.ndarray, top_k: int, allowed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(np.atleast_2d(queries))
+        futures = [
+            self._pool.submit(_search_shard, start, end, queries, top_k, allowed[start:end] if allowed is not None else None)
+            for start, end in zip(self.bounds[:-1], self.bounds[1:])
+        ]
+        partial = [future.result() for future in futures]
+
+        # Merge: top-k over the n_shards * top_k partial results
+        scores = np.concatenate([shard_scores for shard_scores, _ in partial], axis=1)
+        rows = np.concatenate([shard_rows for _, shard_rows in partial], axis=1)
+        merged_scores, positions = top_k_rows(scores, top_k)
+        return merged_scores, np.take_along_axis(rows, positions, axis=1)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.matrix = None
+        self._shared_memory.close()
+        self._shared_memory.unlink()
@@ -0,0 +1,214 @@
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+from helpers.logger import logger
+
+
+def contrastive_loss(batch_one, batch_two, temperature=0.2):
+    # NT-Xent of notebooks/food_recommender.ipynb: pair i of the batch is the positive of i, all others negatives
+    batch_size = batch_one.size(0)
+    z = torch.cat([batch_one, batch_two], dim=0)
+
+    sim = torch.matmul(z, z.T) / temperature
+    sim.fill_diagonal_(-9e15)
+
+    labels = torch.cat([torch.arange(batch_size) + batch_size, torch.arange(batch_size)], dim=0).to(z.device)
+    return F.cross_entropy(sim, labels)
+
+
+def _pack(offsets: torch.Tensor, ingredient_ids: torch.Tensor, rows: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    # The ingredients of the given recipes back to back, and their offsets (one more than there are rows)
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    batch_offsets = torch.zeros(len(rows) + 1, dtype=torch.long)
+    torch.cumsum(lengths, dim=0, out=batch_offsets[1:])
+    positions = torch.repeat_interleave(starts - batch_offsets[:-1], lengths) + torch.arange(int(batch_offsets[-1]))
+    return ingredient_ids[positions], batch_offsets
+
+
+class PairDataset(Dataset):
+    """
+    TrainingPairs as packed index tensors: the ingredient ids of all recipes in one flat tensor plus offsets,
+    tokenized once. An item is a whole batch (a list of pair indices), packed by the DataLoader workers.
+    """
+
+    def __init__(self, training_pairs, positives_only: bool = False):
+        # Id 0 is padding for RecipeEmbeddingModel.forward, left out here as well
+        indptr = np.asarray(training_pairs.ingredient_indptr, dtype=np.int64)
+        ingredient_ids = np.asarray(training_pairs.ingredient_ids, dtype=np.int64)
+        known = ingredient_ids != 0
+        known_before = np.zeros(len(known) + 1, dtype=np.int64)
+        np.cumsum(known, out=known_before[1:])
+
+        self.offsets = torch.from_numpy(known_before[indptr])
+        self.ingredient_ids = torch.from_numpy(ingredient_ids[known])
+
+        keep = np.asarray(training_pairs.labels) == 1 if positives_only else slice(None)
+        self.left = torch.from_numpy(np.asarray(training_pairs.left, dtype=np.int64)[keep])
+        self.right = torch.from_numpy(np.asarray(training_pairs.right, dtype=np.int64)[keep])
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    def __getitem__(self, pair_indices) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        pair_indices = torch.as_tensor(pair_indices, dtype=torch.long)
+        return (
+            *_pack(self.offsets, self.ingredient_ids, self.left[pair_indices]),
+            *_pack(self.offsets, self.ingredient_ids, self.right[pair_indices])
+        )
+
+
+class EpochBatches(Sampler):
+    # Shuffled batches of an epoch, the order depends only on (seed, epoch), so a resumed epoch skips what was trained
+    def __init__(self, n_samples: int, batch_size: int, seed: int, epoch: int, start_batch: int = 0):
+        self.n_samples = n_samples
+        self.batch_size = batch_size
+        self.seed = seed
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    def batches(self) -> list[list[int]]:
+        generator = torch.Generator().manual_seed(self.seed * 100003 + self.epoch)
+        order = torch.randperm(self.n_samples, generator=generator)
+        return [batch.tolist() for batch in order.split(self.batch_size)]
+
+    def __iter__(self):
+        return iter(self.batches()[self.start_batch:])
+
+    def __len__(self) -> int:
+        return max(-(-self.n_samples // self.batch_size) - self.start_batch, 0)
+
+
+class ContrastiveTrainer:
+    """
+    Contrastive training of a RecipeEmbeddingModel on mined recipe pairs, on the CPU by default.
+
+    Batches are packed by DataLoader worker processes while the main process trains. With sparse_embedding the
+    embedding table gets sparse gradients of the rows in the batch and a SparseAdam (lazy Adam) optimizer, instead of
+    a dense Adam update of the whole table every step. The model, the optimizers and
+    the position (epoch, batch) are checkpointed every checkpoint_every steps and after every epoch, written to a
+    temporary file and renamed, so a killed run resumes from its last checkpoint.
+    """
+
+    def __init__(self, model, dataset: PairDataset, checkpoint_dir: str, batch_size: int = 128, lr: float = 1e-3,
+                 temperature: float = 0.2, num_workers: int = 2, checkpoint_every: int = 500, seed: int = 0,
+                 sparse_embedding: bool = False, device: str = "cpu"):
+        self.model = model.to(device)
+        self.dataset = dataset
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = batch_size
+        self.temperature = temperature
+        self.num_workers = num_workers
+        self.checkpoint_every = checkpoint_every
+        self.seed = seed
+        self.sparse_embedding = sparse_embedding
+        self.device = device
+        if sparse_embedding:
+            others = [parameter for name, parameter in model.named_parameters() if name != "embedding.weight"]
+            self.optimizers = [torch.optim.SparseAdam([model.embedding.weight], lr=lr), torch.optim.Adam(others, lr=lr)]
+        else:
+            self.optimizers = [torch.optim.Adam(model.parameters(), lr=lr)]
+
+        self.epoch = 0
+        self.batch = 0
+        self.samples = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, "checkpoint.pt")
+
+    def save_checkpoint(self):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        temporary_path = f"{self.checkpoint_path}.tmp"
+        torch.save({
+            "model": self.model.state_dict(),
+            "optimizers": [optimizer.state_dict() for optimizer in self.optimizers],
+            "epoch": self.epoch,
+            "batch": self.batch,
+            "samples": self.samples,
+            "elapsed_seconds": self.elapsed_seconds,
+            "seed": self.seed,
+            "batch_size": self.batch_size,
+            "sparse_embedding": self.sparse_embedding,
+        }, temporary_path)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self) -> bool:
+        if not os.path.exists(self.checkpoint_path):
+            return False
+
+        checkpoint = torch.load(self.checkpoint_path, map_location=self.device)
+        settings = (checkpoint["seed"], checkpoint["batch_size"], checkpoint["sparse_embedding"])
+        if settings != (self.seed, self.batch_size, self.sparse_embedding):
+            raise ValueError(f"Checkpoint {self.checkpoint_path} was trained with another seed, batch size or optimizer")
+        self.model.load_state_dict(checkpoint["model"])
+        for optimizer, state in zip(self.optimizers, checkpoint["optimizers"]):
+            optimizer.load_state_dict(state)
+        self.epoch, self.batch = checkpoint["epoch"], checkpoint["batch"]
+        self.samples, self.elapsed_seconds = checkpoint["samples"], checkpoint["elapsed_seconds"]
+        return True
+
+    def _loader(self) -> DataLoader:
+        return DataLoader(
+            self.dataset,
+            sampler=EpochBatches(len(self.dataset), self.batch_size, self.seed, self.epoch, self.batch),
+            batch_size=None,
+            num_workers=self.num_workers,
+            prefetch_factor=4 if self.num_workers > 0 else None
+        )
+
+    def _train_step(self, left_ids, left_offsets, right_ids, right_offsets) -> float:
+        _, left_projected = self.model.forward_packed(left_ids.to(self.device), left_offsets.to(self.device), self.sparse_embedding)
+        _, right_projected = self.model.forward_packed(right_ids.to(self.device), right_offsets.to(self.device), self.sparse_embedding)
+        loss = contrastive_loss(left_projected, right_projected, self.temperature)
+
+        for optimizer in self.optimizers:
+            optimizer.zero_grad()
+        loss.backward()
+        for optimizer in self.optimizers:
+            optimizer.step()
+        return loss.item()
+
+    def train(self, epochs: int) -> dict:
+        self.model.train()
+        while self.epoch < epochs:
+            total_loss, n_batches, epoch_samples = 0.0, 0, 0
+            epoch_started = started = time.perf_counter()
+            for left_ids, left_offsets, right_ids, right_offsets in self._loader():
+                total_loss += self._train_step(left_ids, left_offsets, right_ids, right_offsets)
+                n_batches += 1
+                epoch_samples += len(left_offsets) - 1
+                self.batch += 1
+                self.samples += len(left_offsets) - 1
+
+                if self.checkpoint_every > 0 and self.batch % self.checkpoint_every == 0:
+                    self.elapsed_seconds += time.perf_counter() - started
+                    started = time.perf_counter()
+                    self.save_checkpoint()
+
+            finished = time.perf_counter()
+            self.elapsed_seconds += finished - started
+            epoch_seconds = finished - epoch_started
+            self.epoch, self.batch = self.epoch + 1, 0
+            self.save_checkpoint()
+            logger.info(
+                f"Epoch {self.epoch}, loss: {total_loss / max(n_batches, 1):.4f}, "
+                f"{epoch_samples / max(epoch_seconds, 1e-9):.0f} samples/s"
+            )
+
+        self.model.eval()
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "epochs": self.epoch,
+            "samples": self.samples,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "samples_per_second": round(self.samples / max(self.elapsed_seconds, 1e-9), 1),
+        }
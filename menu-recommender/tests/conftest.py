@@ -0,0 +1,79 @@
+"""Shared fixtures for the recommender tests."""
+
+import io
+import threading
+import time
+
+import pandas as pd
+import pytest
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.ingredient_vocab import IngredientVocab
+from services.query_encoder import QueryEncoder
+from services.recipe_catalog import RecipeCatalog
+from services.recommender_service import RecommenderService
+from services.search_index import ExactSearchIndex
+
+INGREDIENTS = ["padding", "beef", "salt", "flour", "sugar", "butter", "egg", "milk", "ham", "rice", "tomato", "basil"]
+
+
+@pytest.fixture
+def ingredient_vocab():
+    return {ingredient: idx for idx, ingredient in enumerate(INGREDIENTS)}
+
+
+@pytest.fixture
+def model(ingredient_vocab):
+    torch.manual_seed(0)
+    model = RecipeEmbeddingModel(vocab_size=len(ingredient_vocab), embedding_dim=16, projection_dim=16)
+    model.eval()
+    return model
+
+
+@pytest.fixture
+def recipe_dataset():
+    torch.manual_seed(1)
+    rows = list()
+    for i in range(40):
+        ingredients = [INGREDIENTS[j] for j in (torch.randperm(len(INGREDIENTS) - 1)[:4] + 1).tolist()]
+        rows.append({"title": f"Recipe {i}", "NER": ", ".join(ingredients)})
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def recommender_service(model, ingredient_vocab, recipe_dataset):
+    recipe_ingredients = [[ingredient_vocab[i] for i in ner.split(", ")] for ner in recipe_dataset["NER"]]
+    with torch.no_grad():
+        recipe_embeddings, _ = model(recipe_ingredients)
+
+    return RecommenderService(
+        query_encoder=QueryEncoder(model),
+        ingredient_vocab=IngredientVocab.from_dict(ingredient_vocab),
+        search_index=ExactSearchIndex(recipe_embeddings.numpy()),
+        recipe_catalog=RecipeCatalog.from_dataframe(recipe_dataset, ingredient_vocab)
+    )
+
+
+class FakeReplicateClient:
+    """Local stand-in for replicate: run() returns one file-like image after delay_seconds, and counts the calls."""
+
+    def __init__(self, delay_seconds: float = 0.0, image_size: int = 100, fail: bool = False):
+        self.delay_seconds = delay_seconds
+        self.image_size = image_size
+        self.fail = fail
+        self.prompts = list()
+        self._lock = threading.Lock()
+
+    def run(self, model: str, input: dict):
+        with self._lock:
+            self.prompts.append(input["prompt"])
+        time.sleep(self.delay_seconds)
+        if self.fail:
+            raise RuntimeError("replicate is down")
+        return [io.BytesIO(input["prompt"].encode().ljust(self.image_size, b"\0"))]
+
+
+@pytest.fixture
+def fake_replicate():
+    return FakeReplicateClient()
@@ -0,0 +1,169 @@
+"""Tests for the double-buffered hot reload of the recommender artifacts."""
+
+import asyncio
+import time
+
+import pytest
+
+from services.artifact_reloader import ArtifactReloader, ReloadInProgress
+from services.recommender_service import RecommenderService
+from services.result_cache import ResultCache
+from services.search_index import ExactSearchIndex
+
+
+class _ClosingIndex(ExactSearchIndex):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _service(recommender_service, version: str, result_cache=None) -> RecommenderService:
+    return RecommenderService(
+        query_encoder=recommender_service.query_encoder,
+        ingredient_vocab=recommender_service.ingredient_vocab,
+        search_index=_ClosingIndex(recommender_service.search_index.vectors(slice(None))),
+        recipe_catalog=recommender_service.recipe_catalog,
+        result_cache=result_cache,
+        artifact_version=version
+    )
+
+
+class _App:
+    def __init__(self, service, versions, load_seconds: float = 0):
+        # versions: the services load() returns in turn, an exception is raised instead
+        self.service = service
+        self.versions = list(versions)
+        self.load_seconds = load_seconds
+        # The artifact version on disk, by default one that differs from the serving one
+        self.fingerprints = ["on disk"]
+
+    def load(self):
+        time.sleep(self.load_seconds)
+        loaded = self.versions.pop(0)
+        if isinstance(loaded, Exception):
+            raise loaded
+        return loaded
+
+    def reloader(self, **kwargs) -> ArtifactReloader:
+        return ArtifactReloader(
+            load=self.load,
+            fingerprint=lambda: self.fingerprints.pop(0) if len(self.fingerprints) > 1 else self.fingerprints[0],
+            service_provider=lambda: self.service,
+            publish=lambda service: setattr(self, "service", service),
+            **kwargs
+        )
+
+
+def test_reload_swaps_and_retires_the_old_service_after_the_drain(recommender_service):
+    """Test that requests holding the old service keep working until the drain is over, new ones get the new service."""
+    result_cache = ResultCache(max_size=100, ttl_seconds=60)
+    old, new = _service(recommender_service, "v1", result_cache), _service(recommender_service, "v2", result_cache)
+    app = _App(old, [new])
+    reloader = app.reloader(drain_seconds=0.1)
+
+    async def run():
+        old.get_recommendations(["beef", "salt"], 3)
+        in_flight = app.service
+        stats = await reloader.reload()
+        cached_after_reload = len(result_cache)
+        during_drain = (in_flight.get_recommendations(["beef", "salt"], 3), old.search_index.closed)
+        await asyncio.sleep(0.2)
+        return stats, cached_after_reload, during_drain
+
+    stats, cached_after_reload, (in_flight_result, closed_during_drain) = asyncio.run(run())
+
+    assert app.service is new and stats["artifact_version"] == "v2" and stats["reloads"] == 1
+    assert in_flight_result == new.get_recommendations(["beef", "salt"], 3)
+    assert not closed_during_drain and old.search_index.closed and not new.search_index.closed
+    assert cached_after_reload == 0
+
+
+def test_reload_of_unchanged_artifacts_keeps_the_service_and_its_caches(recommender_service):
+    """Test that a reload finding the serving artifact version neither loads nor publishes, nor clears the cache."""
+    result_cache = ResultCache(max_size=100, ttl_seconds=60)
+    current = _service(recommender_service, "v1", result_cache)
+    reloaded = _service(recommender_service, "v1", result_cache)
+    app = _App(current, [reloaded])
+    app.fingerprints = ["v1"]
+    reloader = app.reloader(drain_seconds=0)
+    current.get_recommendations(["beef", "salt"], 3)
+
+    stats = asyncio.run(reloader.reload())
+
+    assert stats["unchanged"] and stats["reloads"] == 0
+    assert app.service is current and app.versions == [reloaded] and len(result_cache) > 0
+
+    # Changed on disk, but changed back by the time it was loaded
+    app.fingerprints = ["v2"]
+    stats = asyncio.run(reloader.reload())
+
+    assert stats["unchanged"] and app.service is current and reloaded.search_index.closed and len(result_cache) > 0
+
+
+def test_failed_reload_keeps_serving_the_current_service(recommender_service):
+    """Test that a rejected artifact set is reported and the current service stays published and open."""
+    old = _service(recommender_service, "v1")
+    app = _App(old, [ValueError("Search index has 10 recipes, the catalog 40")])
+    reloader = app.reloader(drain_seconds=0)
+
+    with pytest.raises(ValueError):
+        asyncio.run(reloader.reload())
+
+    assert app.service is old and not old.search_index.closed
+    assert (reloader.failures, reloader.reloads) == (1, 0) and "10 recipes" in reloader.last_error
+
+
+def test_concurrent_reloads_are_refused(recommender_service):
+    """Test that a reload requested while one is loading is refused instead of queued."""
+    app = _App(_service(recommender_service, "v1"), [_service(recommender_service, "v2")], load_seconds=0.1)
+    reloader = app.reloader(drain_seconds=0)
+
+    async def run():
+        first = asyncio.create_task(reloader.reload())
+        await asyncio.sleep(0.01)
+        with pytest.raises(ReloadInProgress):
+            await reloader.reload()
+        await first
+        await reloader.close()
+
+    asyncio.run(run())
+
+    assert app.service.artifact_version == "v2"
+
+
+def test_watch_reloads_changed_artifacts_once_they_are_stable(recommender_service):
+    """Test that the watcher waits for two equal fingerprints and does not retry a rejected artifact set."""
+    app = _App(_service(recommender_service, "v1"), [ValueError("bad"), _service(recommender_service, "v3")])
+    # copying v2, v2 complete (rejected), v3 complete
+    app.fingerprints = ["v1", "v2-partial", "v2", "v2", "v2", "v2", "v3", "v3", "v3"]
+    reloader = app.reloader(drain_seconds=0)
+
+    async def run():
+        task = asyncio.create_task(reloader.watch(0.005))
+        while app.service.artifact_version != "v3":
+            await asyncio.sleep(0.005)
+        task.cancel()
+        await reloader.close()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+    assert (reloader.failures, reloader.reloads) == (1, 1)
+
+
+def test_close_releases_a_cancelled_reload(recommender_service):
+    """Test that shutting down during a load closes the artifacts it loaded instead of leaking them."""
+    loaded = _service(recommender_service, "v2")
+    app = _App(_service(recommender_service, "v1"), [loaded], load_seconds=0.1)
+    reloader = app.reloader(drain_seconds=0)
+
+    async def run():
+        reloading = asyncio.create_task(reloader.reload())
+        await asyncio.sleep(0.01)
+        reloading.cancel()
+        await asyncio.gather(reloading, return_exceptions=True)
+        await reloader.close()
+
+    asyncio.run(run())
+
+    assert app.service.artifact_version == "v1" and loaded.search_index.closed
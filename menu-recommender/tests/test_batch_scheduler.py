@@ -0,0 +1,71 @@
+"""Tests for the micro-batching scheduler."""
+
+import asyncio
+
+from services.batch_scheduler import BatchScheduler
+
+
+class _CountingService:
+    def __init__(self, recommender_service):
+        self.recommender_service = recommender_service
+        self.batch_sizes = list()
+
+    def get_batch_recommendations(self, ingredient_lists, top_k, include_resolution=False, **filters):
+        self.batch_sizes.append(len(ingredient_lists))
+        return self.recommender_service.get_batch_recommendations(ingredient_lists, top_k, include_resolution, **filters)
+
+
+def test_batch_scheduler_batches_concurrent_requests(recommender_service):
+    """Test that concurrent requests share one batch and each gets the answer of a single request."""
+    service = _CountingService(recommender_service)
+    scheduler = BatchScheduler(max_batch_size=8, window_ms=50)
+    queries = [(["beef", "salt"], 2, False), (["flour", "sugar"], 4, False), (["rice", "unicorn"], 3, True)]
+
+    async def run():
+        task = asyncio.create_task(scheduler.run(lambda: service))
+        results = await asyncio.gather(*[scheduler.submit(*query) for query in queries])
+        task.cancel()
+        return results
+
+    results = asyncio.run(run())
+
+    assert service.batch_sizes == [3]
+    for (ingredients, top_k, include_resolution), result in zip(queries, results):
+        assert result == recommender_service.get_recommendations(ingredients, top_k, include_resolution)
+    assert results[2]["unmatched"] == ["unicorn"]
+
+
+def test_batch_scheduler_propagates_errors():
+    """Test that a failing batch fails every waiting request instead of hanging them."""
+    class _FailingService:
+        def get_batch_recommendations(self, ingredient_lists, top_k, include_resolution=False, **filters):
+            raise RuntimeError("boom")
+
+    scheduler = BatchScheduler(max_batch_size=4, window_ms=1)
+
+    async def run():
+        task = asyncio.create_task(scheduler.run(lambda: _FailingService()))
+        results = await asyncio.gather(scheduler.submit(["beef"], 1), scheduler.submit(["rice"], 1), return_exceptions=True)
+        task.cancel()
+        return results
+
+    assert [str(result) for result in asyncio.run(run())] == ["boom", "boom"]
+
+
+def test_batch_scheduler_groups_requests_by_filter(recommender_service):
+    """Test that requests with different filters in one batch each get their own filtered answer."""
+    service = _CountingService(recommender_service)
+    scheduler = BatchScheduler(max_batch_size=8, window_ms=50)
+    queries = [(["beef", "salt"], 5, False, ["flour"], None), (["beef", "salt"], 5, False, None, None), (["rice"], 3, False, ["flour"], None)]
+
+    async def run():
+        task = asyncio.create_task(scheduler.run(lambda: service))
+        results = await asyncio.gather(*[scheduler.submit(*query) for query in queries])
+        task.cancel()
+        return results
+
+    results = asyncio.run(run())
+
+    assert sorted(service.batch_sizes) == [1, 2]
+    for (ingredients, top_k, include_resolution, exclude, require), result in zip(queries, results):
+        assert result == recommender_service.get_recommendations(ingredients, top_k, include_resolution, exclude, require)
@@ -0,0 +1,25 @@
+"""Tests for the maximal marginal relevance reranking."""
+
+import numpy as np
+
+from services.diversity import mmr_rerank
+
+
+def test_mmr_rerank_skips_near_duplicates():
+    """Test that a near-duplicate of a picked candidate loses against a less relevant but different one."""
+    vectors = np.array([[[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]]])
+    relevance = np.array([[0.9, 0.89, 0.5]])
+
+    assert mmr_rerank(relevance, vectors, count=2, mmr_lambda=0.5).tolist() == [[0, 2]]
+    assert mmr_rerank(relevance, vectors, count=2, mmr_lambda=1.0).tolist() == [[0, 1]]
+
+
+def test_mmr_rerank_batches_and_pads():
+    """Test that every query of a batch is reranked on its own and missing candidates are -1."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2, 3, 4))
+    relevance = np.array([[0.1, 0.3, 0.2], [0.5, -np.inf, 0.4]])
+
+    picks = mmr_rerank(relevance, vectors, count=4, mmr_lambda=1.0)
+
+    assert picks.tolist() == [[1, 2, 0, -1], [0, 2, -1, -1]]
@@ -0,0 +1,144 @@
+"""Tests for the on-disk image cache and the single-flight image generation."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.image_cache import ImageCache, SingleFlight, image_key
+from services.image_service import ImageService
+
+
+def test_image_key_ignores_case_and_whitespace():
+    """Test that the same dish written differently maps to the same hashed key."""
+    assert image_key(" Beef  Stew") == image_key("beef stew")
+    assert image_key("beef stew") != image_key("beef_stew")
+    assert len(image_key("../../etc/passwd")) == 64
+
+
+def test_image_cache_evicts_least_recently_used(tmp_path):
+    """Test that the least recently used images are removed from disk above the size limit."""
+    cache = ImageCache(str(tmp_path), max_bytes=250)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    assert cache.get("a") is not None
+
+    cache.put("c", b"c" * 100)
+
+    assert cache.get("b") is None and not os.path.exists(cache.path("b"))
+    assert open(cache.get("a"), "rb").read() == b"a" * 100
+    assert cache.stats() == {"images": 2, "bytes": 200, "max_bytes": 250, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_image_cache_survives_restarts(tmp_path):
+    """Test that a new cache on the same directory finds the images in their LRU order and drops partial writes."""
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode() * 100)
+        time.sleep(0.01)
+    cache.get("a")
+    (tmp_path / ".tmp-interrupted").write_bytes(b"partial")
+    os.utime(tmp_path / ".tmp-interrupted", (time.time() - 3600, time.time() - 3600))
+    (tmp_path / ".tmp-writing").write_bytes(b"partial")
+
+    reopened = ImageCache(str(tmp_path), max_bytes=250)
+
+    assert len(reopened) == 2 and reopened.get("b") is None
+    assert reopened.get("a") is not None and reopened.get("c") is not None
+    assert sorted(os.listdir(tmp_path)) == sorted([".tmp-writing"] + [f"{key}.webp" for key in ("a", "c")])
+
+
+def test_image_cache_is_shared_by_processes_on_one_directory(tmp_path):
+    """Test that images written by another cache on the directory are found and count against one size limit."""
+    worker, other_worker = ImageCache(str(tmp_path), max_bytes=250), ImageCache(str(tmp_path), max_bytes=250)
+    other_worker.put("a", b"a" * 100)
+    other_worker.put("b", b"b" * 100)
+
+    assert open(worker.get("a"), "rb").read() == b"a" * 100
+    worker.put("c", b"c" * 100)
+
+    assert not os.path.exists(other_worker.path("b"))
+    assert other_worker.get("b") is None and other_worker.get("c") is not None
+    assert worker.stats()["bytes"] == other_worker.stats()["bytes"] == 200
+
+
+def test_single_flight_shares_one_call_and_its_exception():
+    """Test that concurrent calls for a key wait on one call, and a failure reaches every waiter."""
+    single_flight = SingleFlight()
+    calls = list()
+
+    def slow(value):
+        calls.append(value)
+        time.sleep(0.1)
+        if value == "fail":
+            raise RuntimeError(value)
+        return value
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: single_flight.do("key", slow, "ok"), range(8)))
+        failures = [executor.submit(single_flight.do, "other", slow, "fail") for _ in range(4)]
+
+    assert results == ["ok"] * 8
+    assert all(isinstance(failure.exception(), RuntimeError) for failure in failures)
+    assert calls.count("ok") == 1 and len(single_flight) == 0
+
+
+def test_image_service_generates_each_dish_once(tmp_path, fake_replicate):
+    """Test that concurrent requests for a dish call the client once and later requests are served from disk."""
+    fake_replicate.delay_seconds = 0.1
+    image_service = ImageService(ImageCache(str(tmp_path)), client=fake_replicate)
+
+    with ThreadPoolExecutor(8) as executor:
+        paths = list(executor.map(image_service.image_path, ["Beef Stew", "beef  stew"] * 4))
+
+    assert len(set(paths)) == 1
+    # Either spelling may lead the single flight
+    assert [prompt.lower() for prompt in fake_replicate.prompts] == ["a mouthwatering plate of beef stew"]
+    assert image_service.generate_image("BEEF STEW").path == paths[0]
+    assert len(fake_replicate.prompts) == 1
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".")] == []
+
+
+def test_image_service_does_not_cache_failures(tmp_path, fake_replicate):
+    """Test that a failed generation raises and the next request tries again."""
+    fake_replicate.fail = True
+    image_service = ImageService(ImageCache(str(tmp_path)), client=fake_replicate)
+
+    with pytest.raises(RuntimeError):
+        image_service.image_path("Pie")
+    fake_replicate.fail = False
+
+    assert os.path.exists(image_service.image_path("Pie"))
+    assert len(fake_replicate.prompts) == 2 and len(image_service.image_cache) == 1
+
+
+def test_image_cache_etags_are_content_hashes(tmp_path):
+    """Test that the ETag is the content hash, the same after a restart, and a hit keeps the modification time."""
+    cache = ImageCache(str(tmp_path))
+    cache.put("a", b"same")
+    cache.put("b", b"same")
+    cache.put("c", b"other")
+    modified = os.stat(cache.path("a")).st_mtime_ns
+    time.sleep(0.01)
+    cache.get("a")
+
+    assert cache.etag("a") == cache.etag("b") != cache.etag("c")
+    assert ImageCache(str(tmp_path)).etag("a") == cache.etag("a")
+    assert os.stat(cache.path("a")).st_mtime_ns == modified
+
+
+def test_image_response_answers_conditional_requests(tmp_path, fake_replicate):
+    """Test that a matching If-None-Match gets 304 and every response carries the ETag and Cache-Control."""
+    image_service = ImageService(ImageCache(str(tmp_path)), client=fake_replicate, max_age_seconds=60)
+    path = image_service.image_path("Pie")
+    etag = image_service.image_cache.etag(image_service.image_cache.key(path))
+
+    full = image_service.image_response("Pie", path)
+    not_modified = image_service.image_response("Pie", path, f'"other", W/{etag}')
+    changed = image_service.image_response("Pie", path, '"other"')
+
+    assert (full.status_code, not_modified.status_code, changed.status_code) == (200, 304, 200)
+    assert full.headers["etag"] == not_modified.headers["etag"] == etag
+    assert not_modified.headers["cache-control"] == "public, max-age=60"
+    assert image_service.image_response("Pie", path, "*").status_code == 304
@@ -0,0 +1,130 @@
+"""Tests for the background image generation queue."""
+
+import asyncio
+
+import pytest
+
+from services.image_cache import ImageCache
+from services.image_queue import ImageQueue, ImageQueueFull
+from services.image_service import ImageService
+
+
+def _image_queue(tmp_path, client, **kwargs) -> ImageQueue:
+    return ImageQueue(ImageService(ImageCache(str(tmp_path)), client=client), **kwargs)
+
+
+def test_image_queue_shares_one_generation_per_dish(tmp_path, fake_replicate):
+    """Test that concurrent submits of a dish await one generation, and the next submit is ready at once."""
+    fake_replicate.delay_seconds = 0.05
+    image_queue = _image_queue(tmp_path, fake_replicate, workers=2)
+
+    async def run():
+        task = asyncio.create_task(image_queue.run())
+        futures = [await image_queue.submit(name) for name in ("Beef Stew", "beef stew", "Pie")]
+        statuses = [await image_queue.status("Beef Stew"), await image_queue.status("Soup")]
+        paths = await asyncio.gather(*futures)
+        ready = await image_queue.submit("BEEF STEW")
+        statuses.append(await image_queue.status("Pie"))
+        task.cancel()
+        return statuses, paths, ready
+
+    statuses, paths, ready = asyncio.run(run())
+
+    assert statuses == ["pending", "missing", "ready"]
+    assert paths[0] == paths[1] != paths[2]
+    assert ready.done() and ready.result() == paths[0]
+    assert sorted(fake_replicate.prompts) == ["a mouthwatering plate of Beef Stew", "a mouthwatering plate of Pie"]
+    assert len(image_queue) == 0
+
+
+def test_image_queue_runs_requested_images_before_prewarming(tmp_path, fake_replicate):
+    """Test that a requested image jumps the prewarm queue and prewarming skips cached and queued dishes."""
+    image_queue = _image_queue(tmp_path, fake_replicate, workers=1, prewarm_enabled=True)
+
+    async def run():
+        image_queue.prewarm(["Soup", "Pie", "Soup"])
+        requested = await image_queue.submit("Cake")
+        task = asyncio.create_task(image_queue.run())
+        await requested
+        while len(image_queue):
+            await asyncio.sleep(0.01)
+        image_queue.prewarm(["Pie", "Cake"])
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert fake_replicate.prompts == [f"a mouthwatering plate of {name}" for name in ("Cake", "Soup", "Pie")]
+    assert (image_queue.prewarm_queued, image_queue.generated) == (2, 3)
+
+
+def test_image_queue_is_bounded(tmp_path, fake_replicate):
+    """Test that prewarming is dropped once max_prewarm dishes are queued and submits once max_pending are."""
+    image_queue = _image_queue(tmp_path, fake_replicate, max_pending=2, max_prewarm=2, prewarm_enabled=True)
+
+    async def run():
+        image_queue.prewarm(["Soup", "Pie", "Cake"])
+        futures = [await image_queue.submit(name) for name in ("Stew", "Cake")]
+        with pytest.raises(ImageQueueFull):
+            await image_queue.submit("Bread")
+        return futures
+
+    assert not any(future.done() for future in asyncio.run(run()))
+    assert (image_queue.prewarm_queued, image_queue.prewarm_dropped, len(image_queue)) == (2, 1, 4)
+
+
+def test_image_queue_prewarming_never_makes_a_submit_busy(tmp_path, fake_replicate):
+    """Test that a submit is queued while prewarming fills its own cap, which stays as it is."""
+    image_queue = _image_queue(tmp_path, fake_replicate, max_pending=1, max_prewarm=2, prewarm_enabled=True)
+
+    async def run():
+        image_queue.prewarm(["Soup", "Pie"])
+        requested = await image_queue.submit("Stew")
+        image_queue.prewarm(["Cake"])
+        return requested
+
+    assert not asyncio.run(run()).done()
+    assert (image_queue.prewarm_queued, image_queue.prewarm_dropped, len(image_queue)) == (2, 1, 3)
+
+
+def test_image_queue_moves_a_requested_prewarm_up(tmp_path, fake_replicate):
+    """Test that submitting a dish queued for prewarming runs it at the requested priority, and only once."""
+    image_queue = _image_queue(tmp_path, fake_replicate, workers=1, prewarm_enabled=True)
+
+    async def run():
+        image_queue.prewarm(["Soup", "Pie"])
+        futures = [await image_queue.submit(name) for name in ("Cake", "Pie")]
+        task = asyncio.create_task(image_queue.run())
+        await asyncio.gather(*futures)
+        while len(image_queue):
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert fake_replicate.prompts == [f"a mouthwatering plate of {name}" for name in ("Cake", "Pie", "Soup")]
+    assert (image_queue.generated, image_queue.stats()["prewarming"]) == (3, 0)
+
+
+def test_image_queue_reports_failures(tmp_path, fake_replicate):
+    """Test that a failed generation fails its future and the dish can be queued again."""
+    fake_replicate.fail = True
+    image_queue = _image_queue(tmp_path, fake_replicate)
+
+    async def run():
+        task = asyncio.create_task(image_queue.run())
+        with pytest.raises(RuntimeError):
+            await (await image_queue.submit("Pie"))
+        task.cancel()
+        return await image_queue.status("Pie")
+
+    assert asyncio.run(run()) == "missing"
+    assert (image_queue.failed, len(image_queue)) == (1, 0)
+
+
+def test_image_queue_prewarm_is_off_by_default(tmp_path, fake_replicate):
+    """Test that prewarming queues nothing unless enabled, each generation is a paid remote call."""
+    image_queue = _image_queue(tmp_path, fake_replicate)
+
+    image_queue.prewarm(["Soup"])
+
+    assert len(image_queue) == 0 and image_queue.prewarm_queued == 0
@@ -0,0 +1,54 @@
+"""Tests for the resized image variants."""
+
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from services.image_cache import ImageCache
+from services.image_variants import ImageVariants, thumbnail
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _original(cache: ImageCache) -> str:
+    output = io.BytesIO()
+    Image.new("RGB", (512, 384), (200, 80, 40)).save(output, format="WEBP")
+    return cache.put("dish", output.getvalue())
+
+
+def test_thumbnail_keeps_the_aspect_ratio(tmp_path):
+    """Test that a thumbnail fits in size x size and is a webp image."""
+    original = _original(ImageCache(str(tmp_path)))
+
+    with Image.open(io.BytesIO(thumbnail(original, 128))) as image:
+        assert (image.format, image.size) == ("WEBP", (128, 96))
+
+
+def test_image_variants_resize_once_and_cache_next_to_the_original(tmp_path):
+    """Test that concurrent requests for a variant share one resize in the process pool and later ones hit the cache."""
+    cache = ImageCache(str(tmp_path))
+    original = _original(cache)
+
+    async def run(image_variants):
+        paths = await asyncio.gather(*[image_variants.path(original, size) for size in (128, 256, 128)])
+        return paths, await image_variants.path(original, 128)
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        image_variants = ImageVariants(cache, [256, 128], executor=executor)
+        (small, medium, small_again), small_cached = asyncio.run(run(image_variants))
+
+    assert small == small_again == small_cached == cache.path("dish-128") and medium == cache.path("dish-256")
+    assert cache.stats()["images"] == 3 and cache.stats()["hits"] == 1
+    assert len(image_variants) == 0
+
+
+def test_image_variants_reject_unknown_sizes(tmp_path):
+    """Test that only the configured sizes are resized."""
+    cache = ImageCache(str(tmp_path))
+    image_variants = ImageVariants(cache, [128])
+
+    with pytest.raises(ValueError):
+        asyncio.run(image_variants.path(_original(cache), 64))
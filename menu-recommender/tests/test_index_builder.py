@@ -0,0 +1,108 @@
+"""Tests for the streaming, resumable recipe index builder."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.embedding_store import EmbeddingStore
+from services.index_builder import RecipeIndexBuilder
+from services.query_encoder import QueryEncoder
+from services.recipe_catalog import RecipeCatalog
+
+
+@pytest.fixture
+def recipes_csv(tmp_path):
+    # Raw recipes_clean.csv layout: NER as a JSON-like list, extra columns, missing and repeated titles
+    rows = [
+        {"title": "Beef Stew", "ingredients": "...", "NER": '["beef", "Salt", "tomato"]', "source": "a"},
+        {"title": None, "ingredients": "...", "NER": '["flour"]', "source": "a"},
+        {"title": "Pancakes", "ingredients": "...", "NER": '["flour", "egg", "milk", "sugar"]', "source": "b"},
+        {"title": "Beef Stew", "ingredients": "...", "NER": '["beef"]', "source": "b"},
+        {"title": "Unicorn Pie", "ingredients": "...", "NER": '["unicorn", "stardust"]', "source": "c"},
+        {"title": "Ham Rice", "ingredients": "...", "NER": '["ham", "rice", "unicorn"]', "source": "c"},
+        {"title": "Crème brûlée", "ingredients": "...", "NER": '["sugar", "egg", "milk"]', "source": "d"},
+    ]
+    path = tmp_path / "recipes_clean.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+EXPECTED_TITLES = ["Beef Stew", "Pancakes", "Unicorn Pie", "Ham Rice", "Crème brûlée"]
+
+
+class _FailingEncoder:
+    # Fails on the given encode call, like a build killed halfway
+    def __init__(self, query_encoder, fail_on_call: int):
+        self.query_encoder = query_encoder
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+        self.dim = query_encoder.dim
+
+    def encode(self, queries):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise KeyboardInterrupt
+        return self.query_encoder.encode(queries)
+
+
+def test_index_builder_keeps_catalog_and_embeddings_row_aligned(tmp_path, recipes_csv, model, ingredient_vocab):
+    """Test that unknown ingredients drop the ingredient, never the row, so embedding i belongs to recipe i."""
+    query_encoder = QueryEncoder(model)
+    builder = RecipeIndexBuilder(query_encoder, ingredient_vocab, str(tmp_path / "build"), chunk_size=2)
+    checkpoint = builder.build(recipes_csv)
+    builder.finalize(str(tmp_path / "store"), str(tmp_path / "catalog"))
+
+    catalog = RecipeCatalog.open(str(tmp_path / "catalog"))
+    store = EmbeddingStore.open(str(tmp_path / "store"))
+    assert checkpoint["complete"] and checkpoint["source_rows"] == 7 and checkpoint["empty_rows"] == 1
+    assert [catalog.title(i) for i in range(len(catalog))] == EXPECTED_TITLES
+    assert catalog.ner(0) == "beef, Salt, tomato"
+    assert catalog.ingredients(2).tolist() == []
+    assert catalog.ingredients(3).tolist() == [ingredient_vocab["ham"], ingredient_vocab["rice"]]
+
+    expected = query_encoder.encode([catalog.ingredients(i).tolist() for i in range(len(catalog))])
+    assert len(store) == len(catalog)
+    np.testing.assert_allclose(store.take(slice(None)), expected, atol=1e-6)
+
+
+def test_index_builder_resumes_an_interrupted_build(tmp_path, recipes_csv, model, ingredient_vocab):
+    """Test that a resumed build truncates partial writes and ends identical to an uninterrupted one."""
+    query_encoder = QueryEncoder(model)
+    RecipeIndexBuilder(query_encoder, ingredient_vocab, str(tmp_path / "full"), chunk_size=2).build(recipes_csv)
+    full = RecipeIndexBuilder(query_encoder, ingredient_vocab, str(tmp_path / "full")).finalize(
+        str(tmp_path / "full_store"), str(tmp_path / "full_catalog")
+    )
+
+    work_dir = str(tmp_path / "resumed")
+    with pytest.raises(KeyboardInterrupt):
+        RecipeIndexBuilder(_FailingEncoder(query_encoder, 3), ingredient_vocab, work_dir, chunk_size=2).build(recipes_csv)
+    interrupted = RecipeIndexBuilder(query_encoder, ingredient_vocab, work_dir).load_checkpoint()
+    assert interrupted["source_rows"] == 4 and not interrupted["complete"]
+
+    # Bytes of a chunk that was written but never checkpointed
+    with open(f"{work_dir}/embeddings.bin", "ab") as f:
+        f.write(b"\x00" * 64)
+
+    resumed = RecipeIndexBuilder(query_encoder, ingredient_vocab, work_dir, chunk_size=3)
+    resumed.build(recipes_csv)
+    catalog = resumed.finalize(str(tmp_path / "store"), str(tmp_path / "catalog"))
+
+    assert [catalog.title(i) for i in range(len(catalog))] == [full.title(i) for i in range(len(full))]
+    np.testing.assert_array_equal(
+        EmbeddingStore.open(str(tmp_path / "store")).take(slice(None)),
+        EmbeddingStore.open(str(tmp_path / "full_store")).take(slice(None))
+    )
+
+
+def test_index_builder_embeds_a_cleaned_catalog_without_parsing_strings(tmp_path, model, ingredient_vocab, recipe_dataset):
+    """Test that a catalog source gets one embedding per catalog row from its ingredient ids."""
+    RecipeCatalog.from_dataframe(recipe_dataset, ingredient_vocab).write(str(tmp_path / "catalog"))
+    query_encoder = QueryEncoder(model)
+
+    builder = RecipeIndexBuilder(query_encoder, ingredient_vocab, str(tmp_path / "build"), chunk_size=16)
+    checkpoint = builder.build_from_catalog(str(tmp_path / "catalog"))
+    catalog = builder.finalize(str(tmp_path / "store"), dtype="float32")
+
+    assert checkpoint["source_rows"] == checkpoint["rows"] == len(recipe_dataset)
+    expected = query_encoder.encode([catalog.ingredients(i).tolist() for i in range(len(catalog))])
+    np.testing.assert_allclose(EmbeddingStore.open(str(tmp_path / "store")).take(slice(None)), expected, atol=1e-6)
@@ -0,0 +1,112 @@
+"""Tests for the ingredient postings index and filtered search."""
+
+import numpy as np
+
+from services.ingredient_postings import IngredientPostings, RecipeFilter
+from services.ivfpq_index import IVFPQSearchIndex
+from services.search_index import ExactSearchIndex, top_k_rows
+
+
+class _Catalog:
+    def __init__(self, recipes):
+        self.ingredient_indptr = np.cumsum([0] + [len(recipe) for recipe in recipes])
+        self.ingredient_ids = np.array([idx for recipe in recipes for idx in recipe], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ingredient_indptr) - 1
+
+
+def test_ingredient_postings_transpose_the_catalog():
+    """Test that every ingredient lists the sorted, unique recipes containing it."""
+    postings = IngredientPostings.from_catalog(_Catalog([[1, 2], [2, 3, 2], [], [1, 3]]), vocab_size=5)
+
+    assert [postings.recipes(idx).tolist() for idx in range(5)] == [[], [0, 3], [0, 1], [1, 3], []]
+    assert postings.recipes(99).tolist() == []
+
+
+def test_ingredient_postings_allowed_mask():
+    """Test that excluded recipes are cleared and required ingredients are intersected."""
+    postings = IngredientPostings.from_catalog(_Catalog([[1, 2], [2, 3], [1, 2, 3], [3]]), vocab_size=4)
+
+    assert postings.allowed(RecipeFilter(exclude=(1,))).tolist() == [False, True, False, True]
+    assert postings.allowed(RecipeFilter(require=(2, 3))).tolist() == [False, True, True, False]
+    assert postings.allowed(RecipeFilter(exclude=(1,), require=(3,))).tolist() == [False, True, False, True]
+    assert not postings.allowed(RecipeFilter(unsatisfiable=True)).any()
+    assert RecipeFilter.of([], []) is None
+
+
+def test_filtered_search_matches_brute_force():
+    """Test that masked search returns the best allowed recipes for sparse and dense masks."""
+    rng = np.random.default_rng(0)
+    index = ExactSearchIndex(rng.standard_normal((400, 16)))
+    queries = rng.standard_normal((3, 16))
+
+    for share in (0.05, 0.9):
+        allowed = rng.random(400) < share
+        scores, indices = index.search(queries, 10, allowed=allowed)
+
+        expected_scores = index.score(queries)
+        expected_scores[:, ~allowed] = -np.inf
+        _, expected = top_k_rows(expected_scores, 10)
+        assert allowed[indices].all()
+        assert indices.tolist() == expected.tolist()
+
+
+def test_filtered_search_with_few_allowed_recipes():
+    """Test that a search returns only the allowed recipes when there are fewer than top_k."""
+    index = ExactSearchIndex(np.random.default_rng(1).standard_normal((100, 8)))
+    allowed = np.zeros(100, dtype=bool)
+    allowed[[3, 50]] = True
+
+    _, indices = index.search(np.ones((1, 8)), 5, allowed=allowed)
+    assert sorted(indices[0].tolist()) == [3, 50]
+
+
+def test_ivfpq_filtered_search_returns_only_allowed_recipes():
+    """Test that the approximate index drops filtered recipes before its top-k and widens its probes."""
+    rng = np.random.default_rng(2)
+    recipe_embeddings = rng.standard_normal((2000, 16)).astype(np.float32)
+    index = IVFPQSearchIndex.train(recipe_embeddings, n_lists=16, n_subvectors=4, n_iter=5, n_probe=2)
+    allowed = rng.random(2000) < 0.1
+
+    _, indices = index.search(rng.standard_normal((4, 16)), 10, allowed=allowed)
+
+    assert (indices >= 0).all()
+    assert allowed[indices].all()
+
+
+def test_ingredient_postings_pantry_coverage():
+    """Test that coverage is the share of distinct recipe ingredients in the pantry, for recipes sharing any."""
+    postings = IngredientPostings.from_catalog(_Catalog([[1, 2], [2, 3, 2, 4], [], [1, 3], [4]]), vocab_size=5)
+
+    rows, coverage = postings.coverage([2, 3, 3])
+
+    assert rows.tolist() == [0, 1, 3]
+    np.testing.assert_allclose(coverage, [0.5, 2 / 3, 0.5])
+    assert postings.recipe_lengths.tolist() == [2, 3, 0, 2, 1]
+
+
+def test_ingredient_postings_coverage_limit_keeps_best_covered():
+    """Test that a limited coverage keeps the best covered allowed recipes."""
+    rng = np.random.default_rng(3)
+    recipes = [rng.choice(np.arange(1, 30), size=rng.integers(1, 8), replace=False).tolist() for _ in range(500)]
+    postings = IngredientPostings.from_catalog(_Catalog(recipes), vocab_size=30)
+    pantry = list(range(1, 10))
+    allowed = rng.random(500) < 0.5
+
+    all_rows, all_coverage = postings.coverage(pantry, allowed)
+    rows, coverage = postings.coverage(pantry, allowed, limit=40)
+
+    assert len(rows) == 40 and allowed[rows].all()
+    assert coverage.min() >= np.sort(all_coverage)[-40]
+    assert set(rows.tolist()) <= set(all_rows.tolist())
+
+
+def test_ingredient_postings_coverage_includes_rows():
+    """Test that included rows are returned with their coverage, also when they share no pantry ingredient."""
+    postings = IngredientPostings.from_catalog(_Catalog([[1, 2], [2, 3, 2, 4], [], [1, 3], [4]]), vocab_size=5)
+
+    rows, coverage = postings.coverage([2, 3], limit=1, include=np.array([2, 4, 0]))
+
+    assert rows.tolist() == [0, 1, 2, 4]
+    np.testing.assert_allclose(coverage, [0.5, 2 / 3, 0, 0])
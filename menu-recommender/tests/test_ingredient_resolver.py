@@ -0,0 +1,47 @@
+"""Tests for the fuzzy ingredient resolver."""
+
+from services.ingredient_resolver import IngredientResolver
+from services.ingredient_vocab import IngredientVocab
+
+VOCAB = {"tomatoes": 0, "parmesan cheese": 1, "chicken breast": 2, "berry": 3, "salt": 4, "sea salt": 5}
+
+
+def test_ingredient_resolver_exact_plural_and_typos():
+    """Test that casing, plurals and typos resolve to the closest vocab entry."""
+    resolver = IngredientResolver(IngredientVocab.from_dict(VOCAB))
+
+    assert resolver.resolve_one(" Salt ") == 4
+    assert resolver.resolve_one("tomato") == 0
+    assert resolver.resolve_one("berries") == 3
+    assert resolver.resolve_one("parmesan chese") == 1
+    assert resolver.resolve_one("Chiken Breast") == 2
+    assert resolver.resolve_one("unicorn") is None
+    assert resolver.resolve_one("") is None
+
+
+def test_ingredient_resolver_ignores_empty_terms():
+    """Test that empty and whitespace-only terms match nothing, even with "s" and "" in the vocab."""
+    resolver = IngredientResolver(IngredientVocab.from_dict({**VOCAB, "s": 6, "": 7}))
+
+    assert [resolver.resolve_one(term) for term in ("", "   ", "/", "\t")] == [None] * 4
+    assert resolver.resolve(["", "salt"]).to_dict() == {"matched": {"salt": "salt"}, "unmatched": [""]}
+
+
+def test_ingredient_resolver_reports_matched_and_unmatched_terms():
+    """Test that the resolution keeps the matched vocab names and the unmatched terms."""
+    resolution = IngredientResolver(IngredientVocab.from_dict(VOCAB)).resolve(["Tomato", "unicorn", "sea-salt"])
+
+    assert resolution.ids == [0, 5]
+    assert resolution.to_dict() == {"matched": {"Tomato": "tomatoes", "sea-salt": "sea salt"}, "unmatched": ["unicorn"]}
+
+
+def test_recommender_skips_unknown_ingredients(recommender_service):
+    """Test that unknown ingredients do not fail the request and are reported when asked for."""
+    assert recommender_service.get_recommendations(["beef", "dragon fruit"], top_k=3) == recommender_service.get_recommendations(["beef"], top_k=3)
+
+    result = recommender_service.get_recommendations(["Beefs", "dragon fruit"], top_k=3, include_resolution=True)
+    assert result["matched"] == {"Beefs": "beef"}
+    assert result["unmatched"] == ["dragon fruit"]
+    assert len(result["recipes"]) == 3
+
+    assert recommender_service.get_batch_recommendations([["dragon fruit"], ["rice"]], top_k=2)[0] == []
@@ -0,0 +1,41 @@
+"""Tests for the sorted ingredient vocab."""
+
+import numpy as np
+import pytest
+
+from services.ingredient_vocab import IngredientVocab, normalize_ingredient
+
+
+def test_ingredient_vocab_round_trip(tmp_path, ingredient_vocab):
+    """Test that the memory-mapped vocab resolves every name and id like the dict."""
+    IngredientVocab.from_dict(ingredient_vocab).write(tmp_path)
+    vocab = IngredientVocab.open(tmp_path)
+
+    assert len(vocab) == len(ingredient_vocab)
+    assert isinstance(vocab.name_blob, np.memmap)
+    for name, idx in ingredient_vocab.items():
+        assert vocab[name] == idx
+        assert vocab.name(idx) == name
+    assert "unicorn" not in vocab
+    assert vocab.get("unicorn", -1) == -1
+
+
+def test_ingredient_vocab_lookup_normalizes_terms():
+    """Test that request terms are normalized the same way the notebook built the vocab."""
+    vocab = IngredientVocab.from_dict({"half-and-half": 0, "sour cream": 1, "crème fraîche": 2})
+
+    assert normalize_ingredient("  Half/-and-Half ") == "half-and-half"
+    assert vocab.lookup(" Sour Cream") == 1
+    assert vocab.lookup("Crème Fraîche") == 2
+    with pytest.raises(KeyError):
+        vocab.lookup("sour creams")
+
+
+def test_ingredient_vocab_from_dict_matches_the_sorted_table(tmp_path, ingredient_vocab):
+    """Test that the dict-backed lookups of a vocab built from a dict agree with the memory-mapped sorted table."""
+    vocab = IngredientVocab.from_dict(ingredient_vocab)
+    vocab.write(tmp_path)
+    opened = IngredientVocab.open(tmp_path)
+
+    for name in [*ingredient_vocab, "unicorn", "", "Salt"]:
+        assert vocab.get(name) == opened.get(name)
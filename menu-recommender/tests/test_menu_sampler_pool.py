@@ -0,0 +1,76 @@
+"""Tests for the menu sampler pool."""
+
+import asyncio
+
+from services.menu_sampler_pool import MenuSamplerPool
+
+
+def test_menu_sampler_pool_rotates_and_serves_round_robin():
+    """Test that menus are served round-robin and the oldest ones are replaced first."""
+    pool = MenuSamplerPool(pool_size=3, top_k=4)
+    assert pool.take(2) is None
+
+    pool.add([["a1", "a2", "a3", "a4"], ["b1", "b2", "b3", "b4"], ["c1", "c2", "c3", "c4"]])
+    assert [pool.take(2) for _ in range(4)] == [["a1", "a2"], ["b1", "b2"], ["c1", "c2"], ["a1", "a2"]]
+
+    pool.add([["d1", "d2", "d3", "d4"]])
+    assert len(pool) == 3
+    assert [pool.take(1) for _ in range(3)] == [["b1"], ["c1"], ["d1"]]
+    assert pool.take(5) is None
+
+
+def test_menu_sampler_pool_clear_drops_menus_of_retired_artifacts():
+    """Test that a cleared pool serves nothing until refilled and drops late menus of the previous artifacts."""
+    pool = MenuSamplerPool(pool_size=2, top_k=1)
+    pool.add([["old a"], ["old b"]], artifact_version="v1")
+    pool.take(1)
+
+    pool.clear("v2")
+    assert pool.take(1) is None
+
+    pool.add([["old c"]], artifact_version="v1")
+    pool.add([["new a"], ["new b"]], artifact_version="v2")
+    assert len(pool) == 2
+    assert [pool.take(1) for _ in range(2)] == [["new a"], ["new b"]]
+
+
+def test_menu_sampler_pool_background_refill(recommender_service):
+    """Test that the background task fills the pool with sampled menus of the pool top_k."""
+    pool = MenuSamplerPool(pool_size=8, top_k=3, refresh_count=2, refresh_interval_seconds=0.01)
+
+    async def run_briefly():
+        task = asyncio.create_task(pool.run(lambda: recommender_service))
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+
+    assert len(pool) == 8
+    menu = pool.take(3)
+    assert len(menu) == 3
+    assert set(menu[0]) == {"name", "ingredients"}
+
+
+def test_menu_sampler_pool_fills_in_chunks_of_refresh_count(recommender_service):
+    """Test that an empty pool is filled by calls of at most refresh_count menus, without waiting between them."""
+    counts = list()
+
+    class _CountingService:
+        artifact_version = recommender_service.artifact_version
+
+        def sample_batch_recommendations(self, count, top_k):
+            counts.append(count)
+            return recommender_service.sample_batch_recommendations(count, top_k)
+
+    pool = MenuSamplerPool(pool_size=8, top_k=3, refresh_count=3, refresh_interval_seconds=60)
+
+    async def run_briefly():
+        task = asyncio.create_task(pool.run(lambda: _CountingService()))
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+
+    assert len(pool) == 8
+    assert counts == [3, 3, 3]
+
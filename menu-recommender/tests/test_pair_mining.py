@@ -0,0 +1,60 @@
+"""Tests for the vectorized positive / negative pair mining."""
+
+import numpy as np
+
+from services.pair_mining import PairMiner, TrainingPairs, synthetic_recipes
+
+
+def _brute_force_overlaps(recipes: list[set]) -> dict:
+    # The double loop of the notebook
+    return {
+        (i, j): len(recipes[i] & recipes[j]) for i in range(len(recipes)) for j in range(i + 1, len(recipes))
+    }
+
+
+def test_overlap_blocks_match_the_pairwise_set_intersections():
+    """Test that the blockwise sparse product finds every overlapping pair with its count, repeated ids counted once."""
+    indptr = np.array([0, 3, 5, 5, 9, 11])
+    ids = np.array([1, 2, 2, 3, 4, 1, 3, 5, 1, 6, 4])
+    recipes = [set(ids[indptr[i]:indptr[i + 1]].tolist()) for i in range(len(indptr) - 1)]
+
+    # A tiny budget forces one row per block
+    miner = PairMiner(indptr, ids, vocab_size=8, block_pairs=1)
+    found = dict()
+    for start, end in miner._blocks():
+        rows, others, counts = miner.overlap_block(start, end)
+        found.update(zip(zip(rows.tolist(), others.tolist()), counts.tolist()))
+
+    expected = {pair: count for pair, count in _brute_force_overlaps(recipes).items() if count}
+    assert found == expected
+    assert miner.overlaps(np.array([0, 1, 2]), np.array([3, 3, 4])).tolist() == [1, 1, 0]
+
+
+def test_mined_pairs_are_distinct_and_correctly_labelled(tmp_path):
+    """Test that positives share exactly one ingredient, negatives do not, and the pairs survive a round trip."""
+    indptr, ids = synthetic_recipes(300, vocab_size=60, seed=2)
+    recipes = [set(ids[indptr[i]:indptr[i + 1]].tolist()) for i in range(300)]
+    overlaps = _brute_force_overlaps(recipes)
+
+    training_pairs = PairMiner(indptr, ids, vocab_size=60, block_pairs=500).mine(1000, 1500, seed=4)
+    training_pairs.write(str(tmp_path / "pairs.npz"))
+    training_pairs = TrainingPairs.open(str(tmp_path / "pairs.npz"))
+
+    pairs = list(zip(training_pairs.left.tolist(), training_pairs.right.tolist()))
+    assert training_pairs.stats["positive_pairs_total"] == sum(count == 1 for count in overlaps.values())
+    assert int(training_pairs.labels.sum()) == 1000 and len(training_pairs) == 2500
+    assert len(set(pairs)) == len(pairs)
+    assert all((overlaps[pair] == 1) == bool(label) for pair, label in zip(pairs, training_pairs.labels))
+
+    left, right, label = training_pairs.pair(0)
+    assert set(left.tolist()) == recipes[pairs[0][0]] and set(right.tolist()) == recipes[pairs[0][1]] and label == 1
+
+
+def test_mining_caps_samples_at_the_available_pairs():
+    """Test that asking for more pairs than exist returns all of them, like random.sample(min(...)) in the notebook."""
+    indptr, ids = np.array([0, 2, 4, 6]), np.array([1, 2, 2, 3, 4, 5])
+    training_pairs = PairMiner(indptr, ids, vocab_size=6).mine(10, 10)
+
+    assert sorted(zip(training_pairs.left.tolist(), training_pairs.right.tolist(), training_pairs.labels.tolist())) == [
+        (0, 1, 1), (0, 2, 0), (1, 2, 0)
+    ]
@@ -0,0 +1,40 @@
+"""Tests for the query encoders."""
+
+import numpy as np
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.numpy_query_encoder import NumpyQueryEncoder
+from services.query_encoder import QueryEncoder
+
+QUERIES = [[1, 2, 3], [4], [5, 6, 7, 8, 9, 10, 11], [2, 2, 3], [0, 4, 5], [0]]
+
+
+def test_query_encoder_matches_model_forward(model):
+    """Test that the encoder returns the mean-pooled, normalized embeddings of the model forward pass."""
+    with torch.no_grad():
+        expected, _ = model(QUERIES)
+
+    # Only the summation order differs from the padded forward pass, at most one float32 rounding step
+    np.testing.assert_allclose(QueryEncoder(model).encode(QUERIES), expected.numpy(), rtol=0, atol=1e-7)
+
+
+def test_query_encoder_attention_pooling_runs_forward():
+    """Test that models without mean pooling are encoded with their forward pass."""
+    torch.manual_seed(0)
+    model = RecipeEmbeddingModel(vocab_size=12, embedding_dim=8, pooling="attention")
+    model.eval()
+
+    with torch.no_grad():
+        expected, _ = model(QUERIES[:3])
+
+    np.testing.assert_array_equal(QueryEncoder(model).encode(QUERIES[:3]), expected.numpy())
+
+
+def test_numpy_query_encoder_matches_torch_encoder(model, tmp_path):
+    """Test that the exported NumPy encoder reproduces the torch encoder."""
+    NumpyQueryEncoder.write(tmp_path / "encoder", model.embedding.weight.detach().numpy())
+    numpy_encoder = NumpyQueryEncoder.open(tmp_path / "encoder")
+
+    assert (numpy_encoder.vocab_size, numpy_encoder.dim) == (12, 16)
+    np.testing.assert_allclose(numpy_encoder.encode(QUERIES), QueryEncoder(model).encode(QUERIES), rtol=0, atol=1e-6)
@@ -0,0 +1,42 @@
+"""Tests for the columnar recipe catalog."""
+
+import numpy as np
+import pandas as pd
+
+from services.recipe_catalog import RecipeCatalog
+
+
+def test_recipe_catalog_round_trip(tmp_path, recipe_dataset, ingredient_vocab):
+    """Test that the memory-mapped catalog returns the same recipes as the DataFrame."""
+    RecipeCatalog.from_dataframe(recipe_dataset, ingredient_vocab).write(tmp_path)
+    catalog = RecipeCatalog.open(tmp_path)
+
+    assert len(catalog) == len(recipe_dataset)
+    assert isinstance(catalog.title_blob, np.memmap)
+    for idx, row in recipe_dataset.iterrows():
+        assert catalog.recipe(idx) == {"name": row["title"], "ingredients": row["NER"]}
+        assert catalog.ingredients(idx).tolist() == [ingredient_vocab[i] for i in row["NER"].split(", ")]
+
+
+def test_recipe_catalog_rewrite_keeps_mapped_catalog_readable(tmp_path, recipe_dataset, ingredient_vocab):
+    """Test that writing over a catalog replaces its directory and leaves an opened, memory-mapped one intact."""
+    path = tmp_path / "catalog"
+    RecipeCatalog.from_dataframe(recipe_dataset, ingredient_vocab).write(path)
+    serving = RecipeCatalog.open(path)
+    recipes = [serving.recipe(idx) for idx in range(len(serving))]
+
+    RecipeCatalog.from_dataframe(recipe_dataset.iloc[:10], ingredient_vocab).write(path)
+
+    assert [serving.recipe(idx) for idx in range(len(serving))] == recipes
+    assert len(RecipeCatalog.open(path)) == 10
+    assert [p.name for p in tmp_path.iterdir()] == ["catalog"]
+
+
+def test_recipe_catalog_normalizes_and_skips_unknown_ingredients():
+    """Test that NER terms are normalized like the vocab and unknown ones are left out of the ingredient ids."""
+    recipe_dataset = pd.DataFrame([{"title": "Crème brûlée", "NER": " Sugar/, cream, unicorn "}, {"title": None, "NER": None}])
+    catalog = RecipeCatalog.from_dataframe(recipe_dataset, {"sugar": 4, "cream": 7})
+
+    assert catalog.title(0) == "Crème brûlée"
+    assert catalog.ingredients(0).tolist() == [4, 7]
+    assert catalog.recipe(1) == {"name": "", "ingredients": ""}
@@ -0,0 +1,56 @@
+"""Tests for the streaming recipe cleaning into the columnar catalog."""
+
+import pandas as pd
+
+from services.recipe_catalog import RecipeCatalog
+from services.recipe_cleaning import RecipeCleaner, clean_title
+
+TITLES = [
+    "Beef Stew", "Chicken W/ Rice", "Salmon W / Dill", "Salt / Pepper Steak", "Mac\\n Cheese", "Pie/M\\ Crust",
+    "  Double   spaced\ttitle ", "Sweet/Sour Pork", "/W/ x", "a\\/b", "W/", "Crème brûlée", "Ham/ 2 Eggs", "1/2 Cake",
+]
+
+
+def _notebook_titles(titles: list[str]) -> list[str]:
+    # The seven passes of notebooks/clean_dataset.ipynb
+    title = pd.Series(titles)
+    title = title.replace("W/", "", regex=True)
+    title = title.replace("W /", "", regex=True)
+    title = title.replace("/ ", "", regex=True)
+    title = title.replace(r"\\", "", regex=True)
+    title = title.replace(r"/M\\", "", regex=True)
+    title = title.replace(r"\s+", " ", regex=True).str.strip()
+    title = title.replace(r"(?<=[A-Za-z])/(?=[A-Za-z])", " / ", regex=True)
+    return title.tolist()
+
+
+def test_clean_title_matches_the_notebook_passes():
+    """Test that the single-scan title cleaning gives the titles of the seven notebook passes."""
+    assert [clean_title(title) for title in TITLES] == _notebook_titles(TITLES)
+
+
+def test_recipe_cleaner_writes_a_tokenized_catalog(tmp_path, ingredient_vocab):
+    """Test that the cleaner drops the rows the notebooks drop and stores NER as vocab ids."""
+    rows = [
+        {"title": "Beef W/ Salt", "ingredients": "...", "directions": "...", "NER": '["beef", "Salt", "unicorn"]'},
+        {"title": None, "ingredients": "...", "directions": "...", "NER": '["flour"]'},
+        {"title": "http://example.com/pie", "ingredients": "...", "directions": "...", "NER": '["flour"]'},
+        {"title": "Beef  Salt", "ingredients": "...", "directions": "...", "NER": '["beef"]'},
+        {"title": "W/", "ingredients": "...", "directions": "...", "NER": '["egg"]'},
+        {"title": "Sweet/Sour Ham", "ingredients": "...", "directions": "...", "NER": '["ham", "sugar"]'},
+        {"title": "Unicorn Pie", "ingredients": "...", "directions": "...", "NER": '["unicorn"]'},
+    ]
+    pd.DataFrame(rows).to_csv(tmp_path / "recipes_data.csv", index=False)
+
+    stats = RecipeCleaner(ingredient_vocab, chunk_size=3).clean(str(tmp_path / "recipes_data.csv"), str(tmp_path / "catalog"))
+    catalog = RecipeCatalog.open(str(tmp_path / "catalog"))
+
+    assert [catalog.title(i) for i in range(len(catalog))] == ["Beef Salt", "Sweet / Sour Ham", "Unicorn Pie"]
+    assert catalog.ner(0) == "beef, Salt, unicorn"
+    assert catalog.ingredients(0).tolist() == [ingredient_vocab["beef"], ingredient_vocab["salt"]]
+    assert catalog.ingredients(1).tolist() == [ingredient_vocab["ham"], ingredient_vocab["sugar"]]
+    assert catalog.ingredients(2).tolist() == []
+    assert stats["rows_read"] == 7 and stats["recipes"] == 3
+    assert (stats["dropped_without_title"], stats["dropped_url_title"], stats["dropped_repeated_title"]) == (2, 1, 1)
+    assert stats["recipes_without_known_ingredients"] == 1 and stats["peak_memory_mb"] > 0
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".")] == []
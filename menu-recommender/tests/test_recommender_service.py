@@ -0,0 +1,157 @@
+"""Tests for the recommender service."""
+
+import pytest
+
+from services.ingredient_vocab import IngredientVocab
+from services.ivfpq_index import IVFPQSearchIndex
+from services.numpy_query_encoder import NumpyQueryEncoder
+from services.recommender_service import RecommenderService
+from services.search_index import ExactSearchIndex
+
+
+def test_batch_recommendations_match_single_queries(recommender_service):
+    """Test that a batched request returns the same recipes as one request per query."""
+    queries = [["beef", "salt"], ["flour", "sugar", "butter", "egg"], ["rice"]]
+
+    batch = recommender_service.get_batch_recommendations(queries, top_k=5)
+
+    assert len(batch) == len(queries)
+    for query, recipes in zip(queries, batch):
+        assert recipes == recommender_service.get_recommendations(query, top_k=5)
+
+
+def test_batch_recommendations_empty(recommender_service):
+    """Test that an empty batch returns an empty result."""
+    assert recommender_service.get_batch_recommendations([], top_k=3) == []
+
+
+def test_numpy_query_encoder_returns_same_recommendations(recommender_service, model):
+    """Test that serving with the NumPy-only encoder returns the same recipes as the torch encoder."""
+    numpy_service = RecommenderService(
+        query_encoder=NumpyQueryEncoder(model.embedding.weight.detach().numpy()),
+        search_index=recommender_service.search_index,
+        ingredient_vocab=recommender_service.ingredient_vocab,
+        recipe_catalog=recommender_service.recipe_catalog
+    )
+    queries = [["beef", "salt"], ["flour", "sugar", "butter", "egg"], ["rice"], ["basil", "tomato", "ham"]]
+
+    assert numpy_service.get_batch_recommendations(queries, top_k=5) == recommender_service.get_batch_recommendations(queries, top_k=5)
+
+
+def test_recommendations_respect_ingredient_filters(recommender_service):
+    """Test that excluded ingredients never appear and required ones always appear in the recipes."""
+    recipes = recommender_service.get_recommendations(["beef", "salt"], top_k=10, exclude_ingredients=["flour", "eggs"])
+    assert len(recipes) == 10
+    assert all("flour" not in recipe["ingredients"] and "egg" not in recipe["ingredients"] for recipe in recipes)
+
+    recipes = recommender_service.get_recommendations(["beef"], top_k=40, require_ingredients=["rice", "Basil"])
+    assert recipes
+    assert all("rice" in recipe["ingredients"] and "basil" in recipe["ingredients"] for recipe in recipes)
+
+    assert recommender_service.get_recommendations(["beef"], top_k=5, require_ingredients=["unicorn"]) == []
+
+
+def test_pantry_recommendations_blend_coverage_and_similarity(recommender_service):
+    """Test that pantry ranking returns only covered recipes and a full weight ranks purely by coverage."""
+    pantry = ["beef", "salt", "flour", "sugar", "butter", "egg"]
+    recipes = recommender_service.get_pantry_recommendations(pantry, top_k=10, pantry_weight=1.0)
+
+    coverage = [sum(ingredient in pantry for ingredient in recipe["ingredients"].split(", ")) / 4 for recipe in recipes]
+    assert len(recipes) == 10
+    assert coverage == sorted(coverage, reverse=True)
+    assert coverage[0] == 1.0
+
+    blended = recommender_service.get_pantry_recommendations(pantry, top_k=5, include_resolution=True, require_ingredients=["rice"])
+    assert all("rice" in recipe["ingredients"] for recipe in blended["recipes"])
+    assert recommender_service.get_pantry_recommendations(["unicorn"], top_k=5) == []
+
+
+def _uncovered_basil_recipe(recommender_service):
+    # A recipe without basil, given exactly the embedding of the query ["basil"]
+    recipe_catalog = recommender_service.recipe_catalog
+    uncovered = next(row for row in range(len(recipe_catalog)) if "basil" not in recipe_catalog.recipe(row)["ingredients"])
+    recipe_embeddings = recommender_service.search_index.matrix.copy()
+    recipe_embeddings[uncovered] = recommender_service.query_encoder.encode([[recommender_service.ingredient_vocab["basil"]]])[0]
+    return uncovered, recipe_embeddings
+
+
+def _service_with_index(recommender_service, search_index) -> RecommenderService:
+    return RecommenderService(
+        query_encoder=recommender_service.query_encoder,
+        search_index=search_index,
+        ingredient_vocab=recommender_service.ingredient_vocab,
+        recipe_catalog=recommender_service.recipe_catalog
+    )
+
+
+def test_pantry_recommendations_low_weight_ranks_by_similarity(recommender_service):
+    """Test that at a low pantry weight the most similar recipe wins even without any pantry ingredient."""
+    recipe_catalog = recommender_service.recipe_catalog
+    uncovered, recipe_embeddings = _uncovered_basil_recipe(recommender_service)
+    service = _service_with_index(recommender_service, ExactSearchIndex(recipe_embeddings))
+
+    assert service.get_pantry_recommendations(["basil"], top_k=3, pantry_weight=0.05)[0] == recipe_catalog.recipe(uncovered)
+    assert recipe_catalog.recipe(uncovered) not in service.get_pantry_recommendations(["basil"], top_k=3, pantry_weight=1.0)
+
+
+def test_pantry_recommendations_bound_the_cosine_shortlist(recommender_service, monkeypatch):
+    """Test that a catalog larger than candidates is never scanned exactly, an IVF-PQ index still shortlists by cosine."""
+    recipe_catalog = recommender_service.recipe_catalog
+    uncovered, recipe_embeddings = _uncovered_basil_recipe(recommender_service)
+
+    service = _service_with_index(recommender_service, ExactSearchIndex(recipe_embeddings))
+    monkeypatch.setattr(service.search_index, "search", lambda *args: pytest.fail("full scan"))
+    recipes = service.get_pantry_recommendations(["basil"], top_k=3, pantry_weight=0.05, candidates=10)
+    assert recipes and all("basil" in recipe["ingredients"] for recipe in recipes)
+
+    # Every list probed and reranked exactly: the shortlist holds the uncovered recipe
+    ivfpq_index = IVFPQSearchIndex.train(recipe_embeddings, n_lists=4, n_subvectors=4, n_iter=5, n_probe=4,
+                                         rerank_index=ExactSearchIndex(recipe_embeddings))
+    service = _service_with_index(recommender_service, ivfpq_index)
+    assert service.get_pantry_recommendations(["basil"], top_k=3, pantry_weight=0.05, candidates=10)[0] == recipe_catalog.recipe(uncovered)
+
+
+def test_weekly_menu_returns_seven_distinct_recipes(recommender_service):
+    """Test that the weekly menu has one distinct recipe per day, also for a sampled query."""
+    menu = recommender_service.get_weekly_menu(["beef", "salt"], mmr_lambda=0.5, candidates=30)
+    assert list(menu) == ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    assert len({recipe["name"] for recipe in menu.values()}) == 7
+
+    # Pure relevance is the plain top 7
+    relevant = recommender_service.get_weekly_menu(["beef", "salt"], mmr_lambda=1.0, candidates=30)
+    assert list(relevant.values()) == recommender_service.get_recommendations(["beef", "salt"], top_k=7)
+
+    assert len(recommender_service.get_weekly_menu(None, candidates=30)) == 7
+    assert recommender_service.get_weekly_menu(["unicorn"]) == {}
+
+
+def test_validate_rejects_mismatched_artifacts(recommender_service):
+    """Test that embeddings and catalog with different row counts, or a vocab the encoder was not built for, are rejected."""
+    recommender_service.validate()
+
+    for search_index, ingredient_vocab in (
+        (ExactSearchIndex(recommender_service.search_index.vectors(slice(0, 10))), recommender_service.ingredient_vocab),
+        (recommender_service.search_index, IngredientVocab.from_dict({"salt": 0, "beef": 1})),
+    ):
+        with pytest.raises(ValueError):
+            RecommenderService(
+                query_encoder=recommender_service.query_encoder,
+                ingredient_vocab=ingredient_vocab,
+                search_index=search_index,
+                recipe_catalog=recommender_service.recipe_catalog
+            )
+
+
+def test_lenient_validation_serves_the_recipes_of_a_shorter_index(recommender_service):
+    """Test that on startup a catalog with more recipes than the index is served, and rejected when strict."""
+    search_index = ExactSearchIndex(recommender_service.search_index.vectors(slice(0, 30)))
+    recipe_catalog = recommender_service.recipe_catalog
+    with pytest.raises(ValueError):
+        RecommenderService(recommender_service.query_encoder, search_index, recommender_service.ingredient_vocab, recipe_catalog)
+
+    service = RecommenderService(recommender_service.query_encoder, search_index, recommender_service.ingredient_vocab,
+                                 recipe_catalog, strict=False)
+
+    indexed = [recipe_catalog.recipe(row) for row in range(30)]
+    recipes = service.get_recommendations(["beef"], top_k=40, exclude_ingredients=["salt"]) + service.get_pantry_recommendations(["beef", "rice"], top_k=40)
+    assert recipes and all(recipe in indexed for recipe in recipes)
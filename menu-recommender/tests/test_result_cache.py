@@ -0,0 +1,51 @@
+"""Tests for the recommender result cache."""
+
+import time
+
+from services.result_cache import ResultCache
+
+
+def test_result_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first and counted."""
+    cache = ResultCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() | {"hit_rate": None} == {
+        "size": 2, "max_size": 2, "ttl_seconds": 60, "hits": 3, "misses": 1, "hit_rate": None, "evictions": 1, "expirations": 0
+    }
+
+
+def test_result_cache_expires_entries():
+    """Test that entries older than the ttl are not returned."""
+    cache = ResultCache(max_size=10, ttl_seconds=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_recommender_service_caches_canonical_queries(recommender_service):
+    """Test that reordered and duplicated ingredients hit the cached result of the same query."""
+    recommender_service.result_cache = ResultCache(max_size=100, ttl_seconds=60)
+
+    first = recommender_service.get_recommendations(["beef", "salt", "rice"], top_k=4)
+    second = recommender_service.get_recommendations(["Rice", "salt", "beef", "beef"], top_k=4)
+    other_top_k = recommender_service.get_recommendations(["rice", "beef", "salt"], top_k=2)
+
+    assert second == first
+    assert other_top_k == first[:2]
+    stats = recommender_service.cache_stats()
+    # 1st: result + embedding miss, 2nd: result hit, 3rd: result miss + embedding hit
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+
+    recommender_service.artifact_version = "reloaded"
+    recommender_service.get_recommendations(["beef", "salt", "rice"], top_k=4)
+    assert recommender_service.cache_stats()["misses"] == 5
@@ -0,0 +1,101 @@
+"""Tests for the recipe search indexes."""
+
+import numpy as np
+import pytest
+import torch
+from torch.functional import F
+
+from services.embedding_store import EmbeddingStore, StoreSearchIndex
+from services.ivfpq_index import IVFPQSearchIndex
+from services.search_index import ExactSearchIndex, normalize_rows, top_k_rows
+
+
+def test_exact_search_index_matches_cosine_similarity():
+    """Test that the matmul scoring engine ranks like torch cosine similarity."""
+    generator = torch.Generator().manual_seed(3)
+    recipe_embeddings = torch.randn(500, 32, generator=generator)
+    queries = torch.randn(4, 32, generator=generator)
+
+    index = ExactSearchIndex(recipe_embeddings.numpy())
+    scores, indices = index.search(queries.numpy(), 10)
+
+    for query, query_scores, query_indices in zip(queries, scores, indices):
+        expected = torch.topk(F.cosine_similarity(query.unsqueeze(0), recipe_embeddings), k=10)
+        assert query_indices.tolist() == expected.indices.tolist()
+        np.testing.assert_allclose(query_scores, expected.values.numpy(), rtol=1e-5, atol=1e-6)
+
+
+def test_top_k_rows_clamps_to_row_length():
+    """Test that asking for more results than columns returns every column, best first."""
+    scores, indices = top_k_rows(np.array([[0.1, 0.9, 0.5]]), 10)
+
+    assert indices.tolist() == [[1, 2, 0]]
+    assert scores.tolist() == [[0.9, 0.5, 0.1]]
+
+
+def test_ivfpq_search_index_finds_exact_neighbours(tmp_path):
+    """Test that the approximate index recalls the exact top-k and survives a save / load round trip."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((50, 32)).astype(np.float32)
+    recipe_embeddings = centers[rng.integers(0, 50, 2000)] + rng.standard_normal((2000, 32)).astype(np.float32) * 0.3
+    queries = recipe_embeddings[:20]
+
+    exact = ExactSearchIndex(recipe_embeddings)
+    _, expected = exact.search(queries, 5)
+
+    IVFPQSearchIndex.train(recipe_embeddings, n_lists=16, n_subvectors=8, n_iter=5).save(tmp_path / "index.npz")
+    index = IVFPQSearchIndex.load(tmp_path / "index.npz", n_probe=16, rerank_index=exact)
+    _, found = index.search(queries, 5)
+
+    recall = np.mean([len(set(f) & set(e)) / 5 for f, e in zip(found.tolist(), expected.tolist())])
+    assert recall >= 0.9
+    assert found[:, 0].tolist() == list(range(20))
+
+
+def test_ivfpq_score_rows_approximates_exact_scores():
+    """Test that scoring and reconstructing given rows from the PQ codes is close to the exact vectors."""
+    rng = np.random.default_rng(4)
+    recipe_embeddings = rng.standard_normal((2000, 32)).astype(np.float32)
+    queries = rng.standard_normal((3, 32)).astype(np.float32)
+    rows = rng.choice(2000, 50, replace=False)
+
+    exact = ExactSearchIndex(recipe_embeddings)
+    index = IVFPQSearchIndex.train(recipe_embeddings, n_lists=16, n_subvectors=16, n_iter=5)
+
+    np.testing.assert_allclose(index.score_rows(queries, rows), exact.score(queries)[:, rows], atol=0.15)
+    # The reconstructed vectors score like the PQ lookup tables
+    np.testing.assert_allclose(normalize_rows(queries) @ index.vectors(rows).T, index.score_rows(queries, rows), atol=1e-5)
+
+
+def test_ivfpq_search_returns_nothing_for_a_top_k_below_one():
+    """Test that a zero or negative top_k returns no recipes, like the exact index, with and without re-ranking."""
+    rng = np.random.default_rng(5)
+    recipe_embeddings = rng.standard_normal((500, 32)).astype(np.float32)
+    exact = ExactSearchIndex(recipe_embeddings)
+    index = IVFPQSearchIndex.train(recipe_embeddings, n_lists=8, n_subvectors=8, n_iter=3)
+
+    for search_index in (index, IVFPQSearchIndex(index.centroids, index.codebooks, index.codes, index.list_offsets, index.ids, rerank_index=exact)):
+        for top_k in (0, -3):
+            scores, indices = search_index.search(recipe_embeddings[:2], top_k)
+            assert scores.shape == indices.shape == (2, 0)
+            assert exact.search(recipe_embeddings[:2], top_k)[1].shape == (2, 0)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_embedding_store_search_matches_float32(tmp_path, dtype):
+    """Test that the memory-mapped stores rank (almost) like the float32 index."""
+    rng = np.random.default_rng(1)
+    recipe_embeddings = rng.standard_normal((3000, 32)).astype(np.float32)
+    queries = rng.standard_normal((10, 32)).astype(np.float32)
+
+    EmbeddingStore.write(tmp_path / dtype, recipe_embeddings, dtype=dtype)
+    store = EmbeddingStore.open(tmp_path / dtype)
+    assert isinstance(store.vectors, np.memmap)
+    assert (len(store), store.dim, store.dtype) == (3000, 32, dtype)
+
+    _, expected = ExactSearchIndex(recipe_embeddings).search(queries, 10)
+    _, found = StoreSearchIndex(store, block_size=512).search(queries, 10)
+
+    overlap = np.mean([len(set(f) & set(e)) / 10 for f, e in zip(found.tolist(), expected.tolist())])
+    assert overlap >= 0.9
+    np.testing.assert_allclose(store.take(np.arange(5)), ExactSearchIndex(recipe_embeddings).vectors(np.arange(5)), atol=0.02)
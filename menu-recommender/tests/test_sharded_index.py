@@ -0,0 +1,51 @@
+"""Tests for the sharded multi-process search index."""
+
+import numpy as np
+
+from services.embedding_store import EmbeddingStore
+from services.search_index import ExactSearchIndex, normalize_rows
+from services.sharded_index import ShardedSearchIndex
+
+
+def test_sharded_search_matches_exact_search():
+    """Test that merging the partial top-k of every shard gives the exact top-k, filtered or not."""
+    rng = np.random.default_rng(0)
+    recipe_embeddings = rng.standard_normal((1001, 16)).astype(np.float32)
+    queries = rng.standard_normal((4, 16)).astype(np.float32)
+    allowed = rng.random(1001) < 0.05
+
+    exact = ExactSearchIndex(recipe_embeddings)
+    sharded = ShardedSearchIndex(recipe_embeddings, n_shards=3, block_size=100)
+    try:
+        scores, indices = sharded.search(queries, 10)
+        expected_scores, expected_indices = exact.search(queries, 10)
+        assert indices.tolist() == expected_indices.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+        _, indices = sharded.search(queries, 10, allowed=allowed)
+        assert indices.tolist() == exact.search(queries, 10, allowed=allowed)[1].tolist()
+
+        np.testing.assert_array_equal(sharded.vectors([5, 1000]), exact.vectors([5, 1000]))
+    finally:
+        sharded.close()
+
+
+def test_sharded_index_dequantizes_a_store_block_by_block(tmp_path):
+    """Test that an int8 store is read into shared memory one block of rows at a time, never as a whole."""
+    rng = np.random.default_rng(1)
+    EmbeddingStore.write(str(tmp_path / "store"), rng.standard_normal((1001, 16)).astype(np.float32), dtype="int8")
+    store = EmbeddingStore.open(str(tmp_path / "store"))
+    blocks = list()
+
+    class _RecordingStore(EmbeddingStore):
+        def take(self, rows):
+            blocks.append(rows)
+            return super().take(rows)
+
+    sharded = ShardedSearchIndex(_RecordingStore(store.vectors, store.scales), n_shards=2, block_size=100)
+    try:
+        np.testing.assert_allclose(sharded.vectors(slice(None)), normalize_rows(store.take(slice(None))), rtol=1e-5, atol=1e-6)
+        assert len(blocks) == 11 and all(block.stop - block.start <= 100 for block in blocks)
+    finally:
+        sharded.close()
+
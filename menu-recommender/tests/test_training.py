@@ -0,0 +1,82 @@
+"""Tests for the packed, checkpointed training pipeline."""
+
+import numpy as np
+import pytest
+import torch
+
+from models.recipie_embedding_model import RecipeEmbeddingModel
+from services.pair_mining import PairMiner, synthetic_recipes
+from services.training import ContrastiveTrainer, EpochBatches, PairDataset
+
+
+@pytest.fixture
+def training_pairs():
+    indptr, ids = synthetic_recipes(200, vocab_size=40, seed=3)
+    return PairMiner(indptr, ids, vocab_size=40).mine(60, 60, seed=5)
+
+
+def _model(seed: int = 0, pooling: str = "mean") -> RecipeEmbeddingModel:
+    torch.manual_seed(seed)
+    return RecipeEmbeddingModel(vocab_size=40, embedding_dim=16, projection_dim=8, pooling=pooling)
+
+
+class _InterruptedTrainer(ContrastiveTrainer):
+    # Killed before the given step, like a run that dies between checkpoints
+    def __init__(self, *args, interrupt_at: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interrupt_at = interrupt_at
+        self.steps = 0
+
+    def _train_step(self, *batch) -> float:
+        self.steps += 1
+        if self.steps == self.interrupt_at:
+            raise KeyboardInterrupt
+        return super()._train_step(*batch)
+
+
+@pytest.mark.parametrize("pooling", ["mean", "attention"])
+def test_packed_batches_match_the_padded_forward(training_pairs, pooling):
+    """Test that a packed batch gives the embeddings of forward() on the ingredient lists, padding id 0 left out."""
+    dataset = PairDataset(training_pairs)
+    left_ids, left_offsets, right_ids, right_offsets = dataset[[0, 5, 70]]
+
+    model = _model(pooling=pooling)
+    recipes = [training_pairs.pair(idx)[0].tolist() for idx in (0, 5, 70)]
+    assert [left_ids[start:end].tolist() for start, end in zip(left_offsets[:-1], left_offsets[1:])] == [
+        [idx for idx in recipe if idx != 0] for recipe in recipes
+    ]
+
+    with torch.no_grad():
+        expected, _ = model(recipes)
+        packed, _ = model.forward_packed(left_ids, left_offsets)
+    torch.testing.assert_close(packed, expected, atol=1e-6, rtol=0)
+
+
+def test_epoch_batches_cover_every_pair_once_and_resume_where_they_stopped():
+    """Test that an epoch is a permutation in batches that only depends on seed and epoch."""
+    batches = EpochBatches(10, 4, seed=1, epoch=2).batches()
+    assert sorted(idx for batch in batches for idx in batch) == list(range(10))
+    assert list(EpochBatches(10, 4, seed=1, epoch=2, start_batch=1)) == batches[1:]
+    assert EpochBatches(10, 4, seed=1, epoch=3).batches() != batches
+
+
+@pytest.mark.parametrize("sparse_embedding", [False, True])
+def test_resumed_training_ends_with_the_same_weights(tmp_path, training_pairs, sparse_embedding):
+    """Test that a run killed between checkpoints and resumed with worker processes matches an uninterrupted run."""
+    dataset = PairDataset(training_pairs)
+    options = dict(batch_size=16, checkpoint_every=3, sparse_embedding=sparse_embedding)
+    full = _model()
+    ContrastiveTrainer(full, dataset, str(tmp_path / "full"), num_workers=0, **options).train(2)
+
+    interrupted = _InterruptedTrainer(_model(), dataset, str(tmp_path / "resumed"), num_workers=0, interrupt_at=12, **options)
+    with pytest.raises(KeyboardInterrupt):
+        interrupted.train(2)
+
+    resumed_model = _model(seed=7)
+    resumed = ContrastiveTrainer(resumed_model, dataset, str(tmp_path / "resumed"), num_workers=1, **options)
+    assert resumed.load_checkpoint() and (resumed.epoch, resumed.batch) == (1, 3)
+    stats = resumed.train(2)
+
+    assert stats["epochs"] == 2 and stats["samples"] == 2 * len(dataset) and stats["samples_per_second"] > 0
+    for name, weight in full.state_dict().items():
+        np.testing.assert_array_equal(resumed_model.state_dict()[name].numpy(), weight.numpy())